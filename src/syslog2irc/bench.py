@@ -0,0 +1,491 @@
+"""
+syslog2irc.bench
+~~~~~~~~~~~~~~~~
+
+End-to-end throughput benchmark
+
+Sends synthetic syslog messages via UDP or TCP on localhost to a
+processor that runs in the same process with the dummy bot, and reports
+throughput, loss, and latency.
+
+Alternatively, only measures how long it takes to pass a received
+message on to the processor's queue, via signal or via direct sink.
+
+Run with ``python -m syslog2irc.bench --help`` for the options.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from dataclasses import dataclass, replace
+import random
+import socket
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+from typing import Optional
+
+import syslogmp
+from syslogmp import Message as SyslogMessage
+
+from .config import Config
+from .irc import DummyBot, IrcChannel, IrcConfig
+from .main import Processor
+from .network import Port, TransportProtocol
+from .queueing import QueueConfig
+from .routing import Route
+from .syslog import ReceiverEngine, SIGNAL_SINK, SyslogConfig
+from .util import start_thread
+from .workers import ACTIVE_PORTS_SYNC_INTERVAL
+
+
+CHANNEL_NAME = '#benchmark'
+
+# Syslog messages must not be longer than that.
+MAX_MESSAGE_SIZE = 1024
+
+# seconds to wait for further messages to arrive after sending
+DEFAULT_SETTLE_TIME = 2.0
+
+# prefix of the text of each benchmark message, followed by the sequence
+# number (to tell them apart from notices by the processor itself)
+TEXT_PREFIX = 'seq='
+
+
+@dataclass(frozen=True)
+class SizeMixEntry:
+    """A message size and its relative frequency."""
+
+    size: int
+    weight: float
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    sent: int
+    received: int
+    send_duration: float
+    receive_duration: float
+    latencies: list[float]
+
+    @property
+    def lost(self) -> int:
+        return self.sent - self.received
+
+    @property
+    def throughput(self) -> float:
+        """Return the number of messages received per second."""
+        if self.receive_duration <= 0:
+            return 0.0
+        return self.received / self.receive_duration
+
+
+class LatencyRecorder(DummyBot):
+    """A dummy bot that records when each benchmark message arrives."""
+
+    def __init__(
+        self, channels: set[IrcChannel], sent_at: list[float]
+    ) -> None:
+        super().__init__(channels)
+        self.sent_at = sent_at
+        self.latencies: list[float] = []
+        self.first_received_at: Optional[float] = None
+        self.last_received_at: Optional[float] = None
+        self._lock = Lock()
+
+    def say(self, channel_name: str, text: str) -> None:
+        now = monotonic()
+        if not text.startswith(TEXT_PREFIX):
+            return None
+
+        sequence_number = int(text[len(TEXT_PREFIX) :].split(' ', 1)[0])
+
+        with self._lock:
+            if self.first_received_at is None:
+                self.first_received_at = now
+            self.last_received_at = now
+            self.latencies.append(now - self.sent_at[sequence_number])
+
+    @property
+    def received(self) -> int:
+        return len(self.latencies)
+
+
+def format_benchmark_message(
+    source_address: tuple[str, int], message: SyslogMessage
+) -> str:
+    """Pass only the message text (which starts with the sequence number)
+    on to the bot.
+    """
+    return message.message.decode('utf-8')
+
+
+def build_message(sequence_number: int, size: int) -> bytes:
+    """Build an RFC 3164 message of the given size."""
+    header = (
+        f'<13>Oct 22 10:52:12 benchhost {TEXT_PREFIX}{sequence_number:d} '
+    ).encode('ascii')
+    return header + b'x' * max(size - len(header), 0)
+
+
+def parse_size_mix(value: str) -> list[SizeMixEntry]:
+    """Parse a size mix like `100:70,400:20,1000:10`.
+
+    The weight is optional and defaults to 1.
+    """
+    entries = []
+    for item in value.split(','):
+        size_str, _, weight_str = item.partition(':')
+        try:
+            size = int(size_str)
+            weight = float(weight_str) if weight_str else 1.0
+        except ValueError:
+            raise ArgumentTypeError(f'Invalid size mix entry "{item}"')
+
+        if not (0 < size <= MAX_MESSAGE_SIZE):
+            raise ArgumentTypeError(
+                f'Message size must be between 1 and {MAX_MESSAGE_SIZE:d}.'
+            )
+        if weight <= 0:
+            raise ArgumentTypeError(f'Invalid weight "{weight_str}"')
+
+        entries.append(SizeMixEntry(size, weight))
+
+    return entries
+
+
+def find_free_port(transport_protocol: TransportProtocol) -> Port:
+    socket_type = (
+        socket.SOCK_STREAM
+        if transport_protocol == TransportProtocol.TCP
+        else socket.SOCK_DGRAM
+    )
+    with socket.socket(socket.AF_INET, socket_type) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return Port(sock.getsockname()[1], transport_protocol)
+
+
+def create_config(port: Port, syslog_config: SyslogConfig) -> Config:
+    channel = IrcChannel(CHANNEL_NAME)
+    irc_config = IrcConfig(
+        server=None,
+        nickname='benchmark',
+        realname='benchmark',
+        commands=[],
+        channels={channel},
+    )
+
+    return Config(
+        log_level='WARNING',
+        irc=irc_config,
+        routes={Route(port, CHANNEL_NAME)},
+        syslog=syslog_config,
+        queue=QueueConfig(),
+    )
+
+
+def run_benchmark(
+    *,
+    transport_protocol: TransportProtocol,
+    count: int,
+    rate: Optional[float],
+    size_mix: list[SizeMixEntry],
+    syslog_config: SyslogConfig = SyslogConfig(),
+    settle_time: float = DEFAULT_SETTLE_TIME,
+) -> BenchmarkResult:
+    """Send `count` messages at up to `rate` messages per second (or as
+    fast as possible) to a processor, and wait for them to arrive.
+    """
+    port = find_free_port(transport_protocol)
+    config = create_config(port, syslog_config)
+
+    sent_at = [0.0] * count
+    processor = Processor(
+        config, custom_format_message=format_benchmark_message
+    )
+    recorder = LatencyRecorder(config.irc.channels, sent_at)
+    processor.irc_bot = recorder
+
+    start_thread(processor.run, 'BenchmarkProcessor')
+    _wait_until_port_is_active(processor, port)
+    if syslog_config.engine == ReceiverEngine.MULTIPROCESS:
+        # Give the worker processes time to learn that the port is active.
+        sleep(ACTIVE_PORTS_SYNC_INTERVAL * 1.5)
+
+    rng = random.Random(0)
+    sizes = rng.choices(
+        [entry.size for entry in size_mix],
+        weights=[entry.weight for entry in size_mix],
+        k=count,
+    )
+    messages = [build_message(i, size) for i, size in enumerate(sizes)]
+
+    started_at = monotonic()
+    if transport_protocol == TransportProtocol.TCP:
+        _send_via_tcp(port, messages, sent_at, rate, started_at)
+    else:
+        _send_via_udp(port, messages, sent_at, rate, started_at)
+    send_duration = monotonic() - started_at
+
+    _wait_until_settled(recorder, count, settle_time)
+
+    last_received_at = recorder.last_received_at or started_at
+    return BenchmarkResult(
+        sent=count,
+        received=recorder.received,
+        send_duration=send_duration,
+        receive_duration=last_received_at - started_at,
+        latencies=list(recorder.latencies),
+    )
+
+
+def _wait_until_port_is_active(processor: Processor, port: Port) -> None:
+    # Messages are held for channels from the start, so the port is
+    # reported as active before it has been bound.
+    if not processor.receivers_started.wait(timeout=10):
+        raise RuntimeError('Processor did not start receivers.')
+
+    deadline = monotonic() + 10
+    while not processor.router.is_port_active(port):
+        if monotonic() > deadline:
+            raise RuntimeError('Processor did not become ready.')
+        sleep(0.01)
+
+
+def _pace(index: int, rate: Optional[float], started_at: float) -> None:
+    """Sleep until the message with the index is due."""
+    if rate is None:
+        return
+
+    delay = started_at + index / rate - monotonic()
+    if delay > 0:
+        sleep(delay)
+
+
+def _send_via_udp(
+    port: Port,
+    messages: list[bytes],
+    sent_at: list[float],
+    rate: Optional[float],
+    started_at: float,
+) -> None:
+    address = ('127.0.0.1', port.number)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for i, message in enumerate(messages):
+            _pace(i, rate, started_at)
+            sent_at[i] = monotonic()
+            sock.sendto(message, address)
+
+
+def _send_via_tcp(
+    port: Port,
+    messages: list[bytes],
+    sent_at: list[float],
+    rate: Optional[float],
+    started_at: float,
+) -> None:
+    address = ('127.0.0.1', port.number)
+    with socket.create_connection(address) as sock:
+        for i, message in enumerate(messages):
+            _pace(i, rate, started_at)
+            sent_at[i] = monotonic()
+            sock.sendall(message + b'\n')
+
+
+def _wait_until_settled(
+    recorder: LatencyRecorder, count: int, settle_time: float
+) -> None:
+    """Wait until all messages have arrived, or until none has arrived
+    for the settle time.
+    """
+    last_count = -1
+    last_change_at = monotonic()
+    while recorder.received < count:
+        received = recorder.received
+        now = monotonic()
+        if received != last_count:
+            last_count = received
+            last_change_at = now
+        elif now - last_change_at >= settle_time:
+            break
+        sleep(0.05)
+
+
+def get_percentile(sorted_values: list[float], percentile: float) -> float:
+    """Return the percentile (nearest rank) of the sorted values."""
+    if not sorted_values:
+        return 0.0
+
+    rank = max(int(len(sorted_values) * percentile / 100 + 0.5), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def format_result(result: BenchmarkResult) -> str:
+    latencies = sorted(result.latencies)
+    loss_percentage = result.lost / result.sent * 100 if result.sent else 0.0
+    send_rate = (
+        result.sent / result.send_duration if result.send_duration > 0 else 0.0
+    )
+
+    def ms(seconds: float) -> str:
+        return f'{seconds * 1000:.3f} ms'
+
+    lines = [
+        f'sent:       {result.sent:d} messages in '
+        f'{result.send_duration:.2f} s ({send_rate:.0f}/s)',
+        f'received:   {result.received:d} messages '
+        f'({result.lost:d} lost, {loss_percentage:.2f} %)',
+        f'throughput: {result.throughput:.0f} messages/s',
+        'latency:    '
+        + ', '.join(
+            f'p{percentile:g} {ms(get_percentile(latencies, percentile))}'
+            for percentile in (50, 90, 99, 99.9)
+        )
+        + f', max {ms(latencies[-1] if latencies else 0.0)}',
+    ]
+    return '\n'.join(lines)
+
+
+def measure_dispatch(count: int) -> dict[str, float]:
+    """Return the average time in seconds to pass a message from a
+    receiver on to the processor's queue, by dispatch method.
+    """
+    port = Port(514, TransportProtocol.UDP)
+    config = replace(
+        create_config(port, SyslogConfig()),
+        queue=QueueConfig(max_size=count),
+    )
+    processor = Processor(config)
+
+    client_address = ('127.0.0.1', 34567)
+    message = syslogmp.parse(build_message(0, 128))
+
+    sinks = {
+        'signal': SIGNAL_SINK,
+        'direct': processor.message_sink,
+    }
+
+    durations = {}
+    for name, sink in sinks.items():
+        handle_message = sink.handle_message
+
+        started_at = perf_counter()
+        for _ in range(count):
+            handle_message(client_address, port, message)
+        durations[name] = (perf_counter() - started_at) / count
+
+        while processor.message_queue.get(timeout=0) is not None:
+            pass
+
+    return durations
+
+
+def format_dispatch_durations(durations: dict[str, float]) -> str:
+    return '\n'.join(
+        f'{name + ":":<11} {duration * 1e9:.0f} ns per message'
+        for name, duration in durations.items()
+    )
+
+
+def parse_args(args: Optional[list[str]] = None) -> Namespace:
+    """Parse command line arguments."""
+    parser = ArgumentParser(
+        prog='python -m syslog2irc.bench',
+        description='Measure end-to-end throughput on localhost.',
+    )
+
+    parser.add_argument(
+        '--dispatch',
+        action='store_true',
+        help='only measure the cost of passing a received message on to '
+        'the queue, via signal and via direct sink (uses --count)',
+    )
+
+    parser.add_argument(
+        '--protocol',
+        choices=['udp', 'tcp'],
+        default='udp',
+        help='transport protocol (default: udp)',
+    )
+
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=100000,
+        help='number of messages to send (default: 100000)',
+    )
+
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='messages per second (default: as fast as possible)',
+    )
+
+    parser.add_argument(
+        '--sizes',
+        type=parse_size_mix,
+        default=parse_size_mix('128'),
+        help='message sizes in bytes, with optional relative weights, '
+        'e.g. "100:70,400:20,1000:10" (default: 128)',
+    )
+
+    parser.add_argument(
+        '--engine',
+        choices=[engine.name.lower() for engine in ReceiverEngine],
+        default='threading',
+        help='receiver engine (default: threading)',
+    )
+
+    parser.add_argument(
+        '--udp-batch-size',
+        type=int,
+        help='UDP batch size (not for threading engine)',
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='worker processes (multiprocess engine only; default: 1)',
+    )
+
+    parser.add_argument(
+        '--settle-time',
+        type=float,
+        default=DEFAULT_SETTLE_TIME,
+        help='seconds to wait for stragglers after sending '
+        f'(default: {DEFAULT_SETTLE_TIME:g})',
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    args = parse_args(args)
+
+    if args.dispatch:
+        durations = measure_dispatch(args.count)
+        print(format_dispatch_durations(durations))
+        return
+
+    syslog_config = SyslogConfig(
+        engine=ReceiverEngine[args.engine.upper()],
+        udp_batch_size=args.udp_batch_size,
+        workers=args.workers,
+    )
+
+    result = run_benchmark(
+        transport_protocol=TransportProtocol[args.protocol.upper()],
+        count=args.count,
+        rate=args.rate,
+        size_mix=args.sizes,
+        syslog_config=syslog_config,
+        settle_time=args.settle_time,
+    )
+
+    print(format_result(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,20 +9,40 @@ Configuration loading
 """
 
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import logging
+import multiprocessing
+import os
 from pathlib import Path
+import re
+import socket
 from typing import Any, Iterator, Optional
 
 import rtoml
-
-from .irc import IrcChannel, IrcConfig, IrcServer
-from .network import parse_port
-from .routing import Route
+from syslogmp import Facility, Severity
+
+from .connections import TcpConfig
+from .formatting import COLOR_CODES, compile_template, FormatConfig
+from .history import HistoryConfig
+from .irc import ChannelAssignment, IrcChannel, IrcConfig, IrcServer
+from .matching import PATTERN_ENCODING
+from .metrics import MetricsConfig
+from .network import parse_port, Port
+from .packing import LongMessagePolicy, PackingConfig
+from .queueing import OverflowPolicy, QueueConfig
+from .routing import parse_facility, parse_severity, Route, Router
+from .sockets import SocketConfig
+from .spool import SpoolConfig
+from .storms import StormConfig
+from .syslog import ReceiverEngine, SyslogConfig
 
 
 DEFAULT_IRC_SERVER_PORT = 6667
 DEFAULT_IRC_REALNAME = 'syslog'
+DEFAULT_RING_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Segments must have room for messages of maximum length.
+MIN_SPOOL_SEGMENT_SIZE = 1024 * 1024
 
 
 logger = logging.getLogger(__name__)
@@ -37,6 +57,16 @@ class Config:
     log_level: str
     irc: IrcConfig
     routes: set[Route]
+    syslog: SyslogConfig = SyslogConfig()
+    queue: QueueConfig = QueueConfig()
+    deduplication_window: Optional[float] = None
+    packing: Optional[PackingConfig] = None
+    metrics: Optional[MetricsConfig] = None
+    formatting: FormatConfig = FormatConfig()
+    spool: Optional[SpoolConfig] = None
+    history: Optional[HistoryConfig] = None
+    storm: StormConfig = StormConfig()
+    reload_nicknames: frozenset[str] = frozenset()
 
 
 def load_config(path: Path) -> Config:
@@ -46,8 +76,86 @@ def load_config(path: Path) -> Config:
     log_level = _get_log_level(data)
     irc_config = _get_irc_config(data)
     routes = _get_routes(data, irc_config.channels)
+    syslog_config = _get_syslog_config(data)
+    queue_config = _get_queue_config(data)
+    deduplication_window = _get_deduplication_window(data)
+    packing_config = _get_packing_config(data)
+    metrics_config = _get_metrics_config(data)
+    format_config = _get_format_config(data)
+    spool_config = _get_spool_config(data)
+    history_config = _get_history_config(data)
+    storm_config = _get_storm_config(data)
+    reload_nicknames = frozenset(data.get('reload', {}).get('nicknames', []))
+
+    return Config(
+        log_level=log_level,
+        irc=irc_config,
+        routes=routes,
+        syslog=syslog_config,
+        queue=queue_config,
+        deduplication_window=deduplication_window,
+        packing=packing_config,
+        metrics=metrics_config,
+        formatting=format_config,
+        spool=spool_config,
+        history=history_config,
+        storm=storm_config,
+        reload_nicknames=reload_nicknames,
+    )
 
-    return Config(log_level=log_level, irc=irc_config, routes=routes)
+
+@dataclass(frozen=True)
+class ConfigDiff:
+    """What has changed between two configurations, as far as it can be
+    applied while running.
+    """
+
+    opened_ports: frozenset[Port]
+    closed_ports: frozenset[Port]
+    # channels that have been added, or whose settings have changed
+    joined_channels: frozenset[IrcChannel]
+    parted_channel_names: frozenset[str]
+    routes_changed: bool
+    # changes to other settings, which require a restart
+    other_changes: bool
+
+
+def diff_configs(old: Config, new: Config) -> ConfigDiff:
+    """Compare configurations."""
+    old_ports = {route.syslog_port for route in old.routes}
+    new_ports = {route.syslog_port for route in new.routes}
+
+    old_channels = {channel.name: channel for channel in old.irc.channels}
+    new_channels = {channel.name: channel for channel in new.irc.channels}
+
+    return ConfigDiff(
+        opened_ports=frozenset(new_ports - old_ports),
+        closed_ports=frozenset(old_ports - new_ports),
+        joined_channels=frozenset(
+            channel
+            for name, channel in new_channels.items()
+            if old_channels.get(name) != channel
+        ),
+        parted_channel_names=frozenset(
+            old_channels.keys() - new_channels.keys()
+        ),
+        routes_changed=new.routes != old.routes,
+        other_changes=take_reloadable_settings(new, old) != old,
+    )
+
+
+def take_reloadable_settings(config: Config, source: Config) -> Config:
+    """Return the configuration with the settings that can be applied
+    while running (routes, channels, and storm detection) taken from the
+    source configuration.
+    """
+    return replace(
+        config,
+        routes=source.routes,
+        irc=replace(config.irc, channels=source.irc.channels),
+        storm=source.storm,
+        reload_nicknames=source.reload_nicknames,
+    )
 
 
 def _get_log_level(data: dict[str, Any]) -> str:
@@ -71,12 +179,30 @@ def _get_irc_config(data: dict[str, Any]) -> IrcConfig:
     if not channels:
         logger.warning('No IRC channels to join have been configured.')
 
+    connections = int(data_irc.get('connections', 1))
+    if connections < 1:
+        raise ConfigurationError(
+            f'Invalid number of IRC connections "{connections}"'
+        )
+
+    channel_assignment_str = data_irc.get('channel_assignment', 'round-robin')
+    try:
+        channel_assignment = ChannelAssignment[
+            channel_assignment_str.upper().replace('-', '_')
+        ]
+    except KeyError:
+        raise ConfigurationError(
+            f'Unknown channel assignment strategy "{channel_assignment_str}"'
+        )
+
     return IrcConfig(
         server=server,
         nickname=nickname,
         realname=realname,
         commands=commands,
         channels=channels,
+        connections=connections,
+        channel_assignment=channel_assignment,
     )
 
 
@@ -104,7 +230,14 @@ def _get_irc_channels(data_irc: Any) -> Iterator[IrcChannel]:
     for channel in data_irc.get('channels', []):
         name = channel['name']
         password = channel.get('password')
-        yield IrcChannel(name, password)
+
+        weight = int(channel.get('weight', 1))
+        if weight < 1:
+            raise ConfigurationError(
+                f'Invalid weight "{weight}" for IRC channel "{name}"'
+            )
+
+        yield IrcChannel(name, password, weight)
 
 
 def _get_routes(
@@ -117,8 +250,8 @@ def _get_routes(
     known_irc_channel_names = {c.name for c in irc_channels}
 
     def iterate() -> Iterator[Route]:
-        for syslog_port_str, irc_channel_names in data_routes.items():
-            for irc_channel_name in irc_channel_names:
+        for syslog_port_str, route_targets in data_routes.items():
+            for route_target in route_targets:
                 try:
                     syslog_port = parse_port(syslog_port_str)
                 except ValueError:
@@ -126,15 +259,439 @@ def _get_routes(
                         f'Invalid syslog port "{syslog_port_str}"'
                     )
 
-                if irc_channel_name not in known_irc_channel_names:
-                    raise ConfigurationError(
-                        f'Route target IRC channel "{irc_channel_name}" '
-                        'is not configured to be joined.'
-                    )
+                yield _get_route(
+                    syslog_port, route_target, known_irc_channel_names
+                )
+
+    routes = set(iterate())
+
+    # Patterns are combined per port, which can fail even if each of
+    # them is valid on its own (e.g. due to duplicate group names).
+    try:
+        Router(routes)
+    except re.error as e:
+        raise ConfigurationError(f'Invalid combination of patterns: {e}')
+
+    return routes
+
+
+def _get_route(
+    syslog_port: Port, route_target: Any, known_irc_channel_names: set[str]
+) -> Route:
+    # A route target is either just a channel name, or a table with the
+    # channel name and filters.
+    if isinstance(route_target, str):
+        route_target = {'channel': route_target}
+
+    irc_channel_name = route_target.get('channel')
+    if irc_channel_name not in known_irc_channel_names:
+        raise ConfigurationError(
+            f'Route target IRC channel "{irc_channel_name}" '
+            'is not configured to be joined.'
+        )
+
+    min_severity_str = route_target.get('min_severity')
+    min_severity = (
+        _get_severity(min_severity_str)
+        if min_severity_str is not None
+        else None
+    )
+
+    facility_strs = route_target.get('facilities')
+    facilities = (
+        frozenset(map(_get_facility, facility_strs))
+        if facility_strs is not None
+        else None
+    )
+
+    include_patterns = _get_patterns(route_target, 'include')
+    exclude_patterns = _get_patterns(route_target, 'exclude')
+
+    storm_threshold = route_target.get('storm_threshold')
+    if storm_threshold is not None:
+        storm_threshold = float(storm_threshold)
+        if storm_threshold <= 0:
+            raise ConfigurationError(
+                f'Invalid storm threshold "{storm_threshold}"'
+            )
+
+    return Route(
+        syslog_port=syslog_port,
+        irc_channel_name=irc_channel_name,
+        min_severity=min_severity,
+        facilities=facilities,
+        include_patterns=include_patterns,
+        exclude_patterns=exclude_patterns,
+        storm_threshold=storm_threshold,
+    )
+
+
+def _get_patterns(route_target: dict[str, Any], key: str) -> tuple[str, ...]:
+    patterns = tuple(route_target.get(key, []))
+
+    # Patterns are matched against the undecoded message text.
+    for pattern in patterns:
+        try:
+            re.compile(pattern.encode(PATTERN_ENCODING))
+        except re.error as e:
+            raise ConfigurationError(
+                f'Invalid {key} pattern "{pattern}": {e}'
+            )
+
+    return patterns
+
 
-                yield Route(
-                    syslog_port=syslog_port,
-                    irc_channel_name=irc_channel_name,
+def _get_severity(name: str) -> Severity:
+    try:
+        return parse_severity(name)
+    except ValueError as e:
+        raise ConfigurationError(str(e))
+
+
+def _get_facility(name: str) -> Facility:
+    try:
+        return parse_facility(name)
+    except ValueError as e:
+        raise ConfigurationError(str(e))
+
+
+def _get_syslog_config(data: dict[str, Any]) -> SyslogConfig:
+    data_syslog = data.get('syslog', {})
+
+    engine_str = data_syslog.get('engine', 'threading')
+    try:
+        engine = ReceiverEngine[engine_str.upper()]
+    except KeyError:
+        raise ConfigurationError(f'Unknown receiver engine "{engine_str}"')
+
+    udp_batch_size = data_syslog.get('udp_batch_size')
+    if udp_batch_size is not None:
+        udp_batch_size = int(udp_batch_size)
+        if udp_batch_size < 1:
+            raise ConfigurationError(
+                f'Invalid UDP batch size "{udp_batch_size}"'
+            )
+        if engine == ReceiverEngine.THREADING:
+            logger.warning(
+                'UDP batching is not supported by the threading receiver '
+                'engine and will not be used.'
+            )
+
+    workers = int(data_syslog.get('workers', os.cpu_count() or 1))
+    if workers < 1:
+        raise ConfigurationError(f'Invalid number of workers "{workers}"')
+
+    ring_buffer_size = int(
+        data_syslog.get('ring_buffer_size', DEFAULT_RING_BUFFER_SIZE)
+    )
+    if ring_buffer_size < 1024:
+        raise ConfigurationError(
+            f'Invalid ring buffer size "{ring_buffer_size}"'
+        )
+
+    if engine == ReceiverEngine.MULTIPROCESS:
+        _ensure_multiprocess_engine_is_supported()
+
+    tcp_config = _get_tcp_config(data_syslog)
+    socket_configs = _get_socket_configs(data_syslog)
+
+    return SyslogConfig(
+        engine=engine,
+        udp_batch_size=udp_batch_size,
+        workers=workers,
+        ring_buffer_size=ring_buffer_size,
+        tcp=tcp_config,
+        sockets=socket_configs,
+    )
+
+
+def _get_tcp_config(data_syslog: dict[str, Any]) -> TcpConfig:
+    data_tcp = data_syslog.get('tcp', {})
+    defaults = TcpConfig()
+
+    max_connections = int(
+        data_tcp.get('max_connections', defaults.max_connections)
+    )
+    if max_connections < 1:
+        raise ConfigurationError(
+            f'Invalid maximum number of TCP connections "{max_connections}"'
+        )
+
+    max_connections_per_host = int(
+        data_tcp.get(
+            'max_connections_per_host', defaults.max_connections_per_host
+        )
+    )
+    if max_connections_per_host < 1:
+        raise ConfigurationError(
+            'Invalid maximum number of TCP connections per host '
+            f'"{max_connections_per_host}"'
+        )
+
+    # A timeout of zero disables it.
+    idle_timeout: Optional[float] = float(
+        data_tcp.get('idle_timeout', defaults.idle_timeout)
+    )
+    if idle_timeout < 0:
+        raise ConfigurationError(f'Invalid TCP idle timeout "{idle_timeout}"')
+    if not idle_timeout:
+        idle_timeout = None
+
+    return TcpConfig(
+        max_connections=max_connections,
+        max_connections_per_host=max_connections_per_host,
+        idle_timeout=idle_timeout,
+    )
+
+
+def _get_socket_configs(
+    data_syslog: dict[str, Any]
+) -> dict[Port, SocketConfig]:
+    socket_configs = {}
+
+    for port_str, data_socket in data_syslog.get('sockets', {}).items():
+        try:
+            port = parse_port(port_str)
+        except ValueError:
+            raise ConfigurationError(f'Invalid syslog port "{port_str}"')
+
+        receive_buffer_size = data_socket.get('receive_buffer_size')
+        if receive_buffer_size is not None:
+            receive_buffer_size = int(receive_buffer_size)
+            if receive_buffer_size < 1:
+                raise ConfigurationError(
+                    f'Invalid receive buffer size "{receive_buffer_size}" '
+                    f'for port "{port_str}"'
                 )
 
-    return set(iterate())
+        busy_poll = data_socket.get('busy_poll')
+        if busy_poll is not None:
+            busy_poll = int(busy_poll)
+            if busy_poll < 0:
+                raise ConfigurationError(
+                    f'Invalid busy poll time "{busy_poll}" '
+                    f'for port "{port_str}"'
+                )
+
+        socket_configs[port] = SocketConfig(
+            receive_buffer_size=receive_buffer_size, busy_poll=busy_poll
+        )
+
+    return socket_configs
+
+
+def _ensure_multiprocess_engine_is_supported() -> None:
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        raise ConfigurationError(
+            'The multiprocess receiver engine requires SO_REUSEPORT, '
+            'which is not available on this platform.'
+        )
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise ConfigurationError(
+            'The multiprocess receiver engine requires forking processes, '
+            'which is not available on this platform.'
+        )
+
+
+def _get_queue_config(data: dict[str, Any]) -> QueueConfig:
+    data_queue = data.get('queue', {})
+    defaults = QueueConfig()
+
+    max_size = int(data_queue.get('max_size', defaults.max_size))
+    if max_size < 1:
+        raise ConfigurationError(f'Invalid queue size "{max_size}"')
+
+    overflow_policy_str = data_queue.get('overflow_policy')
+    if overflow_policy_str is not None:
+        try:
+            overflow_policy = OverflowPolicy[
+                overflow_policy_str.upper().replace('-', '_')
+            ]
+        except KeyError:
+            raise ConfigurationError(
+                f'Unknown queue overflow policy "{overflow_policy_str}"'
+            )
+    else:
+        overflow_policy = defaults.overflow_policy
+
+    drop_notice_interval = float(
+        data_queue.get('drop_notice_interval', defaults.drop_notice_interval)
+    )
+    if drop_notice_interval <= 0:
+        raise ConfigurationError(
+            f'Invalid drop notice interval "{drop_notice_interval}"'
+        )
+
+    return QueueConfig(
+        max_size=max_size,
+        overflow_policy=overflow_policy,
+        drop_notice_interval=drop_notice_interval,
+    )
+
+
+def _get_deduplication_window(data: dict[str, Any]) -> Optional[float]:
+    window = data.get('deduplication', {}).get('window')
+    if window is None:
+        return None
+
+    window = float(window)
+    if window <= 0:
+        raise ConfigurationError(f'Invalid deduplication window "{window}"')
+
+    return window
+
+
+def _get_packing_config(data: dict[str, Any]) -> Optional[PackingConfig]:
+    data_packing = data.get('packing', {})
+    if not data_packing.get('enabled', False):
+        return None
+
+    defaults = PackingConfig()
+
+    separator = data_packing.get('separator', defaults.separator)
+
+    max_delay = float(data_packing.get('max_delay', defaults.max_delay))
+    if max_delay <= 0:
+        raise ConfigurationError(f'Invalid packing delay "{max_delay}"')
+
+    long_messages_str = data_packing.get('long_messages')
+    if long_messages_str is not None:
+        try:
+            long_message_policy = LongMessagePolicy[long_messages_str.upper()]
+        except KeyError:
+            raise ConfigurationError(
+                f'Unknown long message policy "{long_messages_str}"'
+            )
+    else:
+        long_message_policy = defaults.long_message_policy
+
+    return PackingConfig(
+        separator=separator,
+        max_delay=max_delay,
+        long_message_policy=long_message_policy,
+    )
+
+
+def _get_metrics_config(data: dict[str, Any]) -> Optional[MetricsConfig]:
+    data_metrics = data.get('metrics', {})
+    if not data_metrics.get('enabled', False):
+        return None
+
+    defaults = MetricsConfig()
+
+    host = data_metrics.get('host', defaults.host)
+
+    port = int(data_metrics.get('port', defaults.port))
+    if not (0 < port < 65536):
+        raise ConfigurationError(f'Invalid metrics port "{port}"')
+
+    return MetricsConfig(host=host, port=port)
+
+
+def _get_spool_config(data: dict[str, Any]) -> Optional[SpoolConfig]:
+    data_spool = data.get('spool', {})
+    path = data_spool.get('path')
+    if path is None:
+        return None
+
+    defaults = SpoolConfig(path=Path(path))
+
+    segment_size = int(data_spool.get('segment_size', defaults.segment_size))
+    if segment_size < MIN_SPOOL_SEGMENT_SIZE:
+        raise ConfigurationError(f'Invalid spool segment size "{segment_size}"')
+
+    max_size = int(data_spool.get('max_size', defaults.max_size))
+    if max_size < 2 * segment_size:
+        raise ConfigurationError(
+            f'Invalid spool size "{max_size}" (must be at least twice the '
+            'segment size)'
+        )
+
+    replay_rate = float(data_spool.get('replay_rate', defaults.replay_rate))
+    if replay_rate <= 0:
+        raise ConfigurationError(f'Invalid spool replay rate "{replay_rate}"')
+
+    return SpoolConfig(
+        path=defaults.path,
+        max_size=max_size,
+        segment_size=segment_size,
+        replay_rate=replay_rate,
+    )
+
+
+def _get_history_config(data: dict[str, Any]) -> Optional[HistoryConfig]:
+    data_history = data.get('history', {})
+    if not data_history.get('enabled', False):
+        return None
+
+    defaults = HistoryConfig()
+
+    max_messages = int(
+        data_history.get('max_messages', defaults.max_messages)
+    )
+    if max_messages < 1:
+        raise ConfigurationError(
+            f'Invalid history message limit "{max_messages}"'
+        )
+
+    max_bytes = int(data_history.get('max_bytes', defaults.max_bytes))
+    if max_bytes < 1:
+        raise ConfigurationError(f'Invalid history size limit "{max_bytes}"')
+
+    return HistoryConfig(max_messages=max_messages, max_bytes=max_bytes)
+
+
+def _get_format_config(data: dict[str, Any]) -> FormatConfig:
+    data_format = data.get('format', {})
+    defaults = FormatConfig()
+
+    template = data_format.get('template', defaults.template)
+    timestamp_format = data_format.get(
+        'timestamp_format', defaults.timestamp_format
+    )
+
+    colors = {}
+    for severity_name, color in data_format.get('colors', {}).items():
+        severity = _get_severity(severity_name)
+
+        if color not in COLOR_CODES:
+            raise ConfigurationError(f'Unknown color "{color}"')
+
+        colors[severity] = color
+
+    format_config = FormatConfig(
+        template=template, timestamp_format=timestamp_format, colors=colors
+    )
+
+    try:
+        compile_template(format_config)
+    except ValueError as e:
+        raise ConfigurationError(f'Invalid message template: {e}')
+
+    return format_config
+
+
+def _get_storm_config(data: dict[str, Any]) -> StormConfig:
+    data_storm = data.get('storm', {})
+    defaults = StormConfig()
+
+    window = float(data_storm.get('window', defaults.window))
+    if window <= 0:
+        raise ConfigurationError(f'Invalid storm window "{window}"')
+
+    summary_interval = float(
+        data_storm.get('summary_interval', defaults.summary_interval)
+    )
+    if summary_interval <= 0:
+        raise ConfigurationError(
+            f'Invalid storm summary interval "{summary_interval}"'
+        )
+
+    top_count = int(data_storm.get('top', defaults.top_count))
+    if top_count < 0:
+        raise ConfigurationError(f'Invalid storm top count "{top_count}"')
+
+    return StormConfig(
+        window=window, summary_interval=summary_interval, top_count=top_count
+    )
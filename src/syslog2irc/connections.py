@@ -0,0 +1,166 @@
+"""
+syslog2irc.connections
+~~~~~~~~~~~~~~~~~~~~~~
+
+Limits on TCP connections from syslog senders
+
+To keep a flood of connections (e.g. from a host that reconnects in a
+loop) from using up threads, file descriptors, and memory, the number
+of open connections is limited, overall and per source host.
+Connections beyond the limits are closed right away; with the
+threading receiver engine, before a thread is started for them.
+
+Connections on which nothing has been received for a while are closed,
+too.
+
+The messages and bytes received through each open connection are
+counted.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass
+import logging
+from threading import Lock
+from time import monotonic
+from typing import Optional
+
+from . import metrics
+from .network import format_port, Port
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TcpConfig:
+    """Limits for TCP connections (per receiving process).
+
+    The idle timeout is in seconds; `None` disables it.
+    """
+
+    max_connections: int = 1000
+    max_connections_per_host: int = 100
+    idle_timeout: Optional[float] = 600.0
+
+
+class Connection:
+    """An open TCP connection, and what has been received through it.
+
+    The counts are only updated by the connection's handler.
+    """
+
+    def __init__(self, port: Port, client_address: tuple[str, int]) -> None:
+        self.port = port
+        self.client_address = client_address
+        self.opened_at = monotonic()
+        self.messages_received = 0
+        self.bytes_received = 0
+
+    def count_received(self, message_count: int, byte_count: int) -> None:
+        self.messages_received += message_count
+        self.bytes_received += byte_count
+
+
+class ConnectionTracker:
+    """Count open connections, and refuse new ones beyond the limits.
+
+    Thread-safe.
+    """
+
+    def __init__(self, config: TcpConfig) -> None:
+        self.max_connections = config.max_connections
+        self.max_connections_per_host = config.max_connections_per_host
+        self.idle_timeout = config.idle_timeout
+
+        self._lock = Lock()
+        self._count = 0
+        self._counts_by_host: Counter[str] = Counter()
+        self._counts_by_port: Counter[Port] = Counter()
+        self._connections: dict[tuple[Port, tuple[str, int]], Connection] = {}
+
+    def open(
+        self, port: Port, client_address: tuple[str, int]
+    ) -> Optional[Connection]:
+        """Register a new connection, and return it.
+
+        Return `None` if it exceeds a limit, in which case it is to be
+        closed right away (and must not be registered as closed).
+        """
+        host = client_address[0]
+
+        with self._lock:
+            if self._count >= self.max_connections:
+                reason = 'too many connections'
+            elif self._counts_by_host[host] >= self.max_connections_per_host:
+                reason = 'too many connections from that host'
+            else:
+                reason = None
+                self._count += 1
+                self._counts_by_host[host] += 1
+                self._counts_by_port[port] += 1
+                connection = Connection(port, client_address)
+                self._connections[port, client_address] = connection
+
+        if reason is not None:
+            metrics.tcp_connections_refused.increment(port)
+            logger.info(
+                'Refused connection from %s on port %s (%s).',
+                host,
+                format_port(port),
+                reason,
+            )
+            return None
+
+        metrics.tcp_connections_accepted.increment(port)
+        return connection
+
+    def get_connection(
+        self, port: Port, client_address: tuple[str, int]
+    ) -> Connection:
+        """Return the open connection from that address to the port.
+
+        Raise `KeyError` if there is none.
+        """
+        with self._lock:
+            return self._connections[port, client_address]
+
+    def close(self, connection: Connection) -> None:
+        """Register that a connection has been closed."""
+        port = connection.port
+        host = connection.client_address[0]
+
+        with self._lock:
+            del self._connections[port, connection.client_address]
+            self._count -= 1
+
+            self._counts_by_host[host] -= 1
+            if not self._counts_by_host[host]:
+                del self._counts_by_host[host]
+
+            self._counts_by_port[port] -= 1
+            if not self._counts_by_port[port]:
+                del self._counts_by_port[port]
+
+        logger.debug(
+            'Closed connection from %s:%d on port %s after %.1f seconds, '
+            'having received %d message(s) (%d bytes).',
+            *connection.client_address,
+            format_port(port),
+            monotonic() - connection.opened_at,
+            connection.messages_received,
+            connection.bytes_received,
+        )
+
+    def get_open_counts(self) -> dict[Port, int]:
+        """Return the number of open connections per port."""
+        with self._lock:
+            return dict(self._counts_by_port)
+
+    def get_connections(self) -> list[Connection]:
+        """Return the open connections."""
+        with self._lock:
+            return list(self._connections.values())
@@ -0,0 +1,107 @@
+"""
+syslog2irc.deduplication
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Suppression of repeated identical messages
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from typing import Hashable, Iterator
+
+from syslogmp import Message as SyslogMessage
+
+from .network import Port
+
+
+@dataclass
+class _Window:
+    key: Hashable
+    closes_at: float
+    port: Port
+    source_address: tuple[str, int]
+    last_message: SyslogMessage
+    repetitions: int = 0
+
+
+@dataclass(frozen=True)
+class Repetition:
+    """A message that has been repeated (and suppressed) within a
+    window.
+    """
+
+    port: Port
+    source_address: tuple[str, int]
+    last_message: SyslogMessage
+    count: int
+
+
+class Deduplicator:
+    """Let the first of identical messages pass, and count repetitions
+    that arrive within a time window after it.
+
+    Messages are considered identical if they have been received on the
+    same port from the same source host, and if they have equal
+    hostname, severity, and text.
+    """
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._windows_by_key: dict[Hashable, _Window] = {}
+
+        # As all windows have the same length, they close in the order
+        # they have been opened.
+        self._windows: deque[_Window] = deque()
+
+    def should_pass(
+        self,
+        port: Port,
+        source_address: tuple[str, int],
+        message: SyslogMessage,
+        now: float,
+    ) -> bool:
+        """Return `True` if the message is not a repetition of a message
+        within an open window.
+
+        Windows that have closed must have been collected (see
+        `collect_closed_windows`) before.
+        """
+        key = (
+            port,
+            source_address[0],
+            message.hostname,
+            message.severity,
+            message.message,
+        )
+
+        window = self._windows_by_key.get(key)
+        if window is not None:
+            window.repetitions += 1
+            window.last_message = message
+            return False
+
+        window = _Window(key, now + self.window, port, source_address, message)
+        self._windows_by_key[key] = window
+        self._windows.append(window)
+        return True
+
+    def collect_closed_windows(self, now: float) -> Iterator[Repetition]:
+        """Close windows whose time is up, and yield those in which
+        messages have been repeated.
+        """
+        windows = self._windows
+        while windows and windows[0].closes_at <= now:
+            window = windows.popleft()
+            del self._windows_by_key[window.key]
+
+            if window.repetitions:
+                yield Repetition(
+                    port=window.port,
+                    source_address=window.source_address,
+                    last_message=window.last_message,
+                    count=window.repetitions,
+                )
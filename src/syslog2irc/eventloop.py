@@ -0,0 +1,458 @@
+"""
+syslog2irc.eventloop
+~~~~~~~~~~~~~~~~~~~~
+
+Syslog message reception on a single asyncio event loop
+
+All configured ports are served from one event loop that runs in a
+separate thread. No thread is started per message or connection.
+
+UDP ports can optionally be served in batches: On each readiness event,
+all pending datagrams are drained from the socket into a preallocated
+buffer and then passed on at once.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+import asyncio
+from asyncio import (
+    AbstractEventLoop,
+    DatagramProtocol,
+    StreamReader,
+    StreamWriter,
+)
+from functools import partial
+import logging
+import socket
+from typing import Callable, Iterable, Optional
+
+from . import metrics
+from .connections import Connection, ConnectionTracker
+from .framing import FrameSplitter, FramingError, READ_SIZE
+from .network import format_port, Port, TransportProtocol
+from .parsing import parse_message
+from .sockets import apply_socket_config, SocketConfig
+from .syslog import (
+    _handle_received_message,
+    _handle_received_messages,
+    exit_on_port_error,
+    HandleMessageCallable,
+    HandleMessagesCallable,
+    is_port_always_active,
+    IsPortActiveCallable,
+    MessageSink,
+    SIGNAL_SINK,
+)
+from .util import start_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+LISTEN_HOST = '0.0.0.0'
+
+# Maximum size of a UDP payload over IPv4
+MAX_DATAGRAM_SIZE = 65507
+
+
+class SyslogDatagramProtocol(DatagramProtocol):
+    """Protocol for syslog messages arriving via UDP."""
+
+    def __init__(
+        self,
+        port: Port,
+        handle_message: HandleMessageCallable = _handle_received_message,
+        is_port_active: IsPortActiveCallable = is_port_always_active,
+    ) -> None:
+        self.port = port
+        self.handle_message = handle_message
+        self.is_port_active = is_port_active
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        if not self.is_port_active(self.port):
+            return None
+
+        client_address = addr[:2]
+
+        try:
+            message = parse_message(data)
+        except ValueError:
+            metrics.parse_errors.increment(self.port)
+            logger.info('Invalid message received from %s:%d.', *client_address)
+            return None
+
+        self.handle_message(client_address, self.port, message)
+
+
+class DatagramDrainer:
+    """Drain pending datagrams from a UDP socket and pass them on as a
+    batch.
+
+    A single receive buffer is allocated up front and reused for every
+    datagram.
+
+    Datagrams for an inactive port are still received (to keep them from
+    piling up in the socket buffer) but are discarded without parsing.
+    """
+
+    def __init__(
+        self,
+        port: Port,
+        sock: socket.socket,
+        batch_size: int,
+        handle_messages: HandleMessagesCallable = _handle_received_messages,
+        is_port_active: IsPortActiveCallable = is_port_always_active,
+    ) -> None:
+        self.port = port
+        self.sock = sock
+        self.batch_size = batch_size
+        self.handle_messages = handle_messages
+        self.is_port_active = is_port_active
+        self.buffer = memoryview(bytearray(MAX_DATAGRAM_SIZE))
+
+    def drain(self) -> None:
+        """Receive up to the batch size of datagrams without blocking.
+
+        Stopping at the batch size keeps a busy port from starving the
+        other ports served by the event loop. If more datagrams are
+        pending, the socket is reported as readable again right away.
+        """
+        recvfrom_into = self.sock.recvfrom_into
+        buffer = self.buffer
+        is_active = self.is_port_active(self.port)
+        messages = []
+
+        for _ in range(self.batch_size):
+            try:
+                nbytes, addr = recvfrom_into(buffer)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                logger.warning(
+                    'Error receiving on port %s: %s', format_port(self.port), e
+                )
+                break
+
+            if not is_active:
+                continue
+
+            client_address = addr[:2]
+
+            try:
+                message = parse_message(buffer[:nbytes])
+            except ValueError:
+                metrics.parse_errors.increment(self.port)
+                logger.info(
+                    'Invalid message received from %s:%d.', *client_address
+                )
+                continue
+
+            messages.append((client_address, message))
+
+        if messages:
+            self.handle_messages(self.port, messages)
+
+
+async def handle_tcp_connection(
+    port: Port,
+    handle_message: HandleMessageCallable,
+    is_port_active: IsPortActiveCallable,
+    connection_tracker: Optional[ConnectionTracker],
+    reader: StreamReader,
+    writer: StreamWriter,
+) -> None:
+    """Handle syslog messages arriving via a TCP connection."""
+    client_address = writer.get_extra_info('peername')[:2]
+
+    if connection_tracker is None:
+        connection = None
+        idle_timeout = None
+    else:
+        connection = connection_tracker.open(port, client_address)
+        if connection is None:
+            writer.close()
+            return None
+        idle_timeout = connection_tracker.idle_timeout
+
+    try:
+        await _receive_via_tcp(
+            port,
+            handle_message,
+            is_port_active,
+            idle_timeout,
+            client_address,
+            connection,
+            reader,
+        )
+    except asyncio.TimeoutError:
+        metrics.tcp_connections_timed_out.increment(port)
+        logger.info('Closing idle connection from %s:%d.', *client_address)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        if connection_tracker is not None and connection is not None:
+            connection_tracker.close(connection)
+
+
+async def _receive_via_tcp(
+    port: Port,
+    handle_message: HandleMessageCallable,
+    is_port_active: IsPortActiveCallable,
+    idle_timeout: Optional[float],
+    client_address: tuple[str, int],
+    connection: Optional[Connection],
+    reader: StreamReader,
+) -> None:
+    frame_splitter = FrameSplitter()
+
+    while True:
+        if idle_timeout is None:
+            data = await reader.read(READ_SIZE)
+        else:
+            data = await asyncio.wait_for(reader.read(READ_SIZE), idle_timeout)
+
+        try:
+            if data:
+                frames = frame_splitter.feed(data)
+            else:
+                # The connection has been closed.
+                frames = frame_splitter.finish()
+        except FramingError:
+            metrics.parse_errors.increment(port)
+            logger.info(
+                'Invalid framing of messages received from %s:%d.',
+                *client_address,
+            )
+            return None
+
+        if connection is not None:
+            connection.count_received(len(frames), len(data))
+
+        if frames and is_port_active(port):
+            for frame in frames:
+                try:
+                    message = parse_message(frame)
+                except ValueError:
+                    metrics.parse_errors.increment(port)
+                    logger.info(
+                        'Invalid message received from %s:%d.',
+                        *client_address,
+                    )
+                    continue
+
+                handle_message(client_address, port, message)
+
+        if not data:
+            return None
+
+
+def create_socket(
+    port: Port,
+    *,
+    reuse_port: bool = False,
+    socket_config: Optional[SocketConfig] = None,
+) -> socket.socket:
+    """Create a non-blocking socket bound to the port.
+
+    With `reuse_port`, multiple sockets (usually in different processes)
+    can be bound to the same port, and the kernel distributes incoming
+    datagrams and connections among them.
+    """
+    if port.transport_protocol == TransportProtocol.TCP:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    elif port.transport_protocol == TransportProtocol.UDP:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    else:
+        raise ValueError(f'Unsupported transport protocol')
+
+    try:
+        if port.transport_protocol == TransportProtocol.TCP:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if socket_config is not None:
+            apply_socket_config(sock, port, socket_config)
+        sock.setblocking(False)
+        sock.bind((LISTEN_HOST, port.number))
+    except OSError:
+        sock.close()
+        raise
+
+    return sock
+
+
+async def open_port(
+    loop: AbstractEventLoop,
+    port: Port,
+    sock: socket.socket,
+    udp_batch_size: Optional[int],
+    handle_message: HandleMessageCallable,
+    handle_messages: HandleMessagesCallable,
+    is_port_active: IsPortActiveCallable,
+    connection_tracker: Optional[ConnectionTracker] = None,
+) -> Callable[[], None]:
+    """Start serving a port's bound socket on the event loop.
+
+    Return a function that stops serving it (and closes the socket).
+    """
+    if port.transport_protocol == TransportProtocol.TCP:
+        handle_connection = partial(
+            handle_tcp_connection,
+            port,
+            handle_message,
+            is_port_active,
+            connection_tracker,
+        )
+        server = await asyncio.start_server(handle_connection, sock=sock)
+        return server.close
+    elif udp_batch_size:
+        drainer = DatagramDrainer(
+            port, sock, udp_batch_size, handle_messages, is_port_active
+        )
+        loop.add_reader(sock, drainer.drain)
+
+        def close() -> None:
+            loop.remove_reader(sock)
+            sock.close()
+
+        return close
+    else:
+        protocol_factory = partial(
+            SyslogDatagramProtocol, port, handle_message, is_port_active
+        )
+        transport, _ = await loop.create_datagram_endpoint(
+            protocol_factory, sock=sock
+        )
+        return transport.close
+
+
+def create_event_loop(
+    ports_and_sockets: Iterable[tuple[Port, socket.socket]],
+    *,
+    udp_batch_size: Optional[int] = None,
+    handle_message: HandleMessageCallable = _handle_received_message,
+    handle_messages: HandleMessagesCallable = _handle_received_messages,
+    is_port_active: IsPortActiveCallable = is_port_always_active,
+    connection_tracker: Optional[ConnectionTracker] = None,
+) -> AbstractEventLoop:
+    """Create an event loop that serves the bound sockets once run."""
+    loop = asyncio.new_event_loop()
+
+    for port, sock in ports_and_sockets:
+        coroutine = open_port(
+            loop,
+            port,
+            sock,
+            udp_batch_size,
+            handle_message,
+            handle_messages,
+            is_port_active,
+            connection_tracker,
+        )
+        loop.run_until_complete(coroutine)
+
+    return loop
+
+
+class EventLoopReceivers:
+    """Ports served by an event loop, which can be opened and closed
+    (from other threads) while the loop runs.
+    """
+
+    def __init__(
+        self,
+        loop: AbstractEventLoop,
+        *,
+        udp_batch_size: Optional[int] = None,
+        is_port_active: IsPortActiveCallable = is_port_always_active,
+        sink: MessageSink = SIGNAL_SINK,
+        connection_tracker: Optional[ConnectionTracker] = None,
+        socket_configs: Optional[dict[Port, SocketConfig]] = None,
+    ) -> None:
+        self.loop = loop
+        self.udp_batch_size = udp_batch_size
+        self.is_port_active = is_port_active
+        self.sink = sink
+        self.connection_tracker = connection_tracker
+        self.socket_configs = socket_configs or {}
+        self._closers: dict[Port, Callable[[], None]] = {}
+
+    def open_port(self, port: Port) -> None:
+        """Bind the port, and serve it on the event loop.
+
+        Raise `OSError` if the port cannot be opened.
+        """
+        sock = create_socket(
+            port, socket_config=self.socket_configs.get(port)
+        )
+
+        coroutine = open_port(
+            self.loop,
+            port,
+            sock,
+            self.udp_batch_size,
+            self.sink.handle_message,
+            self.sink.handle_messages,
+            self.is_port_active,
+            self.connection_tracker,
+        )
+        if self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+            self._closers[port] = future.result()
+        else:
+            self._closers[port] = self.loop.run_until_complete(coroutine)
+
+        logger.info(
+            'Listening for syslog messages on %s:%s.',
+            LISTEN_HOST,
+            format_port(port),
+        )
+
+    def close_port(self, port: Port) -> None:
+        """Stop serving the port.
+
+        Connections that have already been accepted are served until
+        the client closes them.
+        """
+        close = self._closers.pop(port)
+        self.loop.call_soon_threadsafe(close)
+        logger.info(
+            'Stopped listening for syslog messages on %s.', format_port(port)
+        )
+
+
+def start_syslog_message_receivers(
+    ports: Iterable[Port],
+    *,
+    udp_batch_size: Optional[int] = None,
+    is_port_active: IsPortActiveCallable = is_port_always_active,
+    sink: MessageSink = SIGNAL_SINK,
+    connection_tracker: Optional[ConnectionTracker] = None,
+    socket_configs: Optional[dict[Port, SocketConfig]] = None,
+) -> EventLoopReceivers:
+    """Serve all ports from one event loop, in a separate thread.
+
+    Ports are opened before this function returns so that errors are
+    reported right away.
+    """
+    receivers = EventLoopReceivers(
+        asyncio.new_event_loop(),
+        udp_batch_size=udp_batch_size,
+        is_port_active=is_port_active,
+        sink=sink,
+        connection_tracker=connection_tracker,
+        socket_configs=socket_configs,
+    )
+
+    for port in ports:
+        try:
+            receivers.open_port(port)
+        except OSError as e:
+            exit_on_port_error(port, e)
+
+    start_thread(receivers.loop.run_forever, 'EventLoopReceiver')
+
+    return receivers
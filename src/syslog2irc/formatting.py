@@ -4,13 +4,22 @@ syslog2irc.formatting
 
 Message formatting
 
+Besides the fixed default format, messages can be formatted according to
+a configurable template that is compiled once at startup.
+
 :Copyright: 2007-2021 Jochen Kupperschmidt
 :License: MIT, see LICENSE for details.
 """
 
 from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import datetime
+from string import Formatter
+from typing import Optional
+
+from syslogmp import Message as SyslogMessage, Severity
 
-from syslogmp import Message as SyslogMessage
+from .parsing import NIL_VALUE
 
 
 MESSAGE_TEXT_ENCODING = 'utf-8'
@@ -42,3 +51,218 @@ def format_message(
         f'({message.hostname}) '
         f'[{severity_name}]: {text}'
     )
+
+
+DEFAULT_TEMPLATE = (
+    '{source_host}:{source_port} [{timestamp}] ({hostname}) '
+    '[{severity}]: {text}'
+)
+DEFAULT_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Fields that only depend on where a message comes from
+SOURCE_FIELD_NAMES = frozenset(['source_host', 'source_port', 'hostname'])
+
+# Fields that differ from message to message
+MESSAGE_FIELD_NAMES = frozenset(
+    [
+        'timestamp',
+        'severity',
+        'facility',
+        'app_name',
+        'structured_data',
+        'text',
+    ]
+)
+
+# maximum number of sources to cache rendered parts of lines for
+MAX_CACHED_SOURCES = 1024
+
+# color codes as understood by most IRC clients
+COLOR_CODES = {
+    'white': 0,
+    'black': 1,
+    'blue': 2,
+    'green': 3,
+    'red': 4,
+    'brown': 5,
+    'purple': 6,
+    'orange': 7,
+    'yellow': 8,
+    'light_green': 9,
+    'cyan': 10,
+    'light_cyan': 11,
+    'light_blue': 12,
+    'pink': 13,
+    'grey': 14,
+    'light_grey': 15,
+}
+COLOR_START = '\x03'
+COLOR_RESET = '\x0f'
+
+
+@dataclass(frozen=True)
+class FormatConfig:
+    """A message format configuration.
+
+    Colors are specified by severity.
+    """
+
+    template: str = DEFAULT_TEMPLATE
+    timestamp_format: str = DEFAULT_TIMESTAMP_FORMAT
+    colors: dict[Severity, str] = field(default_factory=dict)
+
+
+class CompiledTemplate:
+    """Format syslog messages according to a template.
+
+    For each source (address and hostname), the template is rendered
+    once with the source's fields into a %-style format string, in which
+    the message fields are then interpolated per message. Timestamps are
+    only formatted when they differ from the previous message's.
+    """
+
+    def __init__(self, config: FormatConfig) -> None:
+        self._partial_template, self.message_field_names = _split_template(
+            config.template
+        )
+        self.timestamp_format = config.timestamp_format
+        self._color_prefixes = {
+            severity: f'{COLOR_START}{COLOR_CODES[color]:02d}'
+            for severity, color in config.colors.items()
+        }
+
+        self._format_strings_by_source: dict[
+            tuple[tuple[str, int], str], str
+        ] = {}
+        self._last_timestamp: Optional[datetime] = None
+        self._last_formatted_timestamp = ''
+
+        getters_by_field_name = {
+            'timestamp': self._format_timestamp,
+            'severity': _get_severity_name,
+            'facility': _get_facility_name,
+            'app_name': _get_app_name,
+            'structured_data': _get_structured_data,
+            'text': _get_text,
+        }
+        self._getters = [
+            getters_by_field_name[name] for name in self.message_field_names
+        ]
+
+    def __call__(
+        self, source_address: tuple[str, int], message: SyslogMessage
+    ) -> str:
+        key = (source_address, message.hostname)
+        format_string = self._format_strings_by_source.get(key)
+        if format_string is None:
+            format_string = self._render_source(source_address, message)
+
+        line = format_string % tuple([get(message) for get in self._getters])
+
+        color_prefix = self._color_prefixes.get(message.severity)
+        if color_prefix is not None:
+            line = f'{color_prefix}{line}{COLOR_RESET}'
+
+        return line
+
+    def _render_source(
+        self, source_address: tuple[str, int], message: SyslogMessage
+    ) -> str:
+        def escape(value: str) -> str:
+            return value.replace('%', '%%')
+
+        format_string = self._partial_template.format(
+            source_host=escape(source_address[0]),
+            source_port=source_address[1],
+            hostname=escape(message.hostname),
+        )
+
+        if len(self._format_strings_by_source) >= MAX_CACHED_SOURCES:
+            self._format_strings_by_source.clear()
+        key = (source_address, message.hostname)
+        self._format_strings_by_source[key] = format_string
+
+        return format_string
+
+    def _format_timestamp(self, message: SyslogMessage) -> str:
+        timestamp = message.timestamp
+        if timestamp != self._last_timestamp:
+            self._last_formatted_timestamp = timestamp.strftime(
+                self.timestamp_format
+            )
+            self._last_timestamp = timestamp
+        return self._last_formatted_timestamp
+
+
+def _get_severity_name(message: SyslogMessage) -> str:
+    return message.severity.name
+
+
+def _get_facility_name(message: SyslogMessage) -> str:
+    return message.facility.name
+
+
+def _get_app_name(message: SyslogMessage) -> str:
+    # Only RFC 5424 messages have an app name.
+    return getattr(message, 'app_name', NIL_VALUE)
+
+
+def _get_structured_data(message: SyslogMessage) -> str:
+    # Only RFC 5424 messages have structured data.
+    raw_structured_data = getattr(message, 'raw_structured_data', None)
+    if raw_structured_data is None:
+        return NIL_VALUE
+    return raw_structured_data.decode(MESSAGE_TEXT_ENCODING, 'replace')
+
+
+def _get_text(message: SyslogMessage) -> str:
+    # Remove leading and trailing newlines (see `format_message`).
+    return message.message.decode(MESSAGE_TEXT_ENCODING).strip('\n')
+
+
+def _split_template(template: str) -> tuple[str, list[str]]:
+    """Turn the template into one in which message fields have been
+    replaced by `%s`, and return it along with the names of those fields
+    in order of appearance.
+
+    Raise `ValueError` if the template is invalid.
+    """
+    partial_template_parts = []
+    message_field_names = []
+
+    for literal_text, field_name, format_spec, conversion in Formatter().parse(
+        template
+    ):
+        partial_template_parts.append(
+            literal_text.replace('{', '{{')
+            .replace('}', '}}')
+            .replace('%', '%%')
+        )
+
+        if field_name is None:
+            continue
+
+        if format_spec or conversion:
+            raise ValueError(
+                f'Field "{field_name}" must not have a format specification '
+                'or conversion.'
+            )
+
+        if field_name in SOURCE_FIELD_NAMES:
+            partial_template_parts.append(f'{{{field_name}}}')
+        elif field_name in MESSAGE_FIELD_NAMES:
+            partial_template_parts.append('%s')
+            message_field_names.append(field_name)
+        else:
+            raise ValueError(f'Unknown field "{field_name}"')
+
+    return ''.join(partial_template_parts), message_field_names
+
+
+def compile_template(config: FormatConfig) -> CompiledTemplate:
+    """Return a callable that formats syslog messages to be displayed on
+    IRC according to the configuration.
+
+    Raise `ValueError` if the template is invalid.
+    """
+    return CompiledTemplate(config)
@@ -0,0 +1,157 @@
+"""
+syslog2irc.framing
+~~~~~~~~~~~~~~~~~~
+
+Splitting of TCP streams into syslog messages (RFC 6587)
+
+Two framing methods are in use:
+
+- octet counting: each message is preceded by its length in bytes (as
+  decimal digits) and a space; messages may contain line breaks
+- non-transparent framing: each message is terminated by a line feed
+
+Which one a sender uses is detected from the first byte it sends: A
+message on its own starts with `<`, a length with a digit.
+
+Data is read in large chunks, and messages are cut out of the buffer
+via memoryviews instead of reading line by line.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from enum import Enum
+from typing import Optional
+
+
+# number of bytes to read from a connection at once
+READ_SIZE = 64 * 1024
+
+# Longer messages are considered a protocol error (instead of being
+# buffered without limit).
+MAX_FRAME_LENGTH = 64 * 1024
+
+MAX_LENGTH_DIGITS = len(str(MAX_FRAME_LENGTH))
+
+DIGITS = frozenset(b'0123456789')
+
+
+Framing = Enum('Framing', ['OCTET_COUNTING', 'NON_TRANSPARENT'])
+
+
+class FramingError(ValueError):
+    """The stream cannot be split into messages."""
+
+
+def detect_framing(first_byte: int) -> Framing:
+    """Return the framing method, judging from the first byte sent on a
+    connection.
+    """
+    if first_byte in DIGITS:
+        return Framing.OCTET_COUNTING
+
+    return Framing.NON_TRANSPARENT
+
+
+class FrameSplitter:
+    """Split the data received on a single connection into messages."""
+
+    def __init__(self, *, max_frame_length: int = MAX_FRAME_LENGTH) -> None:
+        self.max_frame_length = max_frame_length
+        self.framing: Optional[Framing] = None
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """Add received data, and return the messages completed by it.
+
+        Raise `FramingError` if the data does not fit the framing.
+        """
+        buffer = self._buffer
+        buffer += data
+
+        if self.framing is None:
+            if not buffer:
+                return []
+            self.framing = detect_framing(buffer[0])
+
+        view = memoryview(buffer)
+        try:
+            if self.framing == Framing.OCTET_COUNTING:
+                frames, end = self._split_octet_counted(buffer, view)
+            else:
+                frames, end = self._split_non_transparent(buffer, view)
+        finally:
+            # A bytearray cannot be resized while a view on it exists.
+            view.release()
+
+        del buffer[:end]
+        return frames
+
+    def finish(self) -> list[bytes]:
+        """Return the last message if the connection has been closed
+        without terminating it.
+
+        Raise `FramingError` if an octet-counted message is incomplete.
+        """
+        buffer = self._buffer
+        if not buffer:
+            return []
+
+        if self.framing == Framing.OCTET_COUNTING:
+            raise FramingError('Last message is incomplete.')
+
+        frames = [bytes(buffer)]
+        buffer.clear()
+        return frames
+
+    def _split_octet_counted(
+        self, buffer: bytearray, view: memoryview
+    ) -> tuple[list[bytes], int]:
+        frames = []
+        start = 0
+        buffer_length = len(buffer)
+
+        while start < buffer_length:
+            space = buffer.find(b' ', start, start + MAX_LENGTH_DIGITS + 1)
+            if space == -1:
+                if buffer_length - start > MAX_LENGTH_DIGITS:
+                    raise FramingError('Message length is missing.')
+                break
+
+            length_digits = view[start:space]
+            if not length_digits or not DIGITS.issuperset(length_digits):
+                raise FramingError('Message length is invalid.')
+
+            length = int(length_digits.tobytes())
+            if length > self.max_frame_length:
+                raise FramingError(f'Message is too long ({length:d} bytes).')
+
+            end = space + 1 + length
+            if end > buffer_length:
+                break
+
+            frames.append(view[space + 1 : end].tobytes())
+            start = end
+
+        return frames, start
+
+    def _split_non_transparent(
+        self, buffer: bytearray, view: memoryview
+    ) -> tuple[list[bytes], int]:
+        frames = []
+        start = 0
+
+        while True:
+            end = buffer.find(b'\n', start)
+            if end == -1:
+                if len(buffer) - start > self.max_frame_length:
+                    raise FramingError('Message is too long.')
+                break
+
+            if end > start:
+                # Skip empty lines.
+                frames.append(view[start:end].tobytes())
+            start = end + 1
+
+        return frames, start
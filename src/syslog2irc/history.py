@@ -0,0 +1,216 @@
+"""
+syslog2irc.history
+~~~~~~~~~~~~~~~~~~
+
+History of recently announced messages per channel
+
+Users who join a channel after the fact can ask the bot for the last
+messages, optionally only those from a certain host and/or of a minimum
+severity (e.g. `!last 20 host=web1 sev>=err`).
+
+Each channel's history is a ring of a fixed number of slots, further
+limited by the total size of the texts in it. Messages are numbered in
+order of arrival, and indexed by hostname and by severity, so queries
+do not need to look at non-matching messages.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+import heapq
+from itertools import islice
+from threading import Lock
+from typing import Iterable, Iterator, Optional
+
+from syslogmp import Severity
+
+from .routing import parse_severity
+
+
+TEXT_ENCODING = 'utf-8'
+
+COMMAND = '!last'
+DEFAULT_QUERY_COUNT = 10
+MAX_QUERY_COUNT = 50
+
+
+@dataclass(frozen=True)
+class HistoryConfig:
+    """A message history configuration (limits per channel)."""
+
+    max_messages: int = 1000
+    max_bytes: int = 256 * 1024
+
+
+@dataclass(frozen=True)
+class HistoryQuery:
+    """Which of the recent messages to return."""
+
+    count: int = DEFAULT_QUERY_COUNT
+    hostname: Optional[str] = None
+    min_severity: Optional[Severity] = None
+
+
+def parse_query(text: str) -> HistoryQuery:
+    """Parse the arguments to the command, e.g. `20 host=web1 sev>=err`.
+
+    Raise `ValueError` if invalid.
+    """
+    count = DEFAULT_QUERY_COUNT
+    hostname = None
+    min_severity = None
+
+    for argument in text.split():
+        if argument.isdigit():
+            count = min(int(argument), MAX_QUERY_COUNT)
+        elif argument.startswith('host='):
+            hostname = argument[len('host=') :]
+        elif argument.startswith('sev>='):
+            min_severity = parse_severity(argument[len('sev>=') :])
+        else:
+            raise ValueError(f'Unknown argument "{argument}"')
+
+    return HistoryQuery(count, hostname, min_severity)
+
+
+class ChannelHistory:
+    """Recent messages to a single channel.
+
+    Not thread-safe on its own.
+    """
+
+    def __init__(self, config: HistoryConfig) -> None:
+        self.max_bytes = config.max_bytes
+        self._capacity = config.max_messages
+        # Each slot holds the hostname, the severity value, and the
+        # encoded text of a message (or `None`).
+        self._slots: list[Optional[tuple[str, int, bytes]]] = [
+            None
+        ] * self._capacity
+        self._oldest_number = 0
+        self._next_number = 0
+        self._size = 0
+        self._numbers_by_hostname: dict[str, deque[int]] = {}
+        self._numbers_by_severity: list[deque[int]] = [
+            deque() for _ in Severity
+        ]
+
+    def __len__(self) -> int:
+        return self._next_number - self._oldest_number
+
+    def add(self, hostname: str, severity: Severity, text: str) -> None:
+        data = text.encode(TEXT_ENCODING)
+
+        while len(self) >= self._capacity or (
+            len(self) and self._size + len(data) > self.max_bytes
+        ):
+            self._evict_oldest()
+
+        number = self._next_number
+        self._next_number += 1
+        self._slots[number % self._capacity] = (hostname, severity.value, data)
+        self._size += len(data)
+
+        numbers = self._numbers_by_hostname.get(hostname)
+        if numbers is None:
+            numbers = self._numbers_by_hostname[hostname] = deque()
+        numbers.append(number)
+        self._numbers_by_severity[severity.value].append(number)
+
+    def _evict_oldest(self) -> None:
+        number = self._oldest_number
+        self._oldest_number += 1
+
+        index = number % self._capacity
+        hostname, severity_value, data = self._slots[index]
+        self._slots[index] = None
+        self._size -= len(data)
+
+        # Indexes are in order of arrival, so the oldest message comes
+        # first.
+        numbers = self._numbers_by_hostname[hostname]
+        numbers.popleft()
+        if not numbers:
+            del self._numbers_by_hostname[hostname]
+        self._numbers_by_severity[severity_value].popleft()
+
+    def query(self, query: HistoryQuery) -> list[str]:
+        """Return the texts of the last matching messages, oldest
+        first.
+        """
+        numbers = islice(self._iter_matching_numbers(query), query.count)
+        texts = [
+            self._slots[number % self._capacity][2].decode(TEXT_ENCODING)
+            for number in numbers
+        ]
+        texts.reverse()
+        return texts
+
+    def _iter_matching_numbers(self, query: HistoryQuery) -> Iterator[int]:
+        """Yield the numbers of matching messages, newest first."""
+        if query.hostname is not None:
+            numbers: Iterable[int] = reversed(
+                self._numbers_by_hostname.get(query.hostname, ())
+            )
+            if query.min_severity is None:
+                return iter(numbers)
+
+            max_severity_value = query.min_severity.value
+            return (
+                number
+                for number in numbers
+                if self._slots[number % self._capacity][1]
+                <= max_severity_value
+            )
+
+        if query.min_severity is not None:
+            # Merge the indexes of the severities in question.
+            return heapq.merge(
+                *[
+                    reversed(self._numbers_by_severity[value])
+                    for value in range(query.min_severity.value + 1)
+                ],
+                reverse=True,
+            )
+
+        return iter(range(self._next_number - 1, self._oldest_number - 1, -1))
+
+
+class MessageHistory:
+    """Recent messages per channel.
+
+    Messages are added from the main thread, and queried from the IRC
+    bot's thread.
+    """
+
+    def __init__(self, config: HistoryConfig) -> None:
+        self.config = config
+        self._channel_histories: dict[str, ChannelHistory] = {}
+        self._lock = Lock()
+
+    def add(
+        self,
+        channel_names: Iterable[str],
+        hostname: str,
+        severity: Severity,
+        text: str,
+    ) -> None:
+        with self._lock:
+            for channel_name in channel_names:
+                channel_history = self._channel_histories.get(channel_name)
+                if channel_history is None:
+                    channel_history = ChannelHistory(self.config)
+                    self._channel_histories[channel_name] = channel_history
+
+                channel_history.add(hostname, severity, text)
+
+    def query(self, channel_name: str, query: HistoryQuery) -> list[str]:
+        with self._lock:
+            channel_history = self._channel_histories.get(channel_name)
+            if channel_history is None:
+                return []
+
+            return channel_history.query(query)
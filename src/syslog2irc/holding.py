@@ -0,0 +1,88 @@
+"""
+syslog2irc.holding
+~~~~~~~~~~~~~~~~~~
+
+Holding of messages for channels that have been left temporarily
+
+After a kick or a disconnect, the bot usually is back in the channel
+within seconds. Messages for the channel are held until then instead of
+being sent into the void.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter, deque
+
+
+# seconds to hold a message before giving up on it
+DEFAULT_MAX_AGE = 60.0
+
+# maximum number of messages to hold per channel
+DEFAULT_MAX_COUNT = 100
+
+
+class MessageHolder:
+    """Hold texts per channel, for a limited time.
+
+    If more texts are held for a channel than allowed, the oldest one is
+    dropped.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_age: float = DEFAULT_MAX_AGE,
+        max_count: int = DEFAULT_MAX_COUNT,
+    ) -> None:
+        self.max_age = max_age
+        self.max_count = max_count
+        self._texts_by_channel_name: dict[str, deque[tuple[float, str]]] = {}
+        self._dropped_counts: Counter[str] = Counter()
+
+    def __bool__(self) -> bool:
+        return bool(self._texts_by_channel_name)
+
+    def get_channel_names(self) -> list[str]:
+        """Return the names of the channels texts are held for."""
+        return list(self._texts_by_channel_name)
+
+    def hold(self, channel_name: str, text: str, now: float) -> None:
+        """Hold the text for the channel."""
+        texts = self._texts_by_channel_name.get(channel_name)
+        if texts is None:
+            texts = self._texts_by_channel_name[channel_name] = deque()
+
+        if len(texts) >= self.max_count:
+            texts.popleft()
+            self._dropped_counts[channel_name] += 1
+
+        texts.append((now, text))
+
+    def release(self, channel_name: str) -> list[str]:
+        """Remove and return the texts held for the channel, oldest
+        first.
+        """
+        texts = self._texts_by_channel_name.pop(channel_name, ())
+        return [text for _, text in texts]
+
+    def expire(self, now: float) -> None:
+        """Drop texts that have been held for too long."""
+        held_since = now - self.max_age
+
+        for channel_name, texts in list(self._texts_by_channel_name.items()):
+            while texts and texts[0][0] <= held_since:
+                texts.popleft()
+                self._dropped_counts[channel_name] += 1
+
+            if not texts:
+                del self._texts_by_channel_name[channel_name]
+
+    def take_dropped_counts(self) -> Counter[str]:
+        """Return the number of texts dropped per channel since the last
+        call, and reset the counts.
+        """
+        dropped_counts = self._dropped_counts
+        self._dropped_counts = Counter()
+        return dropped_counts
@@ -9,16 +9,17 @@ Internet Relay Chat
 """
 
 from __future__ import annotations
+from collections import Counter
 from dataclasses import dataclass
+from enum import Enum
 import logging
-import ssl
-from typing import Optional, Union
+from typing import Any, Optional, TYPE_CHECKING, Union
 
-from irc.bot import ServerSpec, SingleServerIRCBot
-from irc.connection import Factory
+from .signals import irc_channel_joined, irc_channel_left
 
-from .signals import irc_channel_joined
-from .util import start_thread
+
+if TYPE_CHECKING:
+    from .ircbot import Bot
 
 
 logger = logging.getLogger(__name__)
@@ -37,10 +38,18 @@ class IrcServer:
 
 @dataclass(frozen=True, order=True)
 class IrcChannel:
-    """An IRC channel with optional password."""
+    """An IRC channel with optional password.
+
+    The weight determines the channel's share of the send rate when
+    multiple channels have messages waiting to be sent.
+    """
 
     name: str
     password: Optional[str] = None
+    weight: int = 1
+
+
+ChannelAssignment = Enum('ChannelAssignment', ['ROUND_ROBIN', 'BALANCED'])
 
 
 @dataclass(frozen=True)
@@ -52,96 +61,73 @@ class IrcConfig:
     realname: str
     commands: list[str]
     channels: set[IrcChannel]
+    connections: int = 1
+    channel_assignment: ChannelAssignment = ChannelAssignment.ROUND_ROBIN
 
 
-class Bot(SingleServerIRCBot):
-    """An IRC bot to forward messages to IRC channels."""
-
-    def __init__(
-        self,
-        server: IrcServer,
-        nickname: str,
-        realname: str,
-        commands: list[str],
-        channels: set[IrcChannel],
-    ) -> None:
-        logger.info(
-            'Connecting to IRC server %s:%d ...', server.host, server.port
-        )
-
-        server_spec = ServerSpec(server.host, server.port, server.password)
-        factory = Factory(wrapper=ssl.wrap_socket) if server.ssl else Factory()
-        SingleServerIRCBot.__init__(
-            self, [server_spec], nickname, realname, connect_factory=factory
-        )
-
-        if server.rate_limit is not None:
-            logger.info(
-                'IRC send rate limit set to %.2f messages per second.',
-                server.rate_limit,
-            )
-            self.connection.set_rate_limit(server.rate_limit)
-        else:
-            logger.info('No IRC send rate limit set.')
+class BotPool:
+    """A number of bots, each with its own connection to the server and
+    its own share of the channels.
 
-        self.commands = commands
+    As servers apply flood limits per connection, this multiplies the
+    rate at which messages can be sent.
+    """
 
-        # Note: `self.channels` already exists in super class.
-        self.channels_to_join = channels
+    def __init__(self, bots: list[Bot]) -> None:
+        self.bots = bots
+        self.bots_by_channel_name = {
+            channel.name: bot
+            for bot in bots
+            for channel in bot.channels_to_join
+        }
 
     def start(self) -> None:
-        """Connect to the server, in a separate thread."""
-        start_thread(super().start, self.__class__.__name__)
-
-    def get_version(self) -> str:
-        """Return this on CTCP VERSION requests."""
-        return 'syslog2IRC'
-
-    def on_welcome(self, conn, event) -> None:
-        """Join channels after connect."""
-        logger.info(
-            'Connected to IRC server %s:%d.', *conn.socket.getpeername()
-        )
-
-        self._send_custom_commands_after_welcome(conn)
-        self._join_channels(conn)
-
-    def _send_custom_commands_after_welcome(self, conn):
-        """Send custom commands after having been welcomed by the server."""
-        for command in self.commands:
-            conn.send_raw(command)
-
-    def _join_channels(self, conn):
-        """Join the configured channels."""
-        channels = sorted(self.channels_to_join)
-        logger.info('Channels to join: %s', ', '.join(c.name for c in channels))
-
-        for channel in channels:
-            logger.info('Joining channel %s ...', channel.name)
-            conn.join(channel.name, channel.password or '')
-
-    def on_nicknameinuse(self, conn, event) -> None:
-        """Choose another nickname if conflicting."""
-        self._nickname += '_'
-        conn.nick(self._nickname)
-
-    def on_join(self, conn, event) -> None:
-        """Successfully joined channel."""
-        joined_nick = event.source.nick
-        channel_name = event.target
-
-        if joined_nick == self._nickname:
-            logger.info('Joined IRC channel: %s', channel_name)
-            irc_channel_joined.send(channel_name=channel_name)
-
-    def on_badchannelkey(self, conn, event) -> None:
-        """Channel could not be joined due to wrong password."""
-        channel_name = event.arguments[0]
-        logger.warning('Cannot join channel %s (bad key).', channel_name)
+        for bot in self.bots:
+            bot.start()
+
+    def join_channel(self, channel: IrcChannel) -> None:
+        """Add a channel to join, via the bot that has joined it already
+        (if it is only changed) or else the one with the fewest
+        channels.
+        """
+        bot = self.bots_by_channel_name.get(channel.name)
+        if bot is None:
+            bot = min(self.bots, key=lambda bot: len(bot.channels_to_join))
+        bot.join_channel(channel)
+        self.bots_by_channel_name = {
+            **self.bots_by_channel_name,
+            channel.name: bot,
+        }
+
+    def part_channel(self, channel_name: str) -> None:
+        bots_by_channel_name = dict(self.bots_by_channel_name)
+        bot = bots_by_channel_name.pop(channel_name, None)
+        if bot is None:
+            return
+
+        bot.part_channel(channel_name)
+        self.bots_by_channel_name = bots_by_channel_name
 
     def say(self, channel_name: str, text: str) -> None:
-        """Say message on channel."""
-        self.connection.privmsg(channel_name, text)
+        """Say message on channel, via the bot that has joined it."""
+        bot = self.bots_by_channel_name.get(channel_name, self.bots[0])
+        bot.say(channel_name, text)
+
+    def take_dropped_counts(self) -> Counter[str]:
+        dropped_counts: Counter[str] = Counter()
+        for bot in self.bots:
+            dropped_counts.update(bot.take_dropped_counts())
+        return dropped_counts
+
+    def get_queue_sizes(self) -> dict[str, int]:
+        queue_sizes = {}
+        for bot in self.bots:
+            queue_sizes.update(bot.get_queue_sizes())
+        return queue_sizes
+
+    def disconnect(self, msg: str) -> None:
+        for bot in self.bots:
+            bot.disconnect(msg)
 
 
 class DummyBot:
@@ -155,20 +141,44 @@ class DummyBot:
         for channel in sorted(self.channels):
             irc_channel_joined.send(channel_name=channel.name)
 
+    def join_channel(self, channel: IrcChannel) -> None:
+        is_new = channel.name not in {c.name for c in self.channels}
+        self.channels = {
+            c for c in self.channels if c.name != channel.name
+        } | {channel}
+        if is_new:
+            irc_channel_joined.send(channel_name=channel.name)
+
+    def part_channel(self, channel_name: str) -> None:
+        self.channels = {c for c in self.channels if c.name != channel_name}
+        irc_channel_left.send(channel_name=channel_name)
+
     def say(self, channel_name: str, text: str) -> None:
         logger.debug('%s> %s', channel_name, text)
 
+    def take_dropped_counts(self) -> Counter[str]:
+        return Counter()
+
+    def get_queue_sizes(self) -> dict[str, int]:
+        return {}
+
     def disconnect(self, msg: str) -> None:
         # Mimics `irc.bot.SingleServerIRCBot.disconnect`.
         logger.info('Shutting down bot ...')
 
 
-def create_bot(config: IrcConfig) -> Union[Bot, DummyBot]:
+def create_bot(config: IrcConfig) -> Union[Bot, BotPool, DummyBot]:
     """Create and return an IRC bot according to the configuration."""
     if config.server is None:
         logger.info('No IRC server specified; will write to STDOUT instead.')
         return DummyBot(config.channels)
 
+    # The IRC library (and SSL support) is only imported if needed.
+    from .ircbot import Bot
+
+    if config.connections > 1:
+        return _create_bot_pool(config)
+
     return Bot(
         config.server,
         config.nickname,
@@ -176,3 +186,73 @@ def create_bot(config: IrcConfig) -> Union[Bot, DummyBot]:
         config.commands,
         config.channels,
     )
+
+
+def _create_bot_pool(config: IrcConfig) -> BotPool:
+    from .ircbot import Bot
+
+    channel_sets = assign_channels(
+        config.channels, config.connections, config.channel_assignment
+    )
+
+    bots = [
+        Bot(
+            config.server,
+            derive_nickname(config.nickname, index),
+            config.realname,
+            config.commands,
+            channels,
+        )
+        for index, channels in enumerate(channel_sets)
+    ]
+
+    return BotPool(bots)
+
+
+def derive_nickname(nickname: str, index: int) -> str:
+    """Return the nickname for the pool's bot with that index."""
+    if index == 0:
+        return nickname
+
+    return f'{nickname}{index + 1:d}'
+
+
+def assign_channels(
+    channels: set[IrcChannel],
+    connection_count: int,
+    strategy: ChannelAssignment,
+) -> list[set[IrcChannel]]:
+    """Distribute channels among connections.
+
+    No more connections are used than there are channels, but at least
+    one.
+    """
+    connection_count = max(1, min(connection_count, len(channels)))
+    channel_sets: list[set[IrcChannel]] = [
+        set() for _ in range(connection_count)
+    ]
+
+    if strategy == ChannelAssignment.BALANCED:
+        # Assign the heaviest channels first, each to the connection
+        # with the lowest total weight so far.
+        loads = [0] * connection_count
+        for channel in sorted(channels, key=lambda c: (-c.weight, c.name)):
+            index = loads.index(min(loads))
+            channel_sets[index].add(channel)
+            loads[index] += channel.weight
+    else:
+        for index, channel in enumerate(sorted(channels)):
+            channel_sets[index % connection_count].add(channel)
+
+    return channel_sets
+
+
+def __getattr__(name: str) -> Any:
+    # Re-export the bot class, but import it (and with it the IRC
+    # library) only on first access.
+    if name == 'Bot':
+        from .ircbot import Bot
+
+        return Bot
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,226 @@
+"""
+syslog2irc.ircbot
+~~~~~~~~~~~~~~~~~
+
+The IRC bot
+
+Kept apart from the IRC configuration so that the IRC library is only
+imported once a bot is actually created.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter
+import logging
+import ssl
+
+from irc.bot import ServerSpec, SingleServerIRCBot
+from irc.connection import Factory
+
+from .irc import IrcChannel, IrcServer
+from .scheduling import SendScheduler
+from .signals import (
+    irc_channel_joined,
+    irc_channel_left,
+    irc_command_received,
+)
+from .util import start_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+# seconds to wait before rejoining a channel after having been kicked
+REJOIN_DELAY = 5.0
+
+
+class Bot(SingleServerIRCBot):
+    """An IRC bot to forward messages to IRC channels."""
+
+    def __init__(
+        self,
+        server: IrcServer,
+        nickname: str,
+        realname: str,
+        commands: list[str],
+        channels: set[IrcChannel],
+    ) -> None:
+        logger.info(
+            'Connecting to IRC server %s:%d ...', server.host, server.port
+        )
+
+        server_spec = ServerSpec(server.host, server.port, server.password)
+        factory = Factory(wrapper=ssl.wrap_socket) if server.ssl else Factory()
+        SingleServerIRCBot.__init__(
+            self, [server_spec], nickname, realname, connect_factory=factory
+        )
+
+        if server.rate_limit is not None:
+            logger.info(
+                'IRC send rate limit set to %.2f messages per second.',
+                server.rate_limit,
+            )
+            self.connection.set_rate_limit(server.rate_limit)
+        else:
+            logger.info('No IRC send rate limit set.')
+
+        self.commands = commands
+
+        # Note: `self.channels` already exists in super class.
+        self.channels_to_join = channels
+
+        weights = {channel.name: channel.weight for channel in channels}
+        self.send_scheduler = SendScheduler(self._privmsg, weights)
+
+    def start(self) -> None:
+        """Connect to the server, in a separate thread."""
+        start_thread(super().start, self.__class__.__name__)
+        self.send_scheduler.start()
+
+    def get_version(self) -> str:
+        """Return this on CTCP VERSION requests."""
+        return 'syslog2IRC'
+
+    def on_welcome(self, conn, event) -> None:
+        """Join channels after connect."""
+        logger.info(
+            'Connected to IRC server %s:%d.', *conn.socket.getpeername()
+        )
+
+        self._send_custom_commands_after_welcome(conn)
+        self._join_channels(conn)
+
+    def _send_custom_commands_after_welcome(self, conn):
+        """Send custom commands after having been welcomed by the server."""
+        for command in self.commands:
+            conn.send_raw(command)
+
+    def _join_channels(self, conn):
+        """Join the configured channels."""
+        channels = sorted(self.channels_to_join)
+        logger.info('Channels to join: %s', ', '.join(c.name for c in channels))
+
+        for channel in channels:
+            self._join_channel(conn, channel)
+
+    def _join_channel(self, conn, channel: IrcChannel) -> None:
+        logger.info('Joining channel %s ...', channel.name)
+        conn.join(channel.name, channel.password or '')
+
+    def join_channel(self, channel: IrcChannel) -> None:
+        """Add a channel to join (right away, if connected).
+
+        A channel of the same name is replaced (which only takes effect
+        on the next join, except for the weight).
+        """
+        self.channels_to_join = {
+            c for c in self.channels_to_join if c.name != channel.name
+        } | {channel}
+        self.send_scheduler.set_weight(channel.name, channel.weight)
+
+        if self.connection.is_connected() and channel.name not in self.channels:
+            self._join_channel(self.connection, channel)
+
+    def part_channel(self, channel_name: str) -> None:
+        """Leave a channel, and do not join it again."""
+        self.channels_to_join = {
+            c for c in self.channels_to_join if c.name != channel_name
+        }
+
+        if self.connection.is_connected():
+            logger.info('Leaving channel %s ...', channel_name)
+            self.connection.part(channel_name)
+
+    def on_nicknameinuse(self, conn, event) -> None:
+        """Choose another nickname if conflicting."""
+        self._nickname += '_'
+        conn.nick(self._nickname)
+
+    def on_join(self, conn, event) -> None:
+        """Successfully joined channel."""
+        joined_nick = event.source.nick
+        channel_name = event.target
+
+        if joined_nick == self._nickname:
+            logger.info('Joined IRC channel: %s', channel_name)
+            irc_channel_joined.send(channel_name=channel_name)
+
+    def on_part(self, conn, event) -> None:
+        """Left channel."""
+        parted_nick = event.source.nick
+        channel_name = event.target
+
+        if parted_nick == self._nickname:
+            logger.info('Left IRC channel: %s', channel_name)
+            irc_channel_left.send(channel_name=channel_name)
+
+    def on_kick(self, conn, event) -> None:
+        """Kicked from channel, try to rejoin after a while."""
+        kicked_nick = event.arguments[0]
+        channel_name = event.target
+
+        if kicked_nick != self._nickname:
+            return
+
+        logger.warning(
+            'Kicked from IRC channel %s by %s.', channel_name, event.source.nick
+        )
+        irc_channel_left.send(channel_name=channel_name)
+
+        for channel in self.channels_to_join:
+            if channel.name == channel_name:
+                self.reactor.scheduler.execute_after(
+                    REJOIN_DELAY, lambda: self._join_channel(conn, channel)
+                )
+                break
+
+    def on_disconnect(self, conn, event) -> None:
+        """Disconnected from server, which implies leaving all channels.
+
+        Reconnecting (and rejoining) is up to the super class.
+        """
+        logger.warning('Disconnected from IRC server.')
+
+        for channel in sorted(self.channels_to_join):
+            irc_channel_left.send(channel_name=channel.name)
+
+    def on_pubmsg(self, conn, event) -> None:
+        """Pass commands (messages starting with `!`) on."""
+        text = event.arguments[0]
+        if text.startswith('!'):
+            irc_command_received.send(
+                channel_name=event.target,
+                nickname=event.source.nick,
+                text=text,
+            )
+
+    def on_badchannelkey(self, conn, event) -> None:
+        """Channel could not be joined due to wrong password."""
+        channel_name = event.arguments[0]
+        logger.warning('Cannot join channel %s (bad key).', channel_name)
+
+    def say(self, channel_name: str, text: str) -> None:
+        """Say message on channel.
+
+        The message is queued and sent when it is the channel's turn.
+        """
+        self.send_scheduler.enqueue(channel_name, text)
+
+    def _privmsg(self, target: str, text: str) -> None:
+        # Look up the connection's method on each call as setting a rate
+        # limit replaces it.
+        self.connection.privmsg(target, text)
+
+    def take_dropped_counts(self) -> Counter[str]:
+        """Return the number of messages dropped per channel because its
+        send queue was full, and reset the counts.
+        """
+        return self.send_scheduler.take_dropped_counts()
+
+    def get_queue_sizes(self) -> dict[str, int]:
+        """Return the number of messages waiting to be sent per
+        channel.
+        """
+        return self.send_scheduler.get_queue_sizes()
@@ -9,21 +9,60 @@ Orchestration, application entry point
 """
 
 from __future__ import annotations
+from collections import Counter
+from dataclasses import replace
 import logging
-from queue import SimpleQueue
-from typing import Callable, Optional, Tuple
+from pathlib import Path
+import signal
+from threading import Event
+from time import monotonic
+from typing import Any, Callable, Optional, Tuple, TYPE_CHECKING, Union
 
 from syslogmp import Message as SyslogMessage
 
 from .cli import parse_args
-from .config import Config, load_config
-from .formatting import format_message
+from .config import (
+    Config,
+    ConfigDiff,
+    diff_configs,
+    load_config,
+    take_reloadable_settings,
+)
+from .connections import Connection, ConnectionTracker
+from .deduplication import Deduplicator
+from .formatting import compile_template
+from .history import COMMAND as HISTORY_COMMAND, MessageHistory, parse_query
+from .holding import MessageHolder
 from .irc import create_bot
-from .network import Port
-from .routing import Router
-from .signals import irc_channel_joined, syslog_message_received
-from .syslog import start_syslog_message_receivers
-from .util import configure_logging
+from .metrics import MetricFamily
+from .network import format_port, Port
+from .packing import MessagePacker
+from .queueing import MessageQueue
+from .routing import ChannelTargets, Router
+from .signals import (
+    irc_channel_joined,
+    irc_channel_left,
+    irc_command_received,
+    syslog_message_received,
+    syslog_messages_received,
+)
+from .sockets import KernelDropMonitor
+from .spool import Spool
+from .storms import StormGuard
+from .syslog import (
+    create_direct_sink,
+    ReceiverEngine,
+    ServerReceivers,
+    start_syslog_message_receivers,
+)
+from .util import configure_logging, log_elapsed_time
+
+
+if TYPE_CHECKING:
+    from .eventloop import EventLoopReceivers
+    from .irc import BotPool, DummyBot
+    from .ircbot import Bot
+    from .workers import DroppedMessageCounter
 
 
 logger = logging.getLogger(__name__)
@@ -32,12 +71,31 @@ logger = logging.getLogger(__name__)
 FormatMessageCallable = Callable[[Tuple[str, int], SyslogMessage], str]
 
 
+# seconds to wait for a message before running periodic tasks anyway
+MAIN_LOOP_TIMEOUT = 1.0
+
+# seconds between writes of the spool to disk
+SPOOL_FLUSH_INTERVAL = 1.0
+
+# seconds between checks for datagrams dropped by the kernel
+KERNEL_DROPS_CHECK_INTERVAL = 10.0
+
+RELOAD_COMMAND = '!reload'
+
+
 # A note on threads (implementation detail):
 #
 # This application uses threads. Besides the main thread there is one
 # thread for *each* syslog message receiver (which itself is a threading
 # server!) and one thread for the (actual) IRC bot. (The dummy bot does
 # not run in a separate thread.)
+#
+# With the asyncio receiver engine, all syslog message receivers share a
+# single thread that runs the event loop instead.
+#
+# With the multiprocess receiver engine, syslog messages are received in
+# separate worker processes. A single thread in the main process takes
+# the received messages from a ring buffer in shared memory.
 
 # Those threads are configured to be daemon threads. A Python
 # application exits if no more non-daemon threads are running.
@@ -51,25 +109,131 @@ class Processor:
         self,
         config: Config,
         *,
+        config_path: Optional[Path] = None,
         custom_format_message: Optional[FormatMessageCallable] = None,
     ) -> None:
-        self.irc_bot = create_bot(config.irc)
+        self.config = config
+        self.config_path = config_path
+        # created on first access, see `irc_bot`
+        self._irc_bot: Optional[Union[Bot, BotPool, DummyBot]] = None
+        # Set from other threads (and signal handlers), acted upon by the
+        # main loop.
+        self.reload_requested = False
+
+        self.syslog_config = config.syslog
+        # Worker processes track their TCP connections on their own.
+        self.connection_tracker: Optional[ConnectionTracker] = (
+            ConnectionTracker(config.syslog.tcp)
+            if config.syslog.engine != ReceiverEngine.MULTIPROCESS
+            else None
+        )
+        # set once syslog ports have been bound (with any engine)
+        self.receivers_started = Event()
+        # set once the multiprocess engine's receivers have been started
+        self.ring_buffer_drops: Optional[DroppedMessageCounter] = None
+        # set once receivers have been started (unless they cannot open
+        # and close ports while running)
+        self.syslog_receivers: Optional[
+            Union[ServerReceivers, EventLoopReceivers]
+        ] = None
         self.syslog_ports = {route.syslog_port for route in config.routes}
         self.router = Router(config.routes)
-        self.message_queue: SimpleQueue = SimpleQueue()
+        # Hold messages for the channels until they have been joined, so
+        # that none are lost while connecting on startup.
+        self.router.hold_for_channels(
+            channel.name for channel in config.irc.channels
+        )
+        self.message_queue = MessageQueue(
+            config.queue.max_size, config.queue.overflow_policy
+        )
+        # Receivers pass messages straight into the queue instead of
+        # sending a signal for each one.
+        self.message_sink = create_direct_sink(self.message_queue.put)
+        self.drop_notice_interval = config.queue.drop_notice_interval
+        self.next_drop_notice = monotonic() + self.drop_notice_interval
+        self.metrics_config = config.metrics
+
+        # Messages for channels that have not been joined yet, or have
+        # been left (kicked, disconnected), are held until those are
+        # joined (again).
+        self.message_holder = MessageHolder()
+
+        if config.history is not None:
+            self.message_history: Optional[MessageHistory] = MessageHistory(
+                config.history
+            )
+        else:
+            self.message_history = None
+
+        # With a spool, messages are written to disk before being
+        # announced. While no channel is joined, they pile up there, and
+        # are replayed at a limited rate afterwards.
+        if config.spool is not None:
+            self.spool: Optional[Spool] = Spool(config.spool)
+            self.replay_rate = config.spool.replay_rate
+            self.replaying = not self.spool.is_empty()
+            self.replay_allowance = 0.0
+            self.last_replay_at = monotonic()
+            # since when the oldest spooled message has been waiting for
+            # channels to be joined
+            self.spool_waiting_since: Optional[float] = None
+            self.next_spool_flush = monotonic() + SPOOL_FLUSH_INTERVAL
+        else:
+            self.spool = None
+
+        self.storm_guards_by_port = _create_storm_guards(config)
+
+        self.kernel_drop_monitor = KernelDropMonitor()
+        self.next_kernel_drops_check = monotonic() + KERNEL_DROPS_CHECK_INTERVAL
+
+        if config.packing is not None:
+            self.message_packer: Optional[MessagePacker] = MessagePacker(
+                config.packing, self.say_via_bot
+            )
+            self.main_loop_timeout = min(
+                MAIN_LOOP_TIMEOUT, config.packing.max_delay
+            )
+        else:
+            self.message_packer = None
+            self.main_loop_timeout = MAIN_LOOP_TIMEOUT
+
+        if config.deduplication_window is not None:
+            self.deduplicator: Optional[Deduplicator] = Deduplicator(
+                config.deduplication_window
+            )
+        else:
+            self.deduplicator = None
 
         if custom_format_message is not None:
             self.format_message = custom_format_message
         else:
-            self.format_message = format_message
+            self.format_message = compile_template(config.formatting)
 
         # Up to this point, no signals must have been sent.
         self.connect_to_signals()
         # Signals are allowed be sent from here on.
 
+    @property
+    def irc_bot(self) -> Union[Bot, BotPool, DummyBot]:
+        """Return the IRC bot, which is created on first access.
+
+        That way, syslog ports can be bound before the IRC library has
+        been imported and the bot set up.
+        """
+        if self._irc_bot is None:
+            self._irc_bot = create_bot(self.config.irc)
+        return self._irc_bot
+
+    @irc_bot.setter
+    def irc_bot(self, irc_bot: Union[Bot, BotPool, DummyBot]) -> None:
+        self._irc_bot = irc_bot
+
     def connect_to_signals(self) -> None:
         irc_channel_joined.connect(self.router.enable_channel)
+        irc_channel_left.connect(self.router.disable_channel)
+        irc_command_received.connect(self.handle_irc_command)
         syslog_message_received.connect(self.handle_syslog_message)
+        syslog_messages_received.connect(self.handle_syslog_messages)
 
     def handle_syslog_message(
         self,
@@ -79,7 +243,17 @@ class Processor:
         message: Optional[SyslogMessage] = None,
     ) -> None:
         """Process an incoming syslog message."""
-        self.message_queue.put((port, source_address, message))
+        self.message_queue.put(port, source_address, message)
+
+    def handle_syslog_messages(
+        self,
+        port: Port,
+        *,
+        messages: Optional[list[tuple[tuple[str, int], SyslogMessage]]] = None,
+    ) -> None:
+        """Process a batch of incoming syslog messages."""
+        for source_address, message in messages:
+            self.message_queue.put(port, source_address, message)
 
     def announce_message(
         self,
@@ -88,38 +262,636 @@ class Processor:
         message: SyslogMessage,
     ) -> None:
         """Announce message on IRC."""
-        channel_names = self.router.get_channel_names_for_port(port)
+        # Filter first so that messages not routed anywhere cost as
+        # little as possible.
+        targets = self.router.get_targets_for_message(port, message)
+        if not targets:
+            return
+
+        if self.deduplicator is not None:
+            now = monotonic()
+            self.announce_repetitions(now)
+            if not self.deduplicator.should_pass(
+                port, source_address, message, now
+            ):
+                return
+
+        if port in self.storm_guards_by_port:
+            targets = self.filter_storm_targets(port, message, targets)
+            if not targets:
+                return
+
         text = self.format_message(source_address, message)
+        self.send_to_targets(targets, text)
 
-        for channel_name in channel_names:
+        if self.message_history is not None:
+            self.message_history.add(
+                targets.live_channel_names + targets.held_channel_names,
+                message.hostname,
+                message.severity,
+                text,
+            )
+
+    def filter_storm_targets(
+        self, port: Port, message: SyslogMessage, targets: ChannelTargets
+    ) -> ChannelTargets:
+        """Remove the channels from the targets whose routes currently
+        summarize the message instead of forwarding it.
+        """
+        storm_guards = self.storm_guards_by_port[port]
+        now = monotonic()
+
+        def is_forwarded(channel_name: str) -> bool:
+            storm_guard = storm_guards.get(channel_name)
+            return storm_guard is None or not storm_guard.add(message, now)
+
+        return ChannelTargets(
+            tuple(filter(is_forwarded, targets.live_channel_names)),
+            tuple(filter(is_forwarded, targets.held_channel_names)),
+        )
+
+    def send_to_targets(self, targets: ChannelTargets, text: str) -> None:
+        """Send text to the joined channels, and hold it for those that
+        have been left.
+        """
+        if self.message_holder:
+            # Retain order if a channel has been joined again.
+            self.release_held_messages()
+
+        for channel_name in targets.live_channel_names:
+            self.say(channel_name, text)
+
+        if targets.held_channel_names:
+            now = monotonic()
+            for channel_name in targets.held_channel_names:
+                self.message_holder.hold(channel_name, text, now)
+
+    def release_held_messages(self) -> None:
+        """Send messages held for channels that have been joined again."""
+        for channel_name in self.message_holder.get_channel_names():
             if self.router.is_channel_enabled(channel_name):
-                self.irc_bot.say(channel_name, text)
+                for text in self.message_holder.release(channel_name):
+                    self.say(channel_name, text)
+
+    def say_via_bot(self, channel_name: str, text: str) -> None:
+        self.irc_bot.say(channel_name, text)
+
+    def say(self, channel_name: str, text: str) -> None:
+        """Send text to the channel, packed with other texts if enabled."""
+        if self.message_packer is not None:
+            self.message_packer.add(channel_name, text, monotonic())
+        else:
+            self.irc_bot.say(channel_name, text)
+
+    def handle_irc_command(
+        self,
+        sender: Any,
+        *,
+        channel_name: Optional[str] = None,
+        nickname: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> None:
+        """Answer a command sent to a channel, by private message.
+
+        Called from the IRC bot's thread. Replies are queued like other
+        messages so they are sent within the rate limit.
+        """
+        command, _, arguments = text.partition(' ')
+
+        if command == HISTORY_COMMAND and self.message_history is not None:
+            self.answer_history_query(channel_name, nickname, arguments)
+        elif (
+            command == RELOAD_COMMAND
+            and nickname in self.config.reload_nicknames
+        ):
+            self.irc_bot.say(nickname, 'Reloading configuration.')
+            self.reload_requested = True
+
+    def answer_history_query(
+        self, channel_name: str, nickname: str, arguments: str
+    ) -> None:
+        try:
+            query = parse_query(arguments)
+        except ValueError as e:
+            self.irc_bot.say(
+                nickname,
+                f'{e}. Usage: {HISTORY_COMMAND} [count] [host=<hostname>] '
+                '[sev>=<severity>]',
+            )
+            return
+
+        texts = self.message_history.query(channel_name, query)
+        if not texts:
+            self.irc_bot.say(
+                nickname, f'No matching messages in {channel_name}.'
+            )
+            return
+
+        for text in texts:
+            self.irc_bot.say(nickname, text)
+
+    def announce_spooled_messages(self, now: float) -> None:
+        """Announce messages from the spool, at a limited rate if they
+        have piled up.
+        """
+        if not self.router.enabled_channels:
+            # Nowhere to announce messages to (yet).
+            if not self.replaying and not self.spool.is_empty():
+                self.replaying = True
+            self.last_replay_at = now
+            return
+
+        if not self.replaying:
+            max_count = None
+        else:
+            elapsed = now - self.last_replay_at
+            self.replay_allowance = min(
+                self.replay_allowance + elapsed * self.replay_rate,
+                max(self.replay_rate, 1.0),
+            )
+            max_count = int(self.replay_allowance)
+            self.replay_allowance -= max_count
+        self.last_replay_at = now
+
+        # Messages wait in the spool until all channels they are routed to
+        # have been joined, but (like messages held for those channels)
+        # not forever.
+        is_waiting_too_long = (
+            self.spool_waiting_since is not None
+            and now - self.spool_waiting_since >= self.message_holder.max_age
+        )
+        is_ready = (
+            None if is_waiting_too_long else self.is_spooled_message_ready
+        )
+
+        items = self.spool.read(max_count, is_ready=is_ready)
+        for port, source_address, message in items:
+            self.announce_message(port, source_address, message)
+
+        if self.spool.is_empty():
+            self.spool_waiting_since = None
+        elif is_ready is not None:
+            if max_count is None or len(items) < max_count:
+                if self.spool_waiting_since is None:
+                    self.spool_waiting_since = now
+            else:
+                self.spool_waiting_since = None
+
+        if self.replaying and self.spool.is_empty():
+            self.replaying = False
+            logger.info('Replayed all spooled messages.')
+
+    def is_spooled_message_ready(
+        self, port: Port, message: SyslogMessage
+    ) -> bool:
+        """Return `True` unless the message would have to be held for a
+        channel that has not been joined (again) yet.
+        """
+        targets = self.router.get_targets_for_message(port, message)
+        return not targets.held_channel_names
+
+    def announce_repetitions(self, now: float) -> None:
+        """Announce how often messages have been repeated within their
+        deduplication windows that have closed.
+        """
+        for repetition in self.deduplicator.collect_closed_windows(now):
+            # Route like the repeated message (whose text is what pattern
+            # filters are about), but announce the number of repetitions.
+            targets = self.router.get_targets_for_message(
+                repetition.port, repetition.last_message
+            )
+
+            text = f'last message repeated {repetition.count:d} times'
+            message = replace(
+                repetition.last_message, message=text.encode('utf-8')
+            )
+            text = self.format_message(repetition.source_address, message)
+            self.send_to_targets(targets, text)
+
+    def announce_storm_summaries(self, now: float) -> None:
+        """Announce summaries of messages during storms that are due."""
+        for storm_guards in self.storm_guards_by_port.values():
+            for channel_name, storm_guard in storm_guards.items():
+                lines = storm_guard.collect_summary(now)
+                if lines is None:
+                    continue
+
+                if self.router.is_channel_enabled(channel_name):
+                    for line in lines:
+                        self.say(channel_name, line)
+                else:
+                    for line in lines:
+                        self.message_holder.hold(channel_name, line, now)
+
+    def announce_dropped_messages(self) -> None:
+        """Announce on IRC how many messages have been dropped since the
+        last announcement, for each reason.
+        """
+        dropped_counts_by_reason: list[tuple[str, Counter[str]]] = []
+
+        if self.ring_buffer_drops is not None:
+            dropped_counts_by_reason.append(
+                (
+                    'ring buffer was full',
+                    self._map_dropped_counts_to_channel_names(
+                        self.ring_buffer_drops.take_dropped_counts()
+                    ),
+                )
+            )
+
+        dropped_counts_by_reason.append(
+            (
+                'queue was full',
+                self._map_dropped_counts_to_channel_names(
+                    self.message_queue.take_dropped_counts()
+                ),
+            )
+        )
+
+        if self.spool is not None:
+            dropped_counts_by_reason.append(
+                (
+                    'spool was full',
+                    self._map_dropped_counts_to_channel_names(
+                        self.spool.take_dropped_counts()
+                    ),
+                )
+            )
+
+        # Messages dropped from the bot's per-channel send queues
+        dropped_counts_by_reason.append(
+            ('send queue was full', self.irc_bot.take_dropped_counts())
+        )
+
+        # Messages held for too long (or too many) for channels that
+        # have not been joined (again)
+        dropped_counts_by_reason.append(
+            (
+                'channel was not joined in time',
+                self.message_holder.take_dropped_counts(),
+            )
+        )
+
+        for reason, dropped_counts in dropped_counts_by_reason:
+            for channel_name, dropped_count in sorted(dropped_counts.items()):
+                logger.warning(
+                    'Dropped %d message(s) for IRC channel %s (%s).',
+                    dropped_count,
+                    channel_name,
+                    reason,
+                )
+
+                if self.router.is_channel_enabled(channel_name):
+                    text = f'{dropped_count:d} message(s) dropped ({reason}).'
+                    self.say(channel_name, text)
+
+    def _map_dropped_counts_to_channel_names(
+        self, dropped_counts_by_port: Counter[Port]
+    ) -> Counter[str]:
+        # Every route from the port of a dropped message is affected.
+        dropped_counts_by_channel_name: Counter[str] = Counter()
+        for port, dropped_count in dropped_counts_by_port.items():
+            for channel_name in self.router.get_channel_names_for_port(port):
+                dropped_counts_by_channel_name[channel_name] += dropped_count
+        return dropped_counts_by_channel_name
+
+    def run_periodic_tasks(self) -> None:
+        """Run tasks that are due."""
+        now = monotonic()
+
+        if self.deduplicator is not None:
+            self.announce_repetitions(now)
+
+        if self.storm_guards_by_port:
+            self.announce_storm_summaries(now)
+
+        if self.message_holder:
+            self.release_held_messages()
+            self.message_holder.expire(now)
+
+        if now >= self.next_drop_notice:
+            self.next_drop_notice = now + self.drop_notice_interval
+            self.announce_dropped_messages()
+
+        if self.message_packer is not None:
+            self.message_packer.flush_due(now)
+
+        if self.spool is not None and now >= self.next_spool_flush:
+            self.next_spool_flush = now + SPOOL_FLUSH_INTERVAL
+            self.spool.flush()
+
+        if now >= self.next_kernel_drops_check:
+            self.next_kernel_drops_check = now + KERNEL_DROPS_CHECK_INTERVAL
+            self.kernel_drop_monitor.check(self.syslog_ports)
+
+    def request_reload(self, *args: Any) -> None:
+        """Have the configuration reloaded by the main loop (e.g. on
+        SIGHUP).
+        """
+        self.reload_requested = True
+
+    def reload_config(self) -> None:
+        """Load the configuration file again, and apply it."""
+        logger.info('Reloading configuration from %s ...', self.config_path)
+
+        try:
+            config = load_config(self.config_path)
+        except Exception as e:
+            # Keep running with the current configuration.
+            logger.error('Could not reload configuration: %s', e)
+            return
+
+        self.apply_config(config)
+
+    def apply_config(self, config: Config) -> ConfigDiff:
+        """Apply changes to routes, channels, and storm detection.
+
+        Ports are opened and closed, and channels joined and left, as
+        required. Neither the IRC connection(s) nor unchanged ports are
+        interrupted.
+        """
+        diff = diff_configs(self.config, config)
+
+        if diff.other_changes:
+            logger.warning(
+                'Changes to settings other than routes, channels, and storm '
+                'detection take effect after a restart.'
+            )
+
+        for channel_name in sorted(diff.parted_channel_names):
+            self.router.forget_channel(channel_name)
+            self.irc_bot.part_channel(channel_name)
+
+        if diff.routes_changed:
+            self.router.update_routes(config.routes)
+            self.syslog_ports = {route.syslog_port for route in config.routes}
+
+        # Hold messages for new channels before their ports are opened,
+        # so that none received in between are discarded.
+        self.router.hold_for_channels(
+            channel.name for channel in diff.joined_channels
+        )
+
+        if diff.routes_changed or config.storm != self.config.storm:
+            self.storm_guards_by_port = _create_storm_guards(config)
+
+        self.update_syslog_receivers(diff)
+
+        for channel in sorted(diff.joined_channels):
+            self.irc_bot.join_channel(channel)
+
+        # Other settings remain in effect until a restart.
+        self.config = take_reloadable_settings(self.config, config)
+        logger.info('Configuration has been reloaded.')
+        return diff
+
+    def update_syslog_receivers(self, diff: ConfigDiff) -> None:
+        """Open and close ports according to the changed routes."""
+        if not (diff.opened_ports or diff.closed_ports):
+            return
+
+        if self.syslog_receivers is None:
+            logger.warning(
+                'Changes to syslog ports take effect after a restart.'
+            )
+            return
+
+        for port in sorted(diff.closed_ports):
+            self.syslog_receivers.close_port(port)
+
+        for port in sorted(diff.opened_ports):
+            try:
+                self.syslog_receivers.open_port(port)
+            except OSError as e:
+                logger.error('Cannot open port %s: %s', format_port(port), e)
+
+    def collect_gauges(self) -> list[MetricFamily]:
+        """Return the current queue depths, connection counts, and
+        kernel drop counts as metrics.
+        """
+        families = [
+            MetricFamily(
+                'syslog2irc_queue_depth',
+                'gauge',
+                'Syslog messages waiting in the queue for announcement.',
+                None,
+                {None: self.message_queue.qsize()},
+            ),
+            MetricFamily(
+                'syslog2irc_irc_queue_depth',
+                'gauge',
+                'IRC messages waiting in the send queue.',
+                'channel',
+                self.irc_bot.get_queue_sizes(),
+            ),
+        ]
+
+        if self.spool is not None:
+            families.append(
+                MetricFamily(
+                    'syslog2irc_spool_backlog_bytes',
+                    'gauge',
+                    'Approximate size of spooled messages not yet announced.',
+                    None,
+                    {None: self.spool.get_backlog_size()},
+                )
+            )
+
+        if self.connection_tracker is not None:
+            families.append(
+                MetricFamily(
+                    'syslog2irc_tcp_connections_open',
+                    'gauge',
+                    'Open TCP connections from syslog senders.',
+                    'port',
+                    self.connection_tracker.get_open_counts(),
+                )
+            )
+            families.extend(
+                _collect_connection_gauges(
+                    self.connection_tracker.get_connections()
+                )
+            )
+
+        if self.kernel_drop_monitor.available:
+            families.append(
+                MetricFamily(
+                    'syslog2irc_udp_kernel_drops_total',
+                    'counter',
+                    'UDP datagrams dropped by the kernel (receive buffer '
+                    'full).',
+                    'port',
+                    self.kernel_drop_monitor.get_totals(),
+                )
+            )
+
+        return families
+
+    def start_syslog_message_receivers(self) -> None:
+        """Start receivers with the configured engine."""
+        engine = self.syslog_config.engine
+        logger.info('Using %s receiver engine.', engine.name.lower())
+
+        # Engines are only imported if selected (asyncio takes a while).
+        if engine == ReceiverEngine.ASYNCIO:
+            from . import eventloop
+
+            self.syslog_receivers = eventloop.start_syslog_message_receivers(
+                self.syslog_ports,
+                udp_batch_size=self.syslog_config.udp_batch_size,
+                is_port_active=self.router.is_port_active,
+                sink=self.message_sink,
+                connection_tracker=self.connection_tracker,
+                socket_configs=self.syslog_config.sockets,
+            )
+        elif engine == ReceiverEngine.MULTIPROCESS:
+            from . import workers
+
+            self.ring_buffer_drops = workers.start_syslog_message_receivers(
+                self.syslog_ports,
+                worker_count=self.syslog_config.workers,
+                ring_buffer_size=self.syslog_config.ring_buffer_size,
+                udp_batch_size=self.syslog_config.udp_batch_size,
+                is_port_active=self.router.is_port_active,
+                sink=self.message_sink,
+                tcp_config=self.syslog_config.tcp,
+                socket_configs=self.syslog_config.sockets,
+            )
+        else:
+            self.syslog_receivers = start_syslog_message_receivers(
+                self.syslog_ports,
+                is_port_active=self.router.is_port_active,
+                sink=self.message_sink,
+                connection_tracker=self.connection_tracker,
+                socket_configs=self.syslog_config.sockets,
+            )
 
     def run(self) -> None:
         """Start network-based components, run main loop."""
-        self.irc_bot.start()
-        start_syslog_message_receivers(self.syslog_ports)
+        # Receivers are started first so that messages are received (and
+        # held) as early as possible, and worker processes (if any) are
+        # forked before other threads exist.
+        started_at = monotonic()
+        self.start_syslog_message_receivers()
+        self.receivers_started.set()
+        started_at = log_elapsed_time('Started syslog receivers', started_at)
+
+        irc_bot = self.irc_bot
+        started_at = log_elapsed_time('Created IRC bot', started_at)
+
+        if self.metrics_config is not None:
+            from .metricsserver import start_metrics_server
+
+            start_metrics_server(self.metrics_config, self.collect_gauges)
+            started_at = log_elapsed_time('Started metrics server', started_at)
+
+        irc_bot.start()
+        log_elapsed_time('Started IRC bot', started_at)
+
+        if self.config_path is not None and hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.request_reload)
 
         try:
             while True:
-                port, source_address, message = self.message_queue.get()
-                self.announce_message(port, source_address, message)
+                item = self.message_queue.get(timeout=self.main_loop_timeout)
+                if item is not None:
+                    port, source_address, message = item
+                    if self.spool is not None:
+                        self.spool.append(port, source_address, message)
+                    else:
+                        self.announce_message(port, source_address, message)
+
+                if self.spool is not None:
+                    self.announce_spooled_messages(monotonic())
+
+                self.run_periodic_tasks()
+
+                if self.reload_requested:
+                    self.reload_requested = False
+                    self.reload_config()
         except KeyboardInterrupt:
             pass
 
         logger.info('Shutting down ...')
+        if self.message_packer is not None:
+            self.message_packer.flush_all()
+        if self.spool is not None:
+            self.spool.close()
         self.irc_bot.disconnect('Bye.')  # Joins bot thread.
 
 
+def _create_storm_guards(config: Config) -> dict[Port, dict[str, StormGuard]]:
+    """Create a storm guard for each route with a storm threshold.
+
+    If several routes lead from the same port to the same channel, the
+    lowest threshold applies.
+    """
+    thresholds: dict[tuple[Port, str], float] = {}
+    for route in config.routes:
+        if route.storm_threshold is None:
+            continue
+
+        key = (route.syslog_port, route.irc_channel_name)
+        thresholds[key] = min(
+            route.storm_threshold, thresholds.get(key, route.storm_threshold)
+        )
+
+    storm_guards_by_port: dict[Port, dict[str, StormGuard]] = {}
+    for (port, channel_name), threshold in thresholds.items():
+        storm_guards_by_port.setdefault(port, {})[channel_name] = StormGuard(
+            threshold, config.storm
+        )
+    return storm_guards_by_port
+
+
+def _collect_connection_gauges(
+    connections: list[Connection],
+) -> list[MetricFamily]:
+    """Return what has been received through each open TCP connection,
+    by peer address, as metrics.
+    """
+    messages: dict[str, int] = {}
+    bytes_: dict[str, int] = {}
+    for connection in connections:
+        peer = '{}:{}'.format(*connection.client_address)
+        messages[peer] = messages.get(peer, 0) + connection.messages_received
+        bytes_[peer] = bytes_.get(peer, 0) + connection.bytes_received
+
+    return [
+        MetricFamily(
+            'syslog2irc_tcp_connection_messages_received',
+            'gauge',
+            'Syslog messages received through an open TCP connection.',
+            'peer',
+            messages,
+        ),
+        MetricFamily(
+            'syslog2irc_tcp_connection_bytes_received',
+            'gauge',
+            'Bytes received through an open TCP connection.',
+            'peer',
+            bytes_,
+        ),
+    ]
+
+
 def main(
     *, custom_format_message: Optional[FormatMessageCallable] = None
 ) -> None:
     """Parse arguments, load configuration, and start the application."""
+    started_at = monotonic()
     args = parse_args()
     config = load_config(args.config_filename)
     configure_logging(config.log_level)
+    started_at = log_elapsed_time('Loaded configuration', started_at)
+
+    processor = Processor(
+        config,
+        config_path=args.config_filename,
+        custom_format_message=custom_format_message,
+    )
+    log_elapsed_time('Set up processor', started_at)
 
-    processor = Processor(config, custom_format_message=custom_format_message)
     processor.run()
 
 
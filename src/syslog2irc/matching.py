@@ -0,0 +1,199 @@
+"""
+syslog2irc.matching
+~~~~~~~~~~~~~~~~~~~
+
+Matching of message texts against many regular expressions at once
+
+All patterns are combined into a single alternation so that a text is
+usually scanned only once, regardless of the number of patterns.
+Patterns that would change their meaning (or become invalid) as part of
+a combination, e.g. due to a backreference by number, are matched on
+their own.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+import re
+from typing import Iterable, Optional, Pattern, Sequence
+
+
+PATTERN_ENCODING = 'utf-8'
+
+# maximum number of combined regular expressions (for subsets of the
+# patterns) to keep
+MAX_CACHED_REGEXES = 256
+
+# global flags at the start of a pattern (e.g. `(?i)`), which can be
+# turned into a group with scoped flags (except for verbose mode, in
+# which a trailing comment would swallow the group's closing parenthesis)
+LEADING_GLOBAL_FLAGS_REGEX = re.compile(rb'\(\?([aiLmsu]+)\)')
+
+# (unescaped) global flags elsewhere, backreferences by number (e.g.
+# `\1`), and conditionals on groups by number (e.g. `(?(1)...)`), which
+# would refer to other groups in a combination
+NOT_COMBINABLE_REGEX = re.compile(
+    rb'(?<!\\)(?:\\\\)*(?:\(\?[aiLmsux]+\)|\\[1-9]|\(\?\(\d)'
+)
+
+
+@dataclass(frozen=True)
+class PatternFilter:
+    """Which patterns (as bits of a mask) must match, and which must not
+    match.
+
+    If no include patterns are given, texts pass unless an exclude
+    pattern matches.
+    """
+
+    include_mask: int
+    exclude_mask: int
+
+    def passes(self, matched_mask: int) -> bool:
+        if matched_mask & self.exclude_mask:
+            return False
+
+        return not self.include_mask or bool(matched_mask & self.include_mask)
+
+
+class MultiPatternMatcher:
+    """Tell which of a number of patterns match a text.
+
+    Scanning with a combined alternation yields, at each position, only
+    the first pattern that matches there. Patterns that match only
+    within the match of another pattern are therefore missed. If that
+    could change the outcome of a filter, the text is scanned again for
+    just the patterns in question.
+    """
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        self.patterns = [
+            pattern.encode(PATTERN_ENCODING) for pattern in patterns
+        ]
+        self.all_mask = (1 << len(patterns)) - 1
+
+        # Patterns (in a form fit for combination) by index, and
+        # regexes of the patterns that are matched on their own
+        self._combinable_patterns: dict[int, bytes] = {}
+        self._separate_regexes: dict[int, Pattern[bytes]] = {}
+        for index, pattern in enumerate(self.patterns):
+            combinable_pattern = _make_combinable(pattern)
+            if combinable_pattern is not None:
+                self._combinable_patterns[index] = combinable_pattern
+            else:
+                self._separate_regexes[index] = re.compile(pattern)
+
+        self.separate_mask = 0
+        for index in self._separate_regexes:
+            self.separate_mask |= 1 << index
+
+        self._regexes: dict[int, Pattern[bytes]] = {}
+
+        # Compile the combination of all patterns right away to report
+        # errors early.
+        combined_mask = self.all_mask & ~self.separate_mask
+        if combined_mask:
+            self._get_regex(combined_mask)
+
+    def _get_regex(self, mask: int) -> Pattern[bytes]:
+        regex = self._regexes.get(mask)
+        if regex is None:
+            alternatives = [
+                b'(?P<p%d>%s)' % (index, pattern)
+                for index, pattern in self._combinable_patterns.items()
+                if mask >> index & 1
+            ]
+            regex = re.compile(b'|'.join(alternatives))
+
+            if len(self._regexes) >= MAX_CACHED_REGEXES:
+                self._regexes.clear()
+            self._regexes[mask] = regex
+
+        return regex
+
+    def _scan(self, mask: int, text: bytes) -> int:
+        matched_mask = 0
+
+        combined_mask = mask & ~self.separate_mask
+        if combined_mask:
+            for match in self._get_regex(combined_mask).finditer(text):
+                # The group's name is `p` followed by the pattern's index.
+                matched_mask |= 1 << int(match.lastgroup[1:])
+
+        if mask & self.separate_mask:
+            for index, regex in self._separate_regexes.items():
+                if mask >> index & 1 and regex.search(text):
+                    matched_mask |= 1 << index
+
+        return matched_mask
+
+    def match(self, text: bytes, filters: Iterable[PatternFilter]) -> int:
+        """Return a mask of the patterns that match the text.
+
+        Only as many patterns are determined as necessary to decide
+        whether the text passes the filters.
+        """
+        matched_mask = self._scan(self.all_mask, text)
+        if not matched_mask:
+            # At no position does any of the patterns match.
+            return 0
+
+        filters = list(filters)
+        # Whether patterns matched on their own match is known already.
+        unknown_mask = self.all_mask & ~matched_mask & ~self.separate_mask
+
+        while True:
+            needed_mask = _get_undecided_mask(
+                filters, matched_mask, unknown_mask
+            )
+            if not needed_mask:
+                return matched_mask
+
+            found_mask = self._scan(needed_mask, text)
+            if not found_mask:
+                # None of the patterns in question matches.
+                return matched_mask
+
+            matched_mask |= found_mask
+            unknown_mask &= ~found_mask
+
+
+def _make_combinable(pattern: bytes) -> Optional[bytes]:
+    """Return the pattern in a form that keeps its meaning as part of a
+    combination, or `None` if there is no such form.
+    """
+    match = LEADING_GLOBAL_FLAGS_REGEX.match(pattern)
+    if match is not None:
+        pattern = b'(?%s:%s)' % (match.group(1), pattern[match.end() :])
+
+    if NOT_COMBINABLE_REGEX.search(pattern):
+        return None
+
+    return pattern
+
+
+def _get_undecided_mask(
+    filters: list[PatternFilter], matched_mask: int, unknown_mask: int
+) -> int:
+    """Return a mask of the patterns that are not known to match or not
+    yet, but on which the outcome of a filter depends.
+    """
+    needed_mask = 0
+
+    for pattern_filter in filters:
+        if matched_mask & pattern_filter.exclude_mask:
+            # Excluded, whatever else matches.
+            continue
+
+        include_mask = pattern_filter.include_mask
+        if include_mask and not (matched_mask & include_mask):
+            if not (include_mask & unknown_mask):
+                # Cannot be included anymore.
+                continue
+            needed_mask |= include_mask | pattern_filter.exclude_mask
+        else:
+            needed_mask |= pattern_filter.exclude_mask
+
+    return needed_mask & unknown_mask
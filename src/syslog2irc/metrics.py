@@ -0,0 +1,244 @@
+"""
+syslog2irc.metrics
+~~~~~~~~~~~~~~~~~~
+
+Metrics, in the Prometheus text format
+
+Metrics are exposed via HTTP by `syslog2irc.metricsserver`.
+
+Counters are incremented on the hot path of message processing, so they
+do not take a lock: Each thread counts into its own dictionary, and the
+dictionaries are only summed up when the metrics are requested.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+import threading
+from typing import Hashable, Iterable, Optional
+
+from .network import format_port, Port
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    """A metrics endpoint configuration."""
+
+    host: str = '127.0.0.1'
+    port: int = 9514
+
+
+class PerThreadCounter:
+    """Count events by label without locking on increment."""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counts_by_thread: list[tuple[threading.Thread, dict]] = []
+        self._retired_counts: dict[Hashable, float] = {}
+        self._prune_threshold = 64
+
+    def increment(self, label: Hashable, amount: float = 1) -> None:
+        try:
+            counts = self._local.counts
+        except AttributeError:
+            counts = self._register_thread()
+
+        counts[label] = counts.get(label, 0) + amount
+
+    def _register_thread(self) -> dict[Hashable, float]:
+        counts: dict[Hashable, float] = {}
+        self._local.counts = counts
+
+        with self._lock:
+            self._counts_by_thread.append((threading.current_thread(), counts))
+
+            # The threading receiver engine starts a thread per message,
+            # so the counts of threads that have ended are merged now and
+            # then to keep the list short.
+            if len(self._counts_by_thread) >= self._prune_threshold:
+                self._prune()
+                self._prune_threshold = max(
+                    64, 2 * len(self._counts_by_thread)
+                )
+
+        return counts
+
+    def _prune(self) -> None:
+        alive = []
+        for thread, counts in self._counts_by_thread:
+            if thread.is_alive():
+                alive.append((thread, counts))
+            else:
+                _add_counts(self._retired_counts, counts)
+        self._counts_by_thread = alive
+
+    def collect(self) -> dict[Hashable, float]:
+        """Return the current totals by label."""
+        with self._lock:
+            totals = dict(self._retired_counts)
+            for _, counts in self._counts_by_thread:
+                # Copying a dictionary is atomic, iterating over one that
+                # another thread modifies is not.
+                _add_counts(totals, counts.copy())
+
+        return totals
+
+
+def _add_counts(
+    totals: dict[Hashable, float], counts: dict[Hashable, float]
+) -> None:
+    for label, count in counts.items():
+        totals[label] = totals.get(label, 0) + count
+
+
+# per port
+messages_received = PerThreadCounter()
+parse_errors = PerThreadCounter()
+messages_queued = PerThreadCounter()
+messages_dropped = PerThreadCounter()
+ring_buffer_messages_dropped = PerThreadCounter()
+tcp_connections_accepted = PerThreadCounter()
+tcp_connections_refused = PerThreadCounter()
+tcp_connections_timed_out = PerThreadCounter()
+
+# per IRC channel
+irc_messages_queued = PerThreadCounter()
+irc_messages_dropped = PerThreadCounter()
+irc_messages_sent = PerThreadCounter()
+irc_send_seconds = PerThreadCounter()
+
+
+@dataclass(frozen=True)
+class MetricFamily:
+    """A metric and its current values by label."""
+
+    name: str
+    type: str
+    help: str
+    label_name: Optional[str]
+    samples: dict[Hashable, float]
+
+
+COUNTERS = [
+    (
+        'syslog2irc_messages_received_total',
+        'Syslog messages received.',
+        'port',
+        messages_received,
+    ),
+    (
+        'syslog2irc_parse_errors_total',
+        'Syslog messages that could not be parsed.',
+        'port',
+        parse_errors,
+    ),
+    (
+        'syslog2irc_messages_queued_total',
+        'Syslog messages put into the queue for announcement.',
+        'port',
+        messages_queued,
+    ),
+    (
+        'syslog2irc_messages_dropped_total',
+        'Syslog messages dropped because the queue was full.',
+        'port',
+        messages_dropped,
+    ),
+    (
+        'syslog2irc_ring_buffer_messages_dropped_total',
+        'Syslog messages dropped because the ring buffer was full.',
+        'port',
+        ring_buffer_messages_dropped,
+    ),
+    (
+        'syslog2irc_tcp_connections_accepted_total',
+        'TCP connections accepted.',
+        'port',
+        tcp_connections_accepted,
+    ),
+    (
+        'syslog2irc_tcp_connections_refused_total',
+        'TCP connections closed right away because of connection limits.',
+        'port',
+        tcp_connections_refused,
+    ),
+    (
+        'syslog2irc_tcp_connections_timed_out_total',
+        'TCP connections closed because they have been idle for too long.',
+        'port',
+        tcp_connections_timed_out,
+    ),
+    (
+        'syslog2irc_irc_messages_queued_total',
+        'IRC messages put into the send queue.',
+        'channel',
+        irc_messages_queued,
+    ),
+    (
+        'syslog2irc_irc_messages_dropped_total',
+        'IRC messages dropped because the send queue was full.',
+        'channel',
+        irc_messages_dropped,
+    ),
+    (
+        'syslog2irc_irc_messages_sent_total',
+        'IRC messages sent.',
+        'channel',
+        irc_messages_sent,
+    ),
+    (
+        'syslog2irc_irc_send_seconds_total',
+        'Time spent sending IRC messages, including waits for the rate '
+        'limit.',
+        'channel',
+        irc_send_seconds,
+    ),
+]
+
+
+def collect_counters() -> list[MetricFamily]:
+    """Return the current values of all counters."""
+    return [
+        MetricFamily(name, 'counter', help, label_name, counter.collect())
+        for name, help, label_name, counter in COUNTERS
+    ]
+
+
+def _format_label_value(label: Hashable) -> str:
+    value = format_port(label) if isinstance(label, Port) else str(label)
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def render_metrics(families: Iterable[MetricFamily]) -> str:
+    """Render the metrics in the Prometheus text exposition format."""
+    lines = []
+
+    for family in families:
+        lines.append(f'# HELP {family.name} {family.help}')
+        lines.append(f'# TYPE {family.name} {family.type}')
+
+        samples = sorted(
+            (_format_label_value(label), value)
+            for label, value in family.samples.items()
+        )
+        for label_value, value in samples:
+            if family.label_name is None:
+                lines.append(f'{family.name} {_format_value(value)}')
+            else:
+                lines.append(
+                    f'{family.name}{{{family.label_name}="{label_value}"}} '
+                    f'{_format_value(value)}'
+                )
+
+    return '\n'.join(lines) + '\n'
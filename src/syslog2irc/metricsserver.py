@@ -0,0 +1,85 @@
+"""
+syslog2irc.metricsserver
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+HTTP endpoint for metrics
+
+Kept apart from the metrics themselves so that the HTTP server is only
+imported if metrics are enabled.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import sys
+from typing import Callable, Iterable
+
+from .metrics import (
+    collect_counters,
+    MetricFamily,
+    MetricsConfig,
+    render_metrics,
+)
+from .util import start_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+CollectGaugesCallable = Callable[[], Iterable[MetricFamily]]
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Answer requests for `/metrics`."""
+
+    def do_GET(self) -> None:
+        if self.path != '/metrics':
+            self.send_error(404)
+            return None
+
+        families = collect_counters() + list(self.server.collect_gauges())
+        body = render_metrics(families).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(
+            'Metrics request from %s: ' + format, self.address_string(), *args
+        )
+
+
+def start_metrics_server(
+    config: MetricsConfig, collect_gauges: CollectGaugesCallable
+) -> ThreadingHTTPServer:
+    """Serve metrics via HTTP, in a separate thread."""
+    try:
+        server = ThreadingHTTPServer(
+            (config.host, config.port), MetricsRequestHandler
+        )
+    except OSError as e:
+        sys.stderr.write(f'Error {e.errno:d}: {e.strerror}\n')
+        sys.stderr.write(
+            f'Cannot open metrics port {config.port:d}. Could be already '
+            'in use.\n'
+        )
+        sys.exit(1)
+
+    server.daemon_threads = True
+    server.collect_gauges = collect_gauges
+
+    start_thread(server.serve_forever, 'MetricsServer')
+    logger.info(
+        'Serving metrics on http://%s:%d/metrics.', *server.server_address[:2]
+    )
+
+    return server
@@ -0,0 +1,188 @@
+"""
+syslog2irc.packing
+~~~~~~~~~~~~~~~~~~
+
+Packing of multiple messages into a single IRC line
+
+IRC lines are limited to 512 bytes, including the command, the target,
+and the trailing CR/LF. Sending short messages one per line wastes most
+of that while the rate limit is the bottleneck.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable
+
+
+MAX_LINE_LENGTH = 512
+
+# Servers prepend `:nick!user@host ` to a line when relaying it to other
+# clients, and cut off whatever exceeds the line length limit. Reserve
+# room for a nickname of up to 30, a username of up to 10, and a
+# hostname of up to 63 characters.
+SOURCE_PREFIX_RESERVE = 1 + 30 + 1 + 10 + 1 + 63 + 1
+
+TEXT_ENCODING = 'utf-8'
+
+
+LongMessagePolicy = Enum('LongMessagePolicy', ['SPLIT', 'TRUNCATE'])
+
+
+@dataclass(frozen=True)
+class PackingConfig:
+    """A message packing configuration."""
+
+    separator: str = ' | '
+    max_delay: float = 2.0
+    long_message_policy: LongMessagePolicy = LongMessagePolicy.SPLIT
+
+
+def get_max_text_length(channel_name: str) -> int:
+    """Return how many bytes of text fit into a line to the channel."""
+    command = f'PRIVMSG {channel_name} :'.encode(TEXT_ENCODING)
+    overhead = SOURCE_PREFIX_RESERVE + len(command) + len(b'\r\n')
+    return MAX_LINE_LENGTH - overhead
+
+
+def _find_char_boundary(data: bytes, start: int, max_length: int) -> int:
+    """Return the largest position up to `max_length` bytes after
+    `start` at which the UTF-8 encoded data can be cut without splitting
+    a character.
+    """
+    position = start + max_length
+    if position >= len(data):
+        return len(data)
+
+    # Continuation bytes have the bit pattern `10xxxxxx`.
+    while position > start and (data[position] & 0xC0) == 0x80:
+        position -= 1
+
+    if position == start:
+        raise ValueError(f'Cannot cut text to {max_length:d} bytes.')
+
+    return position
+
+
+def truncate_text(text: str, max_length: int) -> str:
+    """Cut the text so that it is at most `max_length` bytes long when
+    encoded.
+    """
+    data = text.encode(TEXT_ENCODING)
+    if len(data) <= max_length:
+        return text
+
+    end = _find_char_boundary(data, 0, max_length)
+    return data[:end].decode(TEXT_ENCODING)
+
+
+def split_text(text: str, max_length: int) -> list[str]:
+    """Split the text into chunks that are at most `max_length` bytes
+    long when encoded.
+    """
+    data = text.encode(TEXT_ENCODING)
+    if len(data) <= max_length:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = _find_char_boundary(data, start, max_length)
+        chunks.append(data[start:end].decode(TEXT_ENCODING))
+        start = end
+    return chunks
+
+
+class _PendingLine:
+    def __init__(self, text: str, length: int, due_at: float) -> None:
+        self.texts = [text]
+        self.length = length
+        self.due_at = due_at
+
+
+class MessagePacker:
+    """Join consecutive messages to the same channel into single lines.
+
+    A line is sent as soon as the next message would not fit into it
+    anymore, or once the first message in it has waited for the maximum
+    delay.
+
+    Messages that exceed the line length on their own are split or
+    truncated, and are sent right away (after any pending line for the
+    same channel to retain order).
+    """
+
+    def __init__(
+        self, config: PackingConfig, say: Callable[[str, str], None]
+    ) -> None:
+        self.separator = config.separator
+        self.separator_length = len(config.separator.encode(TEXT_ENCODING))
+        self.max_delay = config.max_delay
+        self.long_message_policy = config.long_message_policy
+        self.say = say
+        self._pending_lines: dict[str, _PendingLine] = {}
+        self._max_text_lengths: dict[str, int] = {}
+
+    def _get_max_text_length(self, channel_name: str) -> int:
+        max_text_length = self._max_text_lengths.get(channel_name)
+        if max_text_length is None:
+            max_text_length = get_max_text_length(channel_name)
+            self._max_text_lengths[channel_name] = max_text_length
+        return max_text_length
+
+    def add(self, channel_name: str, text: str, now: float) -> None:
+        """Queue the text to be sent to the channel."""
+        max_text_length = self._get_max_text_length(channel_name)
+        length = len(text.encode(TEXT_ENCODING))
+        pending_line = self._pending_lines.get(channel_name)
+
+        if length > max_text_length:
+            if pending_line is not None:
+                self._send(channel_name)
+            self._send_long_message(channel_name, text, max_text_length)
+            return
+
+        if pending_line is not None:
+            packed_length = pending_line.length + self.separator_length + length
+            if packed_length <= max_text_length:
+                pending_line.texts.append(text)
+                pending_line.length = packed_length
+                return
+
+            self._send(channel_name)
+
+        self._pending_lines[channel_name] = _PendingLine(
+            text, length, now + self.max_delay
+        )
+
+    def _send_long_message(
+        self, channel_name: str, text: str, max_text_length: int
+    ) -> None:
+        if self.long_message_policy == LongMessagePolicy.TRUNCATE:
+            self.say(channel_name, truncate_text(text, max_text_length))
+        else:
+            for chunk in split_text(text, max_text_length):
+                self.say(channel_name, chunk)
+
+    def _send(self, channel_name: str) -> None:
+        pending_line = self._pending_lines.pop(channel_name)
+        self.say(channel_name, self.separator.join(pending_line.texts))
+
+    def flush_due(self, now: float) -> None:
+        """Send lines whose first message has waited long enough."""
+        due_channel_names = [
+            channel_name
+            for channel_name, pending_line in self._pending_lines.items()
+            if pending_line.due_at <= now
+        ]
+
+        for channel_name in due_channel_names:
+            self._send(channel_name)
+
+    def flush_all(self) -> None:
+        """Send all pending lines."""
+        for channel_name in list(self._pending_lines):
+            self._send(channel_name)
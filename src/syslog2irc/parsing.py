@@ -0,0 +1,203 @@
+"""
+syslog2irc.parsing
+~~~~~~~~~~~~~~~~~~
+
+Parsing of syslog messages in both the BSD format (RFC 3164) and the
+format of RFC 5424
+
+The format is detected per message: RFC 5424 messages carry a version
+number right after the priority value. BSD messages are parsed by
+syslogmp.
+
+RFC 5424 messages are matched in place (e.g. in a receive buffer, via
+a memoryview); only the fields needed for formatting and routing are
+copied out. Structured data is kept as is and only parsed on access
+(e.g. by a custom message formatter).
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import re
+from typing import Dict, Union
+
+import syslogmp
+from syslogmp import Facility, Message as SyslogMessage, Severity
+
+
+NIL_VALUE = '-'
+
+_BOM = b'\xef\xbb\xbf'
+
+# priority value, version 1, timestamp, hostname, app name (the process
+# ID and message ID are skipped)
+_HEADER_REGEX = re.compile(
+    rb'<(\d{1,3})>1 (\S+) (\S{1,255}) (\S{1,48}) \S+ \S+ '
+)
+
+_TIMESTAMP_REGEX = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?'
+    r'(?:(Z)|([+-])(\d\d):(\d\d))$'
+)
+
+_SD_NAME = rb'[^ \]="]+'
+_SD_PARAM_VALUE = rb'(?:[^"\\]|\\.)*'
+_STRUCTURED_DATA_REGEX = re.compile(
+    rb'(?:\[%s(?: %s="%s")*\])+' % (_SD_NAME, _SD_NAME, _SD_PARAM_VALUE),
+    re.DOTALL,
+)
+_SD_ELEMENT_REGEX = re.compile(
+    rb'\[(%s)((?: %s="%s")*)\]' % (_SD_NAME, _SD_NAME, _SD_PARAM_VALUE),
+    re.DOTALL,
+)
+_SD_PARAM_REGEX = re.compile(
+    rb' (%s)="(%s)"' % (_SD_NAME, _SD_PARAM_VALUE), re.DOTALL
+)
+_SD_ESCAPE_REGEX = re.compile(rb'\\(["\\\]])')
+
+
+StructuredData = Dict[str, Dict[str, str]]
+
+
+@dataclass(frozen=True)
+class Rfc5424Message(SyslogMessage):
+    """A syslog message in the format of RFC 5424.
+
+    Absent values are represented by the NIL value (`-`).
+    """
+
+    app_name: str = NIL_VALUE
+    raw_structured_data: bytes = NIL_VALUE.encode('ascii')
+
+    @property
+    def structured_data(self) -> StructuredData:
+        """Return the parameters by structured data element ID.
+
+        The structured data is parsed on each access.
+        """
+        return parse_structured_data(self.raw_structured_data)
+
+
+def parse_message(data: Union[bytes, memoryview]) -> SyslogMessage:
+    """Parse a syslog message in either format.
+
+    Raise `ValueError` if the message is invalid.
+    """
+    match = _HEADER_REGEX.match(data)
+    if match is None:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return syslogmp.parse(data)
+
+    return _parse_rfc5424_message(data, match)
+
+
+def _parse_rfc5424_message(
+    data: Union[bytes, memoryview], match: re.Match
+) -> Rfc5424Message:
+    (
+        priority_value,
+        timestamp_value,
+        hostname_value,
+        app_name_value,
+    ) = match.groups()
+
+    priority = int(priority_value)
+    if priority >= len(Facility) * len(Severity):
+        raise ValueError(f'Invalid priority value {priority:d}.')
+
+    position = match.end()
+
+    if data[position : position + 1] == b'-':
+        raw_structured_data = b'-'
+        position += 1
+    else:
+        structured_data_match = _STRUCTURED_DATA_REGEX.match(data, position)
+        if structured_data_match is None:
+            raise ValueError('Invalid structured data.')
+        raw_structured_data = structured_data_match.group()
+        position = structured_data_match.end()
+
+    if position == len(data):
+        text = b''
+    elif data[position : position + 1] == b' ':
+        text = bytes(data[position + 1 :])
+        if text.startswith(_BOM):
+            text = text[len(_BOM) :]
+    else:
+        raise ValueError('Invalid structured data.')
+
+    return Rfc5424Message(
+        facility=Facility(priority >> 3),
+        severity=Severity(priority & 7),
+        timestamp=parse_timestamp(timestamp_value.decode('ascii')),
+        hostname=hostname_value.decode('ascii', 'replace'),
+        message=text,
+        app_name=app_name_value.decode('ascii', 'replace'),
+        raw_structured_data=raw_structured_data,
+    )
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an RFC 5424 (i.e. RFC 3339) timestamp.
+
+    As with BSD messages, the time of reception is used in its absence.
+    """
+    if value == NIL_VALUE:
+        return datetime.now()
+
+    match = _TIMESTAMP_REGEX.match(value)
+    if match is None:
+        raise ValueError(f'Invalid timestamp "{value}".')
+
+    (
+        year,
+        month,
+        day,
+        hour,
+        minute,
+        second,
+        fraction,
+        utc,
+        offset_sign,
+        offset_hours,
+        offset_minutes,
+    ) = match.groups()
+
+    if utc:
+        tzinfo = timezone.utc
+    else:
+        offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+        tzinfo = timezone(-offset if offset_sign == '-' else offset)
+
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+
+    return datetime(
+        int(year),
+        int(month),
+        int(day),
+        int(hour),
+        int(minute),
+        int(second),
+        microsecond,
+        tzinfo,
+    )
+
+
+def parse_structured_data(data: bytes) -> StructuredData:
+    """Parse structured data into parameters by element ID."""
+    structured_data: StructuredData = {}
+
+    for element_match in _SD_ELEMENT_REGEX.finditer(data):
+        element_id, params_data = element_match.groups()
+
+        params = structured_data.setdefault(element_id.decode('utf-8'), {})
+        for param_match in _SD_PARAM_REGEX.finditer(params_data):
+            name, value = param_match.groups()
+            value = _SD_ESCAPE_REGEX.sub(rb'\1', value)
+            params[name.decode('utf-8')] = value.decode('utf-8', 'replace')
+
+    return structured_data
@@ -0,0 +1,156 @@
+"""
+syslog2irc.queueing
+~~~~~~~~~~~~~~~~~~~
+
+A bounded queue for received syslog messages
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter, deque
+from dataclasses import dataclass
+from enum import Enum
+from itertools import count
+from threading import Condition
+from typing import Optional, Tuple
+
+from syslogmp import Message as SyslogMessage
+
+from . import metrics
+from .network import Port
+
+
+OverflowPolicy = Enum(
+    'OverflowPolicy', ['DROP_NEWEST', 'DROP_OLDEST', 'DROP_LOWEST_SEVERITY']
+)
+
+
+@dataclass(frozen=True)
+class QueueConfig:
+    """A message queue configuration."""
+
+    max_size: int = 10000
+    overflow_policy: OverflowPolicy = OverflowPolicy.DROP_NEWEST
+    drop_notice_interval: float = 60.0
+
+
+QueueItem = Tuple[Port, Tuple[str, int], SyslogMessage]
+
+
+class MessageQueue:
+    """A thread-safe FIFO queue of received syslog messages with limited
+    size.
+
+    If the queue is full, a message is dropped according to the overflow
+    policy. Dropped messages are counted per port.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_NEWEST,
+    ) -> None:
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+
+        # To drop the least important messages first, messages are kept
+        # in separate buckets by severity. Otherwise, a single bucket is
+        # used. Each entry is prefixed by a sequence number to retain
+        # the order of arrival across buckets.
+        bucket_count = (
+            8 if overflow_policy == OverflowPolicy.DROP_LOWEST_SEVERITY else 1
+        )
+        self._buckets: list[deque[tuple[int, QueueItem]]] = [
+            deque() for _ in range(bucket_count)
+        ]
+        self._sequence = count()
+        self._size = 0
+        self._dropped_counts: Counter[Port] = Counter()
+        self._not_empty = Condition()
+
+    def put(
+        self,
+        port: Port,
+        source_address: tuple[str, int],
+        message: SyslogMessage,
+    ) -> None:
+        """Append a message, dropping one if the queue is full."""
+        item = (port, source_address, message)
+
+        with self._not_empty:
+            if self._size >= self.max_size:
+                dropped_item = self._drop(item)
+                self._dropped_counts[dropped_item[0]] += 1
+                metrics.messages_dropped.increment(dropped_item[0])
+                if dropped_item is item:
+                    return
+
+            metrics.messages_queued.increment(port)
+
+            bucket_index = self._get_bucket_index(message)
+            self._buckets[bucket_index].append((next(self._sequence), item))
+            self._size += 1
+            self._not_empty.notify()
+
+    def _get_bucket_index(self, message: SyslogMessage) -> int:
+        if len(self._buckets) == 1:
+            return 0
+
+        return message.severity.value
+
+    def _drop(self, new_item: QueueItem) -> QueueItem:
+        """Remove and return the item to drop to make room for a new one.
+
+        Return the new item if that is to be dropped instead.
+        """
+        policy = self.overflow_policy
+
+        if policy == OverflowPolicy.DROP_OLDEST:
+            return self._pop_oldest()
+
+        if policy == OverflowPolicy.DROP_LOWEST_SEVERITY:
+            # The highest severity value denotes the lowest severity.
+            new_severity_value = new_item[2].severity.value
+            for severity_value in range(7, new_severity_value - 1, -1):
+                bucket = self._buckets[severity_value]
+                if bucket:
+                    self._size -= 1
+                    return bucket.popleft()[1]
+
+        return new_item
+
+    def get(self, timeout: Optional[float] = None) -> Optional[QueueItem]:
+        """Remove and return the oldest message.
+
+        Return `None` if no message has arrived within the timeout.
+        """
+        with self._not_empty:
+            if not self._size:
+                self._not_empty.wait(timeout)
+                if not self._size:
+                    return None
+
+            return self._pop_oldest()
+
+    def _pop_oldest(self) -> QueueItem:
+        oldest_bucket = min(
+            (bucket for bucket in self._buckets if bucket),
+            key=lambda bucket: bucket[0][0],
+        )
+        self._size -= 1
+        return oldest_bucket.popleft()[1]
+
+    def qsize(self) -> int:
+        """Return the number of queued messages."""
+        return self._size
+
+    def take_dropped_counts(self) -> Counter[Port]:
+        """Return the number of messages dropped per port since the last
+        call, and reset the counts.
+        """
+        with self._not_empty:
+            dropped_counts = self._dropped_counts
+            self._dropped_counts = Counter()
+            return dropped_counts
@@ -0,0 +1,139 @@
+"""
+syslog2irc.ringbuffer
+~~~~~~~~~~~~~~~~~~~~~
+
+A ring buffer in shared memory to pass records from multiple producer
+processes to a single consumer process
+
+The memory is mapped anonymously and therefore shared only with
+processes forked after the ring buffer has been created.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+import mmap
+import multiprocessing
+import struct
+from typing import Optional
+
+
+# write position, read position, number of dropped records
+_HEADER = struct.Struct('=QQQ')
+
+_LENGTH = struct.Struct('=I')
+
+# Marks the unused remainder at the end of the data area; the next
+# record starts at the beginning of the data area.
+_WRAP_MARKER = 0xFFFFFFFF
+
+
+class RingBuffer:
+    """A bounded, multi-producer, single-consumer queue of byte strings
+    in shared memory.
+
+    Records that do not fit into the remaining space are dropped (and
+    counted) instead of blocking the producer.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < _LENGTH.size * 2:
+            raise ValueError(f'Ring buffer capacity {capacity:d} is too small')
+
+        self.capacity = capacity
+        self._memory = mmap.mmap(-1, _HEADER.size + capacity)
+        self._data = memoryview(self._memory)[_HEADER.size :]
+
+        context = multiprocessing.get_context('fork')
+        self._lock = context.Lock()
+        self._records_available = context.Semaphore(0)
+
+    def put(self, record: bytes) -> bool:
+        """Append a record.
+
+        Return `False` if the record had to be dropped for lack of space.
+        """
+        size = _LENGTH.size + len(record)
+        capacity = self.capacity
+
+        with self._lock:
+            write_pos, read_pos, dropped = _HEADER.unpack_from(self._memory)
+            offset = write_pos % capacity
+            free = capacity - (write_pos - read_pos)
+
+            # A record must not be split at the end of the data area.
+            # If it does not fit before the end, the end is skipped.
+            gap = 0
+            if capacity - offset < size:
+                gap = capacity - offset
+
+            if gap + size > free:
+                dropped += 1
+                _HEADER.pack_into(
+                    self._memory, 0, write_pos, read_pos, dropped
+                )
+                return False
+
+            if gap:
+                if gap >= _LENGTH.size:
+                    _LENGTH.pack_into(self._data, offset, _WRAP_MARKER)
+                offset = 0
+
+            _LENGTH.pack_into(self._data, offset, len(record))
+            start = offset + _LENGTH.size
+            self._data[start : start + len(record)] = record
+
+            write_pos += gap + size
+            _HEADER.pack_into(self._memory, 0, write_pos, read_pos, dropped)
+
+        self._records_available.release()
+        return True
+
+    def get_many(
+        self, max_count: int, timeout: Optional[float] = None
+    ) -> list[bytes]:
+        """Remove and return up to `max_count` records.
+
+        Block until at least one record is available, or return an empty
+        list if none has become available within the timeout.
+        """
+        if not self._records_available.acquire(timeout=timeout):
+            return []
+
+        count = 1
+        while count < max_count and self._records_available.acquire(False):
+            count += 1
+
+        records = []
+        capacity = self.capacity
+
+        with self._lock:
+            write_pos, read_pos, dropped = _HEADER.unpack_from(self._memory)
+
+            for _ in range(count):
+                offset = read_pos % capacity
+
+                if capacity - offset < _LENGTH.size:
+                    read_pos += capacity - offset
+                    offset = 0
+                else:
+                    (length,) = _LENGTH.unpack_from(self._data, offset)
+                    if length == _WRAP_MARKER:
+                        read_pos += capacity - offset
+                        offset = 0
+
+                (length,) = _LENGTH.unpack_from(self._data, offset)
+                start = offset + _LENGTH.size
+                records.append(self._data[start : start + length].tobytes())
+                read_pos += _LENGTH.size + length
+
+            _HEADER.pack_into(self._memory, 0, write_pos, read_pos, dropped)
+
+        return records
+
+    @property
+    def dropped(self) -> int:
+        """Return the number of records dropped so far for lack of space."""
+        with self._lock:
+            return _HEADER.unpack_from(self._memory)[2]
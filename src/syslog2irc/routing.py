@@ -4,6 +4,20 @@ syslog2irc.routing
 
 Routing of syslog messages to IRC channels by the port they arrive on.
 
+Routes can be restricted to messages of certain severities and
+facilities. Those filters are compiled into lookup tables indexed by
+the message's priority value (facility and severity combined).
+
+Routes can also be restricted to messages whose text does or does not
+match patterns. The patterns of all routes from a port are matched in
+a combined pass.
+
+Which of the channels a message is routed to are currently joined (and
+which have been left, for now) is precomputed whenever a channel is
+joined or left, so that does not need to be checked per message.
+
+Routes can be replaced while running (on configuration reload).
+
 :Copyright: 2007-2021 Jochen Kupperschmidt
 :License: MIT, see LICENSE for details.
 """
@@ -12,56 +26,351 @@ from __future__ import annotations
 from collections import defaultdict
 from dataclasses import dataclass
 import logging
-from typing import Any, Optional
+from threading import Lock
+from typing import Any, Iterable, Optional
 
+from syslogmp import Facility, Message as SyslogMessage, Severity
+
+from .matching import MultiPatternMatcher, PatternFilter
 from .network import format_port, Port
 
 
 logger = logging.getLogger(__name__)
 
 
+# number of distinct priority values (facility * 8 + severity)
+PRIORITY_COUNT = len(Facility) * len(Severity)
+
+
 @dataclass(frozen=True)
 class Route:
-    """A route from a syslog message receiver port to an IRC channel."""
+    """A route from a syslog message receiver port to an IRC channel.
+
+    Optionally, only messages with at least the minimum severity (i.e. a
+    severity value up to the minimum severity's) and/or of one of the
+    given facilities are routed.
+
+    Also optionally, only messages whose text matches one of the include
+    patterns (if any), and none of the exclude patterns, are routed.
+
+    If a storm threshold (messages per second) is set, messages on the
+    route are summarized periodically while their rate exceeds it.
+    """
 
     syslog_port: Port
     irc_channel_name: str
+    min_severity: Optional[Severity] = None
+    facilities: Optional[frozenset[Facility]] = None
+    include_patterns: tuple[str, ...] = ()
+    exclude_patterns: tuple[str, ...] = ()
+    storm_threshold: Optional[float] = None
+
+    @property
+    def has_patterns(self) -> bool:
+        return bool(self.include_patterns or self.exclude_patterns)
+
+    def get_priority_mask(self) -> int:
+        """Return a bitmask in which the bit for each priority value
+        that passes this route's filters is set.
+        """
+        mask = 0
+        for facility in Facility:
+            if self.facilities is not None and facility not in self.facilities:
+                continue
+
+            for severity in Severity:
+                if (
+                    self.min_severity is not None
+                    and severity.value > self.min_severity.value
+                ):
+                    continue
+
+                mask |= 1 << get_priority(facility, severity)
+
+        return mask
+
+
+# the usual short names (as used by syslog daemons)
+SEVERITY_ALIASES = {
+    'emerg': Severity.emergency,
+    'crit': Severity.critical,
+    'err': Severity.error,
+    'warn': Severity.warning,
+    'info': Severity.informational,
+}
+FACILITY_ALIASES = {
+    'kern': Facility.kernel,
+    'daemon': Facility.system_daemons,
+    'auth': Facility.security4,
+    'syslog': Facility.internal,
+    'lpr': Facility.line_printer,
+    'news': Facility.network_news,
+    'cron': Facility.clock9,
+    'authpriv': Facility.security10,
+}
+
+
+def parse_severity(name: str) -> Severity:
+    """Return the severity by name (or common abbreviation).
+
+    Raise `ValueError` if unknown.
+    """
+    severity = SEVERITY_ALIASES.get(name)
+    if severity is not None:
+        return severity
+
+    try:
+        return Severity[name]
+    except KeyError:
+        raise ValueError(f'Unknown severity "{name}"')
+
+
+def parse_facility(name: str) -> Facility:
+    """Return the facility by name (or common abbreviation).
+
+    Raise `ValueError` if unknown.
+    """
+    facility = FACILITY_ALIASES.get(name)
+    if facility is not None:
+        return facility
+
+    try:
+        return Facility[name]
+    except KeyError:
+        raise ValueError(f'Unknown facility "{name}"')
+
+
+def get_priority(facility: Facility, severity: Severity) -> int:
+    """Return the priority value as encoded in syslog messages."""
+    return facility.value * 8 + severity.value
+
+
+@dataclass(frozen=True)
+class ChannelTargets:
+    """The channels a message is to be sent to right away, and the ones
+    it is to be held for until they are joined again.
+    """
+
+    live_channel_names: tuple[str, ...] = ()
+    held_channel_names: tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.live_channel_names or self.held_channel_names)
+
+
+NO_TARGETS = ChannelTargets()
 
 
 class Router:
     """Map syslog port numbers to IRC channel names."""
 
     def __init__(self, routes: set[Route]) -> None:
-        self.ports_to_channel_names = map_ports_to_channel_names(routes)
-        self.channel_names_to_ports = map_channel_names_to_ports(
-            self.ports_to_channel_names
+        # Channels are joined and left from the IRC bot's thread(s), and
+        # routes are replaced from the main thread.
+        self._lock = Lock()
+
+        # The following are replaced as a whole (instead of being updated
+        # in place) whenever a channel is joined or left, so other
+        # threads can read them without locking.
+
+        # channels that have been joined (whether routed to or not)
+        self._joined_channels: frozenset[str] = frozenset()
+
+        # channels that have been joined and are routed to
+        self.enabled_channels: frozenset[str] = frozenset()
+
+        # channels that have not been joined yet, or have been left since
+        # (messages are held for those)
+        self.departed_channels: frozenset[str] = frozenset()
+
+        # Ports from which messages are forwarded to (or held for) at
+        # least one channel.
+        self.active_ports: frozenset[Port] = frozenset()
+
+        # targets by the channel names a message is routed to, for every
+        # result of routing by priority alone
+        self._targets: dict[tuple[str, ...], ChannelTargets] = {}
+
+        self.update_routes(routes)
+
+    def update_routes(self, routes: set[Route]) -> None:
+        """Replace the routes.
+
+        Channels that have been joined stay joined. Each table is built
+        completely before it replaces the old one.
+
+        Meant to be called from the thread that routes messages (only
+        whether a port is active is also checked by other threads).
+        """
+        ports_to_channel_names = map_ports_to_channel_names(routes)
+        channel_names_to_ports = map_channel_names_to_ports(
+            ports_to_channel_names
         )
-        self.enabled_channels: set[str] = set()
+        port_routers = create_port_routers(routes)
+
+        with self._lock:
+            self.ports_to_channel_names = ports_to_channel_names
+            self.channel_names_to_ports = channel_names_to_ports
+            self.port_routers = port_routers
+
+            self.enabled_channels = frozenset(
+                channel_name
+                for channel_name in self._joined_channels
+                if channel_name in channel_names_to_ports
+            )
+            self.departed_channels = frozenset(
+                channel_name
+                for channel_name in self.departed_channels
+                if channel_name in channel_names_to_ports
+            )
+            self._update_targets()
 
     def enable_channel(
         self, sender: Any, *, channel_name: Optional[str] = None
     ) -> None:
-        ports = self.channel_names_to_ports.get(channel_name, set())
-        if not ports:
-            logger.warning(
-                'No syslog ports routed to IRC channel %s, '
-                'will not forward to it.',
-                channel_name,
-            )
-            return
+        with self._lock:
+            self._joined_channels = self._joined_channels | {channel_name}
+
+            ports = self.channel_names_to_ports.get(channel_name, set())
+            if not ports:
+                logger.warning(
+                    'No syslog ports routed to IRC channel %s, '
+                    'will not forward to it.',
+                    channel_name,
+                )
+                return
+
+            self.enabled_channels = self.enabled_channels | {channel_name}
+            self.departed_channels = self.departed_channels - {channel_name}
+            self._update_targets()
 
-        self.enabled_channels.add(channel_name)
         logger.info(
             'Enabled forwarding to IRC channel %s from syslog port(s) %s.',
             channel_name,
             ', '.join(map(format_port, sorted(ports))),
         )
 
+    def disable_channel(
+        self, sender: Any, *, channel_name: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            self._joined_channels = self._joined_channels - {channel_name}
+
+            if channel_name not in self.enabled_channels:
+                return
+
+            self.enabled_channels = self.enabled_channels - {channel_name}
+            self.departed_channels = self.departed_channels | {channel_name}
+            self._update_targets()
+
+        logger.info(
+            'Disabled forwarding to IRC channel %s, holding messages until '
+            'it is joined again.',
+            channel_name,
+        )
+
+    def hold_for_channels(self, channel_names: Iterable[str]) -> None:
+        """Hold messages for the channels until they are joined (e.g.
+        while connecting).
+        """
+        with self._lock:
+            self.departed_channels = self.departed_channels | frozenset(
+                channel_name
+                for channel_name in channel_names
+                if channel_name in self.channel_names_to_ports
+                and channel_name not in self.enabled_channels
+            )
+            self._update_targets()
+
+    def forget_channel(self, channel_name: str) -> None:
+        """Stop forwarding to (and holding messages for) a channel that
+        is about to be left for good.
+        """
+        with self._lock:
+            self._joined_channels = self._joined_channels - {channel_name}
+            self.enabled_channels = self.enabled_channels - {channel_name}
+            self.departed_channels = self.departed_channels - {channel_name}
+            self._update_targets()
+
+    def _update_targets(self) -> None:
+        reachable_channels = self.enabled_channels | self.departed_channels
+
+        self.active_ports = frozenset(
+            port
+            for port, channel_names in self.ports_to_channel_names.items()
+            if not channel_names.isdisjoint(reachable_channels)
+        )
+
+        targets = {}
+        for port_router in self.port_routers.values():
+            for channel_names in port_router.get_channel_name_tuples():
+                targets[channel_names] = self._split_targets(channel_names)
+        self._targets = targets
+
+    def _split_targets(self, channel_names: tuple[str, ...]) -> ChannelTargets:
+        enabled_channels = self.enabled_channels
+        departed_channels = self.departed_channels
+
+        live_channel_names = tuple(
+            channel_name
+            for channel_name in channel_names
+            if channel_name in enabled_channels
+        )
+        held_channel_names = tuple(
+            channel_name
+            for channel_name in channel_names
+            if channel_name in departed_channels
+        )
+
+        if not (live_channel_names or held_channel_names):
+            return NO_TARGETS
+
+        return ChannelTargets(live_channel_names, held_channel_names)
+
     def is_channel_enabled(self, channel: str) -> bool:
         return channel in self.enabled_channels
 
+    def is_port_active(self, port: Port) -> bool:
+        """Return `True` if messages received on the port would be
+        forwarded to (or held for) at least one channel.
+        """
+        return port in self.active_ports
+
     def get_channel_names_for_port(self, port: Port) -> set[str]:
-        return self.ports_to_channel_names[port]
+        return self.ports_to_channel_names.get(port, set())
+
+    def get_channel_names_for_message(
+        self, port: Port, message: SyslogMessage
+    ) -> tuple[str, ...]:
+        """Return the names of the channels the message is routed to,
+        according to the routes' filters.
+        """
+        port_router = self.port_routers.get(port)
+        if port_router is None:
+            # The port's routes have been removed since the message was
+            # received.
+            return ()
+
+        return port_router.get_channel_names(message)
+
+    def get_targets_for_message(
+        self, port: Port, message: SyslogMessage
+    ) -> ChannelTargets:
+        """Return the channels the message is to be sent to, and the ones
+        it is to be held for.
+        """
+        port_router = self.port_routers.get(port)
+        if port_router is None:
+            return NO_TARGETS
+
+        channel_names = port_router.get_channel_names(message)
+
+        targets = self._targets.get(channel_names)
+        if targets is None:
+            # A combination that only pattern filters produce
+            targets = self._split_targets(channel_names)
+
+        return targets
 
 
 def map_ports_to_channel_names(routes: set[Route]) -> dict[Port, set[str]]:
@@ -79,3 +388,127 @@ def map_channel_names_to_ports(
         for channel_name in channel_names:
             channel_names_to_ports[channel_name].add(port)
     return dict(channel_names_to_ports)
+
+
+class PortRouter:
+    """Decide to which channels a message received on a single port is
+    routed.
+    """
+
+    def __init__(self, routes: Iterable[Route]) -> None:
+        # Multiple routes to the same channel pass the union of what each
+        # of them passes.
+        priority_masks: dict[str, int] = defaultdict(int)
+        routes_with_patterns = []
+        for route in routes:
+            if route.has_patterns:
+                routes_with_patterns.append(route)
+            else:
+                priority_masks[route.irc_channel_name] |= (
+                    route.get_priority_mask()
+                )
+
+        self._channel_names_by_priority = _create_priority_table(
+            [
+                (mask, channel_name)
+                for channel_name, mask in sorted(priority_masks.items())
+            ]
+        )
+
+        self._matcher: Optional[MultiPatternMatcher] = None
+        self._filters_by_priority: Optional[
+            list[tuple[tuple[str, PatternFilter], ...]]
+        ] = None
+        if routes_with_patterns:
+            self._compile_pattern_filters(routes_with_patterns)
+
+    def _compile_pattern_filters(self, routes: list[Route]) -> None:
+        patterns = sorted(
+            {
+                pattern
+                for route in routes
+                for pattern in route.include_patterns + route.exclude_patterns
+            }
+        )
+        pattern_bits = {pattern: 1 << i for i, pattern in enumerate(patterns)}
+
+        def get_mask(patterns: tuple[str, ...]) -> int:
+            mask = 0
+            for pattern in patterns:
+                mask |= pattern_bits[pattern]
+            return mask
+
+        entries = []
+        for route in sorted(routes, key=lambda route: route.irc_channel_name):
+            pattern_filter = PatternFilter(
+                include_mask=get_mask(route.include_patterns),
+                exclude_mask=get_mask(route.exclude_patterns),
+            )
+            entries.append(
+                (
+                    route.get_priority_mask(),
+                    (route.irc_channel_name, pattern_filter),
+                )
+            )
+
+        self._matcher = MultiPatternMatcher(patterns)
+        self._filters_by_priority = _create_priority_table(entries)
+
+    def get_channel_name_tuples(self) -> set[tuple[str, ...]]:
+        """Return the distinct results of routing by priority alone."""
+        return set(self._channel_names_by_priority)
+
+    def get_channel_names(self, message: SyslogMessage) -> tuple[str, ...]:
+        priority = message.facility.value * 8 + message.severity.value
+        channel_names = self._channel_names_by_priority[priority]
+
+        if self._filters_by_priority is None:
+            return channel_names
+
+        # Only match patterns if that could add a channel.
+        candidates = [
+            (channel_name, pattern_filter)
+            for channel_name, pattern_filter in self._filters_by_priority[
+                priority
+            ]
+            if channel_name not in channel_names
+        ]
+        if not candidates:
+            return channel_names
+
+        matched_mask = self._matcher.match(
+            message.message,
+            [pattern_filter for _, pattern_filter in candidates],
+        )
+        matching_channel_names = {
+            channel_name
+            for channel_name, pattern_filter in candidates
+            if pattern_filter.passes(matched_mask)
+        }
+        if not matching_channel_names:
+            return channel_names
+
+        return tuple(sorted(matching_channel_names.union(channel_names)))
+
+
+def _create_priority_table(
+    entries: list[tuple[int, Any]]
+) -> list[tuple[Any, ...]]:
+    """Return a table, indexed by priority value, of the values of the
+    entries whose priority mask has the priority's bit set.
+    """
+    return [
+        tuple(value for mask, value in entries if mask >> priority & 1)
+        for priority in range(PRIORITY_COUNT)
+    ]
+
+
+def create_port_routers(routes: set[Route]) -> dict[Port, PortRouter]:
+    routes_by_port = defaultdict(list)
+    for route in routes:
+        routes_by_port[route.syslog_port].append(route)
+
+    return {
+        port: PortRouter(port_routes)
+        for port, port_routes in routes_by_port.items()
+    }
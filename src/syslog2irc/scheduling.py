@@ -0,0 +1,173 @@
+"""
+syslog2irc.scheduling
+~~~~~~~~~~~~~~~~~~~~~
+
+Fair scheduling of outgoing IRC messages across targets
+
+Each target (usually a channel) has its own queue. Messages are taken
+from those queues by smooth weighted round-robin so that a busy channel
+cannot use up the whole rate limit of the connection while others wait.
+
+Queues of other targets (i.e. nicknames that replies to commands are
+sent to) are removed once empty, and are not included in metrics or
+drop counts.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter, deque
+import logging
+from threading import Condition
+from time import monotonic
+from typing import Callable, Optional
+
+from irc.client import is_channel
+
+from . import metrics
+from .util import start_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_QUEUE_SIZE = 1000
+
+
+class SendScheduler:
+    """Queue messages per target, and send them in weighted round-robin
+    order from a separate thread.
+
+    Sending is expected to block as long as required to comply with the
+    connection's rate limit.
+
+    If a target's queue is full, its oldest message is dropped. That way,
+    a flooding channel only loses its own messages.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], None],
+        weights: dict[str, int],
+        *,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+    ) -> None:
+        self._send = send
+        self._weights = weights
+        self._max_queue_size = max_queue_size
+        self._queues: dict[str, deque[str]] = {}
+        self._current_weights: Counter[str] = Counter()
+        self._dropped_counts: Counter[str] = Counter()
+        self._condition = Condition()
+
+    def start(self) -> None:
+        """Send queued messages, in a separate thread."""
+        start_thread(self._run, self.__class__.__name__)
+
+    def set_weight(self, target: str, weight: int) -> None:
+        """Set (or change) the target's weight."""
+        with self._condition:
+            self._weights = {**self._weights, target: weight}
+
+    def enqueue(self, target: str, text: str) -> None:
+        """Queue a message for the target."""
+        with self._condition:
+            queue = self._queues.get(target)
+            if queue is None:
+                queue = self._queues[target] = deque()
+
+            if len(queue) >= self._max_queue_size:
+                queue.popleft()
+                if is_channel(target):
+                    self._dropped_counts[target] += 1
+                    metrics.irc_messages_dropped.increment(target)
+
+            queue.append(text)
+            if is_channel(target):
+                metrics.irc_messages_queued.increment(target)
+            self._condition.notify()
+
+    def take_next(self) -> Optional[tuple[str, str]]:
+        """Remove and return the next message to send, and its target.
+
+        Return `None` if all queues are empty.
+        """
+        with self._condition:
+            return self._select()
+
+    def _select(self) -> Optional[tuple[str, str]]:
+        selected_target = None
+        total_weight = 0
+
+        for target, queue in self._queues.items():
+            if not queue:
+                continue
+
+            weight = self._weights.get(target, 1)
+            self._current_weights[target] += weight
+            total_weight += weight
+
+            if (
+                selected_target is None
+                or self._current_weights[target]
+                > self._current_weights[selected_target]
+            ):
+                selected_target = target
+
+        if selected_target is None:
+            return None
+
+        self._current_weights[selected_target] -= total_weight
+
+        queue = self._queues[selected_target]
+        text = queue.popleft()
+        if not queue:
+            # Do not let an idle target accumulate credit.
+            del self._current_weights[selected_target]
+            if not is_channel(selected_target):
+                del self._queues[selected_target]
+
+        return selected_target, text
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                item = self._select()
+                while item is None:
+                    self._condition.wait()
+                    item = self._select()
+
+            target, text = item
+            to_channel = is_channel(target)
+            started_at = monotonic()
+            try:
+                self._send(target, text)
+            except Exception as e:
+                logger.warning('Could not send message to %s: %s', target, e)
+            else:
+                if to_channel:
+                    metrics.irc_messages_sent.increment(target)
+            finally:
+                if to_channel:
+                    metrics.irc_send_seconds.increment(
+                        target, monotonic() - started_at
+                    )
+
+    def get_queue_sizes(self) -> dict[str, int]:
+        """Return the number of queued messages per channel."""
+        with self._condition:
+            return {
+                target: len(queue)
+                for target, queue in self._queues.items()
+                if is_channel(target)
+            }
+
+    def take_dropped_counts(self) -> Counter[str]:
+        """Return the number of messages dropped per channel since the
+        last call, and reset the counts.
+        """
+        with self._condition:
+            dropped_counts = self._dropped_counts
+            self._dropped_counts = Counter()
+            return dropped_counts
@@ -0,0 +1,135 @@
+"""
+syslog2irc.serialization
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Compact binary representation of received syslog messages
+
+Used to pass already parsed messages between processes without having
+to parse them again.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from datetime import datetime
+import struct
+
+from syslogmp import Facility, Message as SyslogMessage, Severity
+
+from .network import Port, TransportProtocol
+from .parsing import Rfc5424Message
+
+
+# port number, transport protocol, source port, facility, severity,
+# the lengths of source host, timestamp, hostname, and message text,
+# and the lengths of app name and structured data (zero for BSD
+# messages, at least one for RFC 5424 messages as absent values are
+# represented by `-`)
+_HEADER = struct.Struct('!HBHBBBBHIBH')
+
+
+def encode_message(
+    port: Port, source_address: tuple[str, int], message: SyslogMessage
+) -> bytes:
+    """Serialize a received message."""
+    source_host = source_address[0].encode('ascii')
+    timestamp = message.timestamp.isoformat().encode('ascii')
+    hostname = message.hostname.encode('utf-8')
+
+    if isinstance(message, Rfc5424Message):
+        app_name = message.app_name.encode('utf-8')
+        structured_data = message.raw_structured_data
+    else:
+        app_name = structured_data = b''
+
+    header = _HEADER.pack(
+        port.number,
+        port.transport_protocol.value,
+        source_address[1],
+        message.facility.value,
+        message.severity.value,
+        len(source_host),
+        len(timestamp),
+        len(hostname),
+        len(message.message),
+        len(app_name),
+        len(structured_data),
+    )
+
+    return b''.join(
+        [
+            header,
+            source_host,
+            timestamp,
+            hostname,
+            message.message,
+            app_name,
+            structured_data,
+        ]
+    )
+
+
+def decode_message(
+    data: bytes,
+) -> tuple[Port, tuple[str, int], SyslogMessage]:
+    """Deserialize a received message."""
+    (
+        port_number,
+        transport_protocol_value,
+        source_port,
+        facility_value,
+        severity_value,
+        source_host_length,
+        timestamp_length,
+        hostname_length,
+        text_length,
+        app_name_length,
+        structured_data_length,
+    ) = _HEADER.unpack_from(data)
+
+    offset = _HEADER.size
+
+    source_host = data[offset : offset + source_host_length].decode('ascii')
+    offset += source_host_length
+
+    timestamp_str = data[offset : offset + timestamp_length].decode('ascii')
+    offset += timestamp_length
+
+    hostname = data[offset : offset + hostname_length].decode('utf-8')
+    offset += hostname_length
+
+    text = data[offset : offset + text_length]
+    offset += text_length
+
+    port = Port(port_number, TransportProtocol(transport_protocol_value))
+    source_address = (source_host, source_port)
+    facility = Facility(facility_value)
+    severity = Severity(severity_value)
+    timestamp = datetime.fromisoformat(timestamp_str)
+
+    if app_name_length:
+        app_name = data[offset : offset + app_name_length].decode('utf-8')
+        offset += app_name_length
+
+        structured_data = data[offset : offset + structured_data_length]
+
+        message = Rfc5424Message(
+            facility=facility,
+            severity=severity,
+            timestamp=timestamp,
+            hostname=hostname,
+            message=text,
+            app_name=app_name,
+            raw_structured_data=structured_data,
+        )
+    else:
+        message = SyslogMessage(
+            facility=facility,
+            severity=severity,
+            timestamp=timestamp,
+            hostname=hostname,
+            message=text,
+        )
+
+    return port, source_address, message
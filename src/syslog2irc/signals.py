@@ -12,4 +12,7 @@ from blinker import signal
 
 
 syslog_message_received = signal('syslog-message-received')
+syslog_messages_received = signal('syslog-messages-received')
 irc_channel_joined = signal('irc-channel-joined')
+irc_channel_left = signal('irc-channel-left')
+irc_command_received = signal('irc-command-received')
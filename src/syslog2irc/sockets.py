@@ -0,0 +1,188 @@
+"""
+syslog2irc.sockets
+~~~~~~~~~~~~~~~~~~
+
+Options for receiving sockets, and datagrams dropped by the kernel
+
+Datagrams that arrive while a UDP socket's receive buffer is full are
+dropped by the kernel without the application ever seeing them. A
+larger receive buffer absorbs bursts; busy polling (Linux only) lowers
+latency at the expense of CPU time.
+
+The kernel counts the datagrams it drops per socket. On Linux, these
+counts are read from `/proc/net/udp` so that losses in the kernel can
+be told apart from messages dropped by the application itself.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import socket
+import sys
+from threading import Lock
+from typing import Iterable, Optional
+
+from .network import format_port, Port, TransportProtocol
+
+
+# not provided by the `socket` module (value from Linux' `socket.h`)
+SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL', 46)
+
+PROC_NET_UDP_PATH = Path('/proc/net/udp')
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SocketConfig:
+    """Options for the socket of a port.
+
+    The receive buffer size is in bytes, the busy poll time in
+    microseconds.
+    """
+
+    receive_buffer_size: Optional[int] = None
+    busy_poll: Optional[int] = None
+
+
+def apply_socket_config(
+    sock: socket.socket, port: Port, config: SocketConfig
+) -> None:
+    """Set the options on the socket (before it is bound).
+
+    Options that cannot be set (as far as it is not an error in the
+    configuration) are logged, but do not keep the port from being
+    opened.
+    """
+    if config.receive_buffer_size is not None:
+        sock.setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVBUF, config.receive_buffer_size
+        )
+        # Linux caps the size at `net.core.rmem_max` (and then doubles
+        # it to make room for bookkeeping).
+        size = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if size < config.receive_buffer_size:
+            logger.warning(
+                'Receive buffer of port %s is %d bytes instead of %d; the '
+                'system limit (e.g. net.core.rmem_max) might be lower.',
+                format_port(port),
+                size,
+                config.receive_buffer_size,
+            )
+
+    if config.busy_poll is not None:
+        if not sys.platform.startswith('linux'):
+            logger.warning(
+                'Busy polling is only available on Linux, not enabled for '
+                'port %s.',
+                format_port(port),
+            )
+            return None
+
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, config.busy_poll)
+        except OSError as e:
+            # Raising the time above `net.core.busy_read` requires the
+            # `CAP_NET_ADMIN` capability.
+            logger.warning(
+                'Could not enable busy polling for port %s: %s',
+                format_port(port),
+                e,
+            )
+
+
+def read_udp_drop_counts(path: Path = PROC_NET_UDP_PATH) -> Counter[int]:
+    """Return the number of datagrams dropped by the kernel per local
+    port number, summed up over all sockets bound to it.
+
+    Raise `OSError` if the file is not available.
+    """
+    counts: Counter[int] = Counter()
+
+    with path.open() as f:
+        next(f)  # Skip header.
+        for line in f:
+            fields = line.split()
+            # e.g. "0100007F:0202" (hexadecimal address and port number)
+            local_address = fields[1]
+            port_number = int(local_address.rpartition(':')[2], 16)
+            drop_count = int(fields[-1])
+            counts[port_number] += drop_count
+
+    return counts
+
+
+class KernelDropMonitor:
+    """Keep track of the datagrams the kernel has dropped on UDP ports.
+
+    Checked from the main thread, collected from the metrics server's.
+    """
+
+    def __init__(self, path: Path = PROC_NET_UDP_PATH) -> None:
+        self.path = path
+        self.available = True
+        self._lock = Lock()
+        self._previous_counts: dict[Port, int] = {}
+        self._totals: dict[Port, int] = {}
+
+    def check(self, ports: Iterable[Port]) -> dict[Port, int]:
+        """Return the number of datagrams dropped on each of the ports
+        since the last check (only for ports with drops).
+        """
+        if not self.available:
+            return {}
+
+        try:
+            counts_by_number = read_udp_drop_counts(self.path)
+        except OSError as e:
+            self.available = False
+            logger.info(
+                'Datagrams dropped by the kernel cannot be counted: %s', e
+            )
+            return {}
+
+        new_drops = {}
+        previous_counts = {}
+        for port in ports:
+            if port.transport_protocol != TransportProtocol.UDP:
+                continue
+
+            count = counts_by_number.get(port.number, 0)
+            previous_count = self._previous_counts.get(port, 0)
+            previous_counts[port] = count
+
+            # A lower count means the socket has been replaced.
+            new_drop_count = (
+                count - previous_count if count >= previous_count else count
+            )
+            if new_drop_count:
+                new_drops[port] = new_drop_count
+
+        self._previous_counts = previous_counts
+
+        with self._lock:
+            for port, new_drop_count in new_drops.items():
+                self._totals[port] = self._totals.get(port, 0) + new_drop_count
+
+        for port, new_drop_count in sorted(new_drops.items()):
+            logger.warning(
+                'The kernel has dropped %d datagram(s) on port %s since the '
+                'last check (receive buffer full).',
+                new_drop_count,
+                format_port(port),
+            )
+
+        return new_drops
+
+    def get_totals(self) -> dict[Port, int]:
+        """Return the number of dropped datagrams per port since
+        startup.
+        """
+        with self._lock:
+            return dict(self._totals)
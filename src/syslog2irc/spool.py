@@ -0,0 +1,338 @@
+"""
+syslog2irc.spool
+~~~~~~~~~~~~~~~~
+
+A spool on disk for received messages that have not been announced yet
+
+Messages are appended to segment files of a fixed size which are
+memory-mapped. Each record consists of the length of the serialized
+message (4 bytes, big-endian) followed by the message itself. A length
+of zero marks the end of the records in a segment (new segment files
+are all zeros).
+
+How far messages have been read is written to a separate file, so that
+after a restart, reading continues where it left off (messages that
+were read shortly before may be read again).
+
+If the spool would grow beyond its maximum size, its oldest segment is
+discarded, including any messages in it that have not been read yet.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass
+import logging
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Callable, Optional
+
+from syslogmp import Message as SyslogMessage
+
+from .network import Port
+from .serialization import decode_message, encode_message
+
+
+logger = logging.getLogger(__name__)
+
+
+SEGMENT_FILENAME_SUFFIX = '.segment'
+POSITION_FILENAME = 'position'
+
+_LENGTH = struct.Struct('!I')
+
+
+@dataclass(frozen=True)
+class SpoolConfig:
+    """A message spool configuration.
+
+    The replay rate limits how many spooled messages per second are
+    announced after an IRC outage.
+    """
+
+    path: Path
+    max_size: int = 256 * 1024 * 1024
+    segment_size: int = 16 * 1024 * 1024
+    replay_rate: float = 10.0
+
+
+class _Segment:
+    def __init__(self, path: Path, size: int) -> None:
+        """Open the segment file, or create it with the given size.
+
+        Existing segments keep their size (even if the configured size
+        has changed since) so that no records are cut off.
+        """
+        self.path = path
+        with path.open('a+b') as f:
+            existing_size = os.fstat(f.fileno()).st_size
+            if existing_size:
+                size = existing_size
+            else:
+                f.truncate(size)
+            self.size = size
+            self.mmap = mmap.mmap(f.fileno(), size)
+
+    def get_record_length(self, offset: int) -> int:
+        """Return the length of the record at the offset, or zero if
+        there is none (or it runs past the end of the segment).
+        """
+        if offset + _LENGTH.size > self.size:
+            return 0
+
+        (length,) = _LENGTH.unpack_from(self.mmap, offset)
+        if offset + _LENGTH.size + length > self.size:
+            return 0
+
+        return length
+
+    def close(self) -> None:
+        self.mmap.close()
+
+
+class Spool:
+    """Append messages to, and read them from, segment files in a
+    directory.
+
+    Not thread-safe; meant to be used from the main thread only.
+    """
+
+    def __init__(self, config: SpoolConfig) -> None:
+        self.path = config.path
+        self.segment_size = config.segment_size
+        self.max_segment_count = max(2, config.max_size // config.segment_size)
+        self._dropped_counts: Counter[Port] = Counter()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._segment_indexes = sorted(
+            int(path.stem)
+            for path in self.path.glob(f'*{SEGMENT_FILENAME_SUFFIX}')
+        )
+        if not self._segment_indexes:
+            self._segment_indexes = [0]
+
+        self._segments: dict[int, _Segment] = {}
+
+        self._write_index = self._segment_indexes[-1]
+        self._write_offset = self._find_end(self._write_index)
+
+        self._read_index, self._read_offset = self._load_read_position()
+        self._remove_segments_before(self._read_index)
+
+    # paths
+
+    def _get_segment_path(self, index: int) -> Path:
+        return self.path / f'{index:010d}{SEGMENT_FILENAME_SUFFIX}'
+
+    def _get_segment(self, index: int) -> _Segment:
+        segment = self._segments.get(index)
+        if segment is None:
+            segment = _Segment(self._get_segment_path(index), self.segment_size)
+            self._segments[index] = segment
+        return segment
+
+    def _close_segment(self, index: int) -> None:
+        segment = self._segments.pop(index, None)
+        if segment is not None:
+            segment.close()
+
+    # positions
+
+    def _find_end(self, index: int) -> int:
+        """Return the offset behind the last record in the segment."""
+        segment = self._get_segment(index)
+        offset = 0
+        while True:
+            length = segment.get_record_length(offset)
+            if length == 0:
+                return offset
+            offset += _LENGTH.size + length
+
+    def _load_read_position(self) -> tuple[int, int]:
+        first_index = self._segment_indexes[0]
+
+        try:
+            text = (self.path / POSITION_FILENAME).read_text()
+            index, offset = map(int, text.split())
+        except (FileNotFoundError, ValueError):
+            return first_index, 0
+
+        if index < first_index:
+            # The segment has been discarded.
+            return first_index, 0
+
+        if (index, offset) > (self._write_index, self._write_offset):
+            return self._write_index, self._write_offset
+
+        return index, offset
+
+    def save_read_position(self) -> None:
+        """Write how far messages have been read to disk."""
+        path = self.path / POSITION_FILENAME
+        temp_path = path.with_suffix('.tmp')
+        temp_path.write_text(f'{self._read_index:d} {self._read_offset:d}\n')
+        os.replace(temp_path, path)
+
+    # writing
+
+    def append(
+        self,
+        port: Port,
+        source_address: tuple[str, int],
+        message: SyslogMessage,
+    ) -> None:
+        """Append a message."""
+        record = encode_message(port, source_address, message)
+        record_size = _LENGTH.size + len(record)
+
+        if record_size + _LENGTH.size > self.segment_size:
+            logger.warning(
+                'Message of %d bytes does not fit into a spool segment.',
+                len(record),
+            )
+            self._dropped_counts[port] += 1
+            return
+
+        segment = self._get_segment(self._write_index)
+        if self._write_offset + record_size + _LENGTH.size > segment.size:
+            self._start_segment()
+            segment = self._get_segment(self._write_index)
+
+        data = segment.mmap
+        offset = self._write_offset
+        # Write the length last so that an interrupted write leaves the
+        # end marker in place.
+        data[offset + _LENGTH.size : offset + record_size] = record
+        _LENGTH.pack_into(data, offset, len(record))
+        self._write_offset += record_size
+
+    def _start_segment(self) -> None:
+        if self._write_index != self._read_index:
+            self._close_segment(self._write_index)
+
+        self._write_index += 1
+        self._write_offset = 0
+        self._segment_indexes.append(self._write_index)
+
+        while len(self._segment_indexes) > self.max_segment_count:
+            self._discard_oldest_segment()
+
+    def _discard_oldest_segment(self) -> None:
+        index = self._segment_indexes[0]
+
+        if index == self._read_index:
+            dropped_count = 0
+            for port, _, _ in self._read_records(index, self._read_offset):
+                self._dropped_counts[port] += 1
+                dropped_count += 1
+            logger.warning(
+                'Spool is full, discarded %d unread message(s).', dropped_count
+            )
+
+            self._read_index = self._segment_indexes[1]
+            self._read_offset = 0
+
+        self._remove_segments_before(index + 1)
+
+    def _remove_segments_before(self, index: int) -> None:
+        while self._segment_indexes[0] < index:
+            removed_index = self._segment_indexes.pop(0)
+            self._close_segment(removed_index)
+            self._get_segment_path(removed_index).unlink()
+
+    # reading
+
+    def _read_records(
+        self, index: int, offset: int
+    ) -> list[tuple[Port, tuple[str, int], SyslogMessage]]:
+        segment = self._get_segment(index)
+        records = []
+        while True:
+            length = segment.get_record_length(offset)
+            if length == 0:
+                return records
+            offset += _LENGTH.size
+            records.append(
+                decode_message(segment.mmap[offset : offset + length])
+            )
+            offset += length
+
+    def read(
+        self,
+        max_count: Optional[int] = None,
+        *,
+        is_ready: Optional[Callable[[Port, SyslogMessage], bool]] = None,
+    ) -> list[tuple[Port, tuple[str, int], SyslogMessage]]:
+        """Remove and return up to `max_count` messages (or all), oldest
+        first.
+
+        Stop at the first message for which `is_ready` returns `False`;
+        it stays in the spool, to be read by a later call.
+        """
+        items = []
+
+        while max_count is None or len(items) < max_count:
+            segment = self._get_segment(self._read_index)
+            offset = self._read_offset
+            length = segment.get_record_length(offset)
+
+            if length == 0:
+                if self._read_index == self._write_index:
+                    # All messages have been read.
+                    break
+
+                # Continue with the next segment.
+                self._remove_segments_before(self._read_index + 1)
+                self._read_index = self._segment_indexes[0]
+                self._read_offset = 0
+                continue
+
+            offset += _LENGTH.size
+            item = decode_message(segment.mmap[offset : offset + length])
+            if is_ready is not None and not is_ready(item[0], item[2]):
+                break
+
+            items.append(item)
+            self._read_offset = offset + length
+
+        return items
+
+    def is_empty(self) -> bool:
+        """Return `True` if all messages have been read."""
+        return (self._read_index, self._read_offset) == (
+            self._write_index,
+            self._write_offset,
+        )
+
+    def get_backlog_size(self) -> int:
+        """Return the approximate number of bytes of unread messages."""
+        segment_count = self._write_index - self._read_index
+        return (
+            segment_count * self.segment_size
+            + self._write_offset
+            - self._read_offset
+        )
+
+    def take_dropped_counts(self) -> Counter[Port]:
+        """Return the number of messages discarded per port since the last
+        call, and reset the counts.
+        """
+        dropped_counts = self._dropped_counts
+        self._dropped_counts = Counter()
+        return dropped_counts
+
+    def flush(self) -> None:
+        """Write appended messages and the read position to disk."""
+        for segment in self._segments.values():
+            segment.mmap.flush()
+        self.save_read_position()
+
+    def close(self) -> None:
+        self.flush()
+        for index in list(self._segments):
+            self._close_segment(index)
@@ -0,0 +1,197 @@
+"""
+syslog2irc.storms
+~~~~~~~~~~~~~~~~~
+
+Summaries instead of individual messages during message storms
+
+If more messages per second arrive for a route than its storm threshold,
+they are no longer forwarded one by one. Instead, a summary (counts by
+host and severity, and the most frequent texts) is posted periodically
+until the rate has dropped to half the threshold again.
+
+All counting is done incrementally, at constant cost per message.
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from syslogmp import Message as SyslogMessage, Severity
+
+
+TEXT_ENCODING = 'utf-8'
+
+# number of buckets the sliding window is divided into
+BUCKET_COUNT = 10
+
+# maximum number of distinct texts to count during a storm (further ones
+# are only included in the total)
+MAX_DISTINCT_TEXTS = 1000
+
+# maximum length of a text quoted in a summary
+MAX_QUOTED_TEXT_LENGTH = 100
+
+
+@dataclass(frozen=True)
+class StormConfig:
+    """A storm detection configuration (for all routes with a storm
+    threshold).
+    """
+
+    window: float = 10.0
+    summary_interval: float = 60.0
+    top_count: int = 5
+
+
+class SlidingWindowCounter:
+    """Count events over the last `window` seconds.
+
+    The window is divided into buckets, so it slides in steps of a
+    bucket's duration.
+    """
+
+    def __init__(self, window: float, bucket_count: int = BUCKET_COUNT) -> None:
+        self.window = window
+        self.bucket_duration = window / bucket_count
+        self._buckets = [0] * bucket_count
+        self._current_bucket_number = 0
+        self.total = 0
+
+    def _advance(self, now: float) -> None:
+        bucket_number = int(now / self.bucket_duration)
+        steps = bucket_number - self._current_bucket_number
+        if steps <= 0:
+            return
+
+        bucket_count = len(self._buckets)
+        if steps >= bucket_count:
+            self._buckets = [0] * bucket_count
+            self.total = 0
+        else:
+            for number in range(
+                self._current_bucket_number + 1, bucket_number + 1
+            ):
+                index = number % bucket_count
+                self.total -= self._buckets[index]
+                self._buckets[index] = 0
+
+        self._current_bucket_number = bucket_number
+
+    def add(self, now: float) -> None:
+        self._advance(now)
+        self._buckets[self._current_bucket_number % len(self._buckets)] += 1
+        self.total += 1
+
+    def get_rate(self, now: float) -> float:
+        """Return the number of events per second."""
+        self._advance(now)
+        return self.total / self.window
+
+
+class StormGuard:
+    """Detect storms of messages on a route, and summarize them."""
+
+    def __init__(self, threshold: float, config: StormConfig) -> None:
+        self.threshold = threshold
+        self.summary_interval = config.summary_interval
+        self.top_count = config.top_count
+        self._max_count = threshold * config.window
+        self._counter = SlidingWindowCounter(config.window)
+
+        self.summarizing = False
+        self._summary_started_at = 0.0
+        self._next_summary_at = 0.0
+        self._reset_counts()
+
+    def _reset_counts(self) -> None:
+        self._count = 0
+        self._counts_by_source: Counter[tuple[str, Severity]] = Counter()
+        self._counts_by_text: Counter[bytes] = Counter()
+
+    def add(self, message: SyslogMessage, now: float) -> bool:
+        """Count the message.
+
+        Return `True` if it is to be summarized instead of forwarded.
+        """
+        counter = self._counter
+        counter.add(now)
+
+        if not self.summarizing:
+            if counter.total <= self._max_count:
+                return False
+
+            self.summarizing = True
+            self._summary_started_at = now
+            self._next_summary_at = now + self.summary_interval
+
+        self._count += 1
+        self._counts_by_source[(message.hostname, message.severity)] += 1
+
+        text = message.message
+        counts_by_text = self._counts_by_text
+        if text in counts_by_text or len(counts_by_text) < MAX_DISTINCT_TEXTS:
+            counts_by_text[text] += 1
+
+        return True
+
+    def collect_summary(self, now: float) -> Optional[list[str]]:
+        """Return the lines of a summary, if one is due.
+
+        If the storm is over, the summary is the last one, and messages
+        are forwarded individually again.
+        """
+        if not self.summarizing:
+            return None
+
+        rate = self._counter.get_rate(now)
+        is_over = rate <= self.threshold / 2
+        if not is_over and now < self._next_summary_at:
+            return None
+
+        lines = self._format_summary(now, rate, is_over)
+
+        self._reset_counts()
+        if is_over:
+            self.summarizing = False
+        else:
+            self._summary_started_at = now
+            self._next_summary_at = now + self.summary_interval
+
+        return lines
+
+    def _format_summary(
+        self, now: float, rate: float, is_over: bool
+    ) -> list[str]:
+        duration = now - self._summary_started_at
+        if is_over:
+            status = 'storm is over, forwarding messages again'
+        else:
+            status = f'currently {rate:.1f} per second'
+        lines = [
+            f'Summarized {self._count:d} message(s) of the last '
+            f'{duration:.0f} seconds ({status}).'
+        ]
+
+        if self._counts_by_source:
+            top_sources = self._counts_by_source.most_common(self.top_count)
+            sources = ', '.join(
+                f'{hostname}/{severity.name}: {count:d}'
+                for (hostname, severity), count in top_sources
+            )
+            lines.append(f'By host and severity: {sources}')
+
+        for text, count in self._counts_by_text.most_common(self.top_count):
+            lines.append(f'({count:d}x) {_quote(text)}')
+
+        return lines
+
+
+def _quote(text: bytes) -> str:
+    quoted = text.decode(TEXT_ENCODING, 'replace').strip('\n')
+    if len(quoted) > MAX_QUOTED_TEXT_LENGTH:
+        quoted = quoted[: MAX_QUOTED_TEXT_LENGTH - 3] + '...'
+    return quoted
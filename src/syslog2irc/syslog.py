@@ -2,77 +2,247 @@
 syslog2irc.syslog
 ~~~~~~~~~~~~~~~~~
 
-BSD syslog message reception and handling
+Syslog message reception and handling
 
 :Copyright: 2007-2021 Jochen Kupperschmidt
 :License: MIT, see LICENSE for details.
 """
 
 from __future__ import annotations
+from dataclasses import dataclass, field
+from enum import Enum
 from functools import partial
 import logging
 from socketserver import (
     BaseRequestHandler,
-    StreamRequestHandler,
     ThreadingTCPServer,
     ThreadingUDPServer,
 )
+import socket
 import sys
-from typing import Iterable, Union
+from typing import Callable, Iterable, List, Optional, Tuple, Union
 
-import syslogmp
 from syslogmp import Message as SyslogMessage
 
+from . import metrics
+from .connections import Connection, ConnectionTracker, TcpConfig
+from .framing import FrameSplitter, FramingError, READ_SIZE
 from .network import format_port, Port, TransportProtocol
-from .signals import syslog_message_received
+from .parsing import parse_message
+from .signals import syslog_message_received, syslog_messages_received
+from .sockets import apply_socket_config, SocketConfig
 from .util import start_thread
 
 
 logger = logging.getLogger(__name__)
 
 
-class TCPHandler(StreamRequestHandler):
+ReceiverEngine = Enum(
+    'ReceiverEngine', ['THREADING', 'ASYNCIO', 'MULTIPROCESS']
+)
+
+
+@dataclass(frozen=True)
+class SyslogConfig:
+    """A syslog message reception configuration."""
+
+    engine: ReceiverEngine = ReceiverEngine.THREADING
+    udp_batch_size: Optional[int] = None
+    workers: int = 1
+    ring_buffer_size: int = 8 * 1024 * 1024
+    tcp: TcpConfig = TcpConfig()
+    sockets: dict[Port, SocketConfig] = field(default_factory=dict)
+
+
+# Tells whether messages received on the port would be forwarded at all.
+# Receivers use it to avoid parsing messages that would be discarded.
+IsPortActiveCallable = Callable[[Port], bool]
+
+
+def is_port_always_active(port: Port) -> bool:
+    return True
+
+
+HandleMessageCallable = Callable[[Tuple[str, int], Port, SyslogMessage], None]
+HandleMessagesCallable = Callable[
+    [Port, List[Tuple[Tuple[str, int], SyslogMessage]]], None
+]
+
+
+class TCPHandler(BaseRequestHandler):
     """Handler for syslog messages arriving via TCP."""
 
-    def __init__(self, port: Port, *args, **kwargs) -> None:
+    def __init__(
+        self,
+        port: Port,
+        *args,
+        is_port_active: IsPortActiveCallable = is_port_always_active,
+        handle_message: Optional[HandleMessageCallable] = None,
+        connection_tracker: Optional[ConnectionTracker] = None,
+        **kwargs,
+    ) -> None:
         self.port = port
+        self.is_port_active = is_port_active
+        self.handle_message = (
+            handle_message
+            if handle_message is not None
+            else _handle_received_message
+        )
+        self.connection_tracker = connection_tracker
         super().__init__(*args, **kwargs)
 
     def handle(self) -> None:
-        for line in self.rfile:
+        if self.connection_tracker is None:
+            self._receive(None)
+            return None
+
+        # The connection has been registered by the server.
+        connection = self.connection_tracker.get_connection(
+            self.port, self.client_address
+        )
+        self.request.settimeout(self.connection_tracker.idle_timeout)
+        try:
+            self._receive(connection)
+        except socket.timeout:
+            metrics.tcp_connections_timed_out.increment(self.port)
+            logger.info(
+                'Closing idle connection from %s:%d.', *self.client_address
+            )
+        finally:
+            self.connection_tracker.close(connection)
+
+    def _receive(self, connection: Optional[Connection]) -> None:
+        frame_splitter = FrameSplitter()
+
+        while True:
+            data = self.request.recv(READ_SIZE)
+
             try:
-                message = syslogmp.parse(line)
-            except ValueError:
+                if data:
+                    frames = frame_splitter.feed(data)
+                else:
+                    # The connection has been closed.
+                    frames = frame_splitter.finish()
+            except FramingError:
+                metrics.parse_errors.increment(self.port)
                 logger.info(
-                    'Invalid message received from %s:%d.', *self.client_address
+                    'Invalid framing of messages received from %s:%d.',
+                    *self.client_address,
                 )
                 return None
 
-            _handle_received_message(self.client_address, self.port, message)
+            if connection is not None:
+                connection.count_received(len(frames), len(data))
+
+            if frames and self.is_port_active(self.port):
+                self._handle_frames(frames)
+
+            if not data:
+                return None
+
+    def _handle_frames(self, frames: list[bytes]) -> None:
+        for frame in frames:
+            try:
+                message = parse_message(frame)
+            except ValueError:
+                metrics.parse_errors.increment(self.port)
+                logger.info(
+                    'Invalid message received from %s:%d.',
+                    *self.client_address,
+                )
+                continue
+
+            self.handle_message(self.client_address, self.port, message)
+
+
+class LimitedThreadingTCPServer(ThreadingTCPServer):
+    """A threading TCP server that refuses connections beyond the
+    tracker's limits before starting a thread for them.
+    """
+
+    # Do not keep track of (and wait for) connection threads.
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: Port,
+        connection_tracker: ConnectionTracker,
+        *args,
+        **kwargs,
+    ) -> None:
+        self.port = port
+        self.connection_tracker = connection_tracker
+        super().__init__(*args, **kwargs)
+
+    def verify_request(self, request, client_address) -> bool:
+        connection = self.connection_tracker.open(self.port, client_address)
+        return connection is not None
 
 
 class UDPHandler(BaseRequestHandler):
     """Handler for syslog messages arriving via UDP."""
 
-    def __init__(self, port: Port, *args, **kwargs) -> None:
+    def __init__(
+        self,
+        port: Port,
+        *args,
+        is_port_active: IsPortActiveCallable = is_port_always_active,
+        handle_message: Optional[HandleMessageCallable] = None,
+        **kwargs,
+    ) -> None:
         self.port = port
+        self.is_port_active = is_port_active
+        self.handle_message = (
+            handle_message
+            if handle_message is not None
+            else _handle_received_message
+        )
         super().__init__(*args, **kwargs)
 
     def handle(self) -> None:
+        if not self.is_port_active(self.port):
+            return None
+
         try:
             data = self.request[0]
-            message = syslogmp.parse(data)
+            message = parse_message(data)
         except ValueError:
+            metrics.parse_errors.increment(self.port)
             logger.info(
                 'Invalid message received from %s:%d.', *self.client_address
             )
             return None
 
-        _handle_received_message(self.client_address, self.port, message)
+        self.handle_message(self.client_address, self.port, message)
 
 
 def _handle_received_message(
     client_address: tuple[str, int], port: Port, message: SyslogMessage
+) -> None:
+    metrics.messages_received.increment(port)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        _log_received_message(client_address, port, message)
+
+    syslog_message_received.send(
+        port, source_address=client_address, message=message
+    )
+
+
+def _handle_received_messages(
+    port: Port, messages: list[tuple[tuple[str, int], SyslogMessage]]
+) -> None:
+    metrics.messages_received.increment(port, len(messages))
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for client_address, message in messages:
+            _log_received_message(client_address, port, message)
+
+    syslog_messages_received.send(port, messages=messages)
+
+
+def _log_received_message(
+    client_address: tuple[str, int], port: Port, message: SyslogMessage
 ) -> None:
     logger.debug(
         'Received message from %s:%d on port %s -> %s',
@@ -82,51 +252,200 @@ def _handle_received_message(
         format_message_for_log(message),
     )
 
-    syslog_message_received.send(
-        port, source_address=client_address, message=message
-    )
 
+@dataclass(frozen=True)
+class MessageSink:
+    """Where receivers pass received messages on to."""
+
+    handle_message: HandleMessageCallable
+    handle_messages: HandleMessagesCallable
+
+
+# Announces received messages via signals. Suitable for any number of
+# (also unknown) receivers, but comparatively slow.
+SIGNAL_SINK = MessageSink(_handle_received_message, _handle_received_messages)
+
+
+def create_direct_sink(
+    put: Callable[[Port, Tuple[str, int], SyslogMessage], None]
+) -> MessageSink:
+    """Return a sink that passes received messages straight on to the
+    callable, without looking up signal receivers or building keyword
+    arguments per message.
+    """
+    increment_received = metrics.messages_received.increment
+    is_debug_enabled = partial(logger.isEnabledFor, logging.DEBUG)
 
-def create_server(port: Port) -> Union[ThreadingTCPServer, ThreadingUDPServer]:
+    def handle_message(
+        client_address: tuple[str, int], port: Port, message: SyslogMessage
+    ) -> None:
+        increment_received(port)
+        if is_debug_enabled():
+            _log_received_message(client_address, port, message)
+        put(port, client_address, message)
+
+    def handle_messages(
+        port: Port, messages: list[tuple[tuple[str, int], SyslogMessage]]
+    ) -> None:
+        increment_received(port, len(messages))
+        debug = is_debug_enabled()
+        for client_address, message in messages:
+            if debug:
+                _log_received_message(client_address, port, message)
+            put(port, client_address, message)
+
+    return MessageSink(handle_message, handle_messages)
+
+
+def create_server(
+    port: Port,
+    *,
+    is_port_active: IsPortActiveCallable = is_port_always_active,
+    sink: MessageSink = SIGNAL_SINK,
+    connection_tracker: Optional[ConnectionTracker] = None,
+    socket_config: Optional[SocketConfig] = None,
+) -> Union[ThreadingTCPServer, ThreadingUDPServer]:
     """Create a threading server to receive syslog messages."""
     address = ('', port.number)
 
+    server: Union[ThreadingTCPServer, ThreadingUDPServer]
     if port.transport_protocol == TransportProtocol.TCP:
-        tcp_handler_class = partial(TCPHandler, port)
-        return ThreadingTCPServer(address, tcp_handler_class)
+        tcp_handler_class = partial(
+            TCPHandler,
+            port,
+            is_port_active=is_port_active,
+            handle_message=sink.handle_message,
+            connection_tracker=connection_tracker,
+        )
+        if connection_tracker is None:
+            server = ThreadingTCPServer(
+                address, tcp_handler_class, bind_and_activate=False
+            )
+        else:
+            server = LimitedThreadingTCPServer(
+                port,
+                connection_tracker,
+                address,
+                tcp_handler_class,
+                bind_and_activate=False,
+            )
     elif port.transport_protocol == TransportProtocol.UDP:
-        udp_handler_class = partial(UDPHandler, port)
-        return ThreadingUDPServer(address, udp_handler_class)
+        udp_handler_class = partial(
+            UDPHandler,
+            port,
+            is_port_active=is_port_active,
+            handle_message=sink.handle_message,
+        )
+        server = ThreadingUDPServer(
+            address, udp_handler_class, bind_and_activate=False
+        )
     else:
         raise ValueError(f'Unsupported transport protocol')
 
-
-def start_server(port: Port) -> None:
-    """Start a server, in a separate thread."""
+    # Options have to be set before the socket is bound.
     try:
-        server = create_server(port)
-    except OSError as e:
-        sys.stderr.write(f'Error {e.errno:d}: {e.strerror}\n')
-        sys.stderr.write(
-            f'Cannot open port {format_port(port)}. Could be already in use. '
-            f'Or permission is lacking; try a port number above 1,024 (or '
-            'even 4,096) and up to 65,535.\n'
+        if socket_config is not None:
+            apply_socket_config(server.socket, port, socket_config)
+        server.server_bind()
+        server.server_activate()
+    except OSError:
+        server.server_close()
+        raise
+
+    return server
+
+
+class ServerReceivers:
+    """Threading servers, one per port, that can be started and stopped
+    while running.
+    """
+
+    def __init__(
+        self,
+        *,
+        is_port_active: IsPortActiveCallable = is_port_always_active,
+        sink: MessageSink = SIGNAL_SINK,
+        connection_tracker: Optional[ConnectionTracker] = None,
+        socket_configs: Optional[dict[Port, SocketConfig]] = None,
+    ) -> None:
+        self.is_port_active = is_port_active
+        self.sink = sink
+        self.connection_tracker = connection_tracker
+        self.socket_configs = socket_configs or {}
+        self._servers: dict[
+            Port, Union[ThreadingTCPServer, ThreadingUDPServer]
+        ] = {}
+
+    def open_port(self, port: Port) -> None:
+        """Start a server, in a separate thread.
+
+        Raise `OSError` if the port cannot be opened.
+        """
+        server = create_server(
+            port,
+            is_port_active=self.is_port_active,
+            sink=self.sink,
+            connection_tracker=self.connection_tracker,
+            socket_config=self.socket_configs.get(port),
         )
-        sys.exit(1)
 
-    thread_name = f'{server.__class__.__name__}-port{port}'
-    start_thread(server.serve_forever, thread_name)
-    logger.info(
-        'Listening for syslog messages on %s:%s.',
-        server.server_address[0],
-        format_port(port),
+        thread_name = f'{server.__class__.__name__}-port{port}'
+        start_thread(server.serve_forever, thread_name)
+        self._servers[port] = server
+        logger.info(
+            'Listening for syslog messages on %s:%s.',
+            server.server_address[0],
+            format_port(port),
+        )
+
+    def close_port(self, port: Port) -> None:
+        """Stop the port's server.
+
+        Connections that have already been accepted are served until
+        the client closes them.
+        """
+        server = self._servers.pop(port)
+        server.shutdown()
+        server.server_close()
+        logger.info(
+            'Stopped listening for syslog messages on %s.', format_port(port)
+        )
+
+
+def exit_on_port_error(port: Port, e: OSError) -> None:
+    """Report that a port could not be opened, then exit."""
+    sys.stderr.write(f'Error {e.errno:d}: {e.strerror}\n')
+    sys.stderr.write(
+        f'Cannot open port {format_port(port)}. Could be already in use. '
+        f'Or permission is lacking; try a port number above 1,024 (or '
+        'even 4,096) and up to 65,535.\n'
     )
+    sys.exit(1)
 
 
-def start_syslog_message_receivers(ports: Iterable[Port]) -> None:
+def start_syslog_message_receivers(
+    ports: Iterable[Port],
+    *,
+    is_port_active: IsPortActiveCallable = is_port_always_active,
+    sink: MessageSink = SIGNAL_SINK,
+    connection_tracker: Optional[ConnectionTracker] = None,
+    socket_configs: Optional[dict[Port, SocketConfig]] = None,
+) -> ServerReceivers:
     """Start one syslog message receiving server for each port."""
+    receivers = ServerReceivers(
+        is_port_active=is_port_active,
+        sink=sink,
+        connection_tracker=connection_tracker,
+        socket_configs=socket_configs,
+    )
+
     for port in ports:
-        start_server(port)
+        try:
+            receivers.open_port(port)
+        except OSError as e:
+            exit_on_port_error(port, e)
+
+    return receivers
 
 
 def format_message_for_log(message: SyslogMessage) -> str:
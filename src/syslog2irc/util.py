@@ -11,9 +11,13 @@ Various utilities
 import logging
 from logging import Formatter, StreamHandler
 from threading import Thread
+from time import monotonic
 from typing import Callable
 
 
+logger = logging.getLogger(__name__)
+
+
 def configure_logging(level: str) -> None:
     """Configure application-specific loggers.
 
@@ -35,3 +39,14 @@ def start_thread(target: Callable, name: str) -> None:
     """Create, configure, and start a new thread."""
     t = Thread(target=target, name=name, daemon=True)
     t.start()
+
+
+def log_elapsed_time(description: str, started_at: float) -> float:
+    """Log how long something took since it started.
+
+    Return the current (monotonic) time, from which the next step can
+    be measured.
+    """
+    now = monotonic()
+    logger.info('%s in %.3f seconds.', description, now - started_at)
+    return now
@@ -0,0 +1,354 @@
+"""
+syslog2irc.workers
+~~~~~~~~~~~~~~~~~~
+
+Syslog message reception in multiple worker processes
+
+Each worker process has its own sockets bound to the same ports (via
+`SO_REUSEPORT`) so that the kernel distributes incoming messages among
+the workers. Workers receive and parse messages on an event loop, then
+push them into a ring buffer in shared memory.
+
+The main process drains the ring buffer and passes the messages on.
+That way, parsing scales across CPU cores while a single process keeps
+the IRC connection.
+
+Whether a port is active (see `syslog.IsPortActiveCallable`) can only
+be determined in the main process. It is mirrored into a shared array
+of flags that the workers check before parsing. In the other direction,
+workers publish their counts of parse errors and of messages dropped
+because the ring buffer was full in shared arrays, from which the main
+process updates its metrics (and its notices about dropped messages).
+
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from __future__ import annotations
+from collections import Counter
+import ctypes
+from functools import partial
+from itertools import groupby
+import logging
+import multiprocessing
+from multiprocessing.process import BaseProcess
+from operator import itemgetter
+import signal
+import socket
+from threading import Lock
+from time import monotonic
+from typing import Iterable, Optional
+
+from syslogmp import Message as SyslogMessage
+
+from . import metrics
+from .connections import ConnectionTracker, TcpConfig
+from .eventloop import create_event_loop, create_socket, LISTEN_HOST
+from .network import format_port, Port
+from .ringbuffer import RingBuffer
+from .serialization import decode_message, encode_message
+from .sockets import SocketConfig
+from .syslog import (
+    exit_on_port_error,
+    HandleMessagesCallable,
+    is_port_always_active,
+    IsPortActiveCallable,
+    MessageSink,
+    SIGNAL_SINK,
+)
+from .util import start_thread
+
+
+logger = logging.getLogger(__name__)
+
+
+# maximum number of records to take from the ring buffer at once
+CONSUMER_BATCH_SIZE = 256
+
+# seconds between checks for dropped messages and dead workers
+HEALTH_CHECK_INTERVAL = 10.0
+
+# maximum number of seconds before the workers learn about a port that
+# has become active or inactive (and before the main process learns
+# about parse errors in the workers)
+ACTIVE_PORTS_SYNC_INTERVAL = 1.0
+
+
+class DroppedMessageCounter:
+    """Count messages dropped because the ring buffer was full, per
+    port.
+
+    Added to by the consumer thread, taken by the main thread.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._dropped_counts: Counter[Port] = Counter()
+
+    def add(self, port: Port, count: int) -> None:
+        with self._lock:
+            self._dropped_counts[port] += count
+
+    def take_dropped_counts(self) -> Counter[Port]:
+        """Return the number of messages dropped per port since the last
+        call, and reset the counts.
+        """
+        with self._lock:
+            dropped_counts = self._dropped_counts
+            self._dropped_counts = Counter()
+        return dropped_counts
+
+
+def start_syslog_message_receivers(
+    ports: Iterable[Port],
+    *,
+    worker_count: int,
+    ring_buffer_size: int,
+    udp_batch_size: Optional[int] = None,
+    is_port_active: IsPortActiveCallable = is_port_always_active,
+    sink: MessageSink = SIGNAL_SINK,
+    tcp_config: Optional[TcpConfig] = None,
+    socket_configs: Optional[dict[Port, SocketConfig]] = None,
+) -> DroppedMessageCounter:
+    """Fork worker processes to receive syslog messages, and drain what
+    they receive in a separate thread.
+
+    All sockets are bound before this function returns so that errors
+    are reported right away.
+
+    Return the counter of messages dropped because the ring buffer was
+    full.
+    """
+    ports = sorted(ports)
+    if socket_configs is None:
+        socket_configs = {}
+    ring_buffer = RingBuffer(ring_buffer_size)
+
+    context = multiprocessing.get_context('fork')
+    active_port_flags = context.RawArray('b', len(ports))
+    _sync_active_port_flags(ports, active_port_flags, is_port_active)
+
+    # one slot per worker and port
+    parse_error_counts = context.RawArray('Q', worker_count * len(ports))
+    dropped_counts = context.RawArray('Q', worker_count * len(ports))
+    dropped_message_counter = DroppedMessageCounter()
+
+    sockets_per_worker = []
+    for _ in range(worker_count):
+        ports_and_sockets = []
+        for port in ports:
+            try:
+                sock = create_socket(
+                    port,
+                    reuse_port=True,
+                    socket_config=socket_configs.get(port),
+                )
+            except OSError as e:
+                exit_on_port_error(port, e)
+
+            ports_and_sockets.append((port, sock))
+
+        sockets_per_worker.append(ports_and_sockets)
+
+    processes = []
+    for index in range(worker_count):
+        process = context.Process(
+            target=_run_worker,
+            args=(
+                index,
+                sockets_per_worker,
+                ring_buffer,
+                udp_batch_size,
+                active_port_flags,
+                parse_error_counts,
+                dropped_counts,
+                tcp_config,
+            ),
+            name=f'SyslogReceiverWorker-{index:d}',
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+
+    # The sockets are owned by the worker processes from here on.
+    for ports_and_sockets in sockets_per_worker:
+        for _, sock in ports_and_sockets:
+            sock.close()
+
+    for port in ports:
+        logger.info(
+            'Listening for syslog messages on %s:%s (%d worker processes).',
+            LISTEN_HOST,
+            format_port(port),
+            worker_count,
+        )
+
+    start_thread(
+        partial(
+            _consume,
+            ring_buffer,
+            processes,
+            ports,
+            active_port_flags,
+            is_port_active,
+            parse_error_counts,
+            dropped_counts,
+            dropped_message_counter,
+            sink.handle_messages,
+        ),
+        'RingBufferConsumer',
+    )
+
+    return dropped_message_counter
+
+
+def _sync_active_port_flags(
+    ports: list[Port],
+    active_port_flags: ctypes.Array,
+    is_port_active: IsPortActiveCallable,
+) -> None:
+    for index, port in enumerate(ports):
+        active_port_flags[index] = is_port_active(port)
+
+
+def _run_worker(
+    index: int,
+    sockets_per_worker: list[list[tuple[Port, socket.socket]]],
+    ring_buffer: RingBuffer,
+    udp_batch_size: Optional[int],
+    active_port_flags: ctypes.Array,
+    parse_error_counts: ctypes.Array,
+    dropped_counts: ctypes.Array,
+    tcp_config: Optional[TcpConfig],
+) -> None:
+    """Receive messages and push them into the ring buffer.
+
+    This runs in a worker process. TCP connection limits apply to each
+    worker on its own.
+    """
+    # Leave handling of keyboard interrupts to the main process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Close the sockets inherited for other workers.
+    for other_index, ports_and_sockets in enumerate(sockets_per_worker):
+        if other_index != index:
+            for _, sock in ports_and_sockets:
+                sock.close()
+
+    ports_and_sockets = sockets_per_worker[index]
+    port_indexes = {port: i for i, (port, _) in enumerate(ports_and_sockets)}
+    first_slot = index * len(ports_and_sockets)
+
+    def is_port_active(port: Port) -> bool:
+        return bool(active_port_flags[port_indexes[port]])
+
+    def handle_message(
+        client_address: tuple[str, int], port: Port, message: SyslogMessage
+    ) -> None:
+        if not ring_buffer.put(encode_message(port, client_address, message)):
+            dropped_counts[first_slot + port_indexes[port]] += 1
+
+    def handle_messages(
+        port: Port, messages: list[tuple[tuple[str, int], SyslogMessage]]
+    ) -> None:
+        slot = first_slot + port_indexes[port]
+        for client_address, message in messages:
+            record = encode_message(port, client_address, message)
+            if not ring_buffer.put(record):
+                dropped_counts[slot] += 1
+
+    connection_tracker = (
+        ConnectionTracker(tcp_config) if tcp_config is not None else None
+    )
+
+    loop = create_event_loop(
+        ports_and_sockets,
+        udp_batch_size=udp_batch_size,
+        handle_message=handle_message,
+        handle_messages=handle_messages,
+        is_port_active=is_port_active,
+        connection_tracker=connection_tracker,
+    )
+
+    # Counts might have been inherited from the main process.
+    initial_parse_errors = metrics.parse_errors.collect()
+
+    def publish_parse_errors() -> None:
+        parse_errors = metrics.parse_errors.collect()
+        for port, i in port_indexes.items():
+            parse_error_counts[first_slot + i] = int(
+                parse_errors.get(port, 0) - initial_parse_errors.get(port, 0)
+            )
+        loop.call_later(ACTIVE_PORTS_SYNC_INTERVAL, publish_parse_errors)
+
+    loop.call_soon(publish_parse_errors)
+    loop.run_forever()
+
+
+def _consume(
+    ring_buffer: RingBuffer,
+    processes: list[BaseProcess],
+    ports: list[Port],
+    active_port_flags: ctypes.Array,
+    is_port_active: IsPortActiveCallable,
+    parse_error_counts: ctypes.Array,
+    dropped_counts: ctypes.Array,
+    dropped_message_counter: DroppedMessageCounter,
+    handle_messages: HandleMessagesCallable,
+) -> None:
+    """Take messages from the ring buffer and pass them on.
+
+    Consecutive messages received on the same port are passed on as a
+    batch.
+    """
+    reported_dropped = 0
+    reported_parse_error_counts = [0] * len(parse_error_counts)
+    reported_dropped_counts = [0] * len(dropped_counts)
+    next_health_check = monotonic() + HEALTH_CHECK_INTERVAL
+
+    while True:
+        records = ring_buffer.get_many(
+            CONSUMER_BATCH_SIZE, timeout=ACTIVE_PORTS_SYNC_INTERVAL
+        )
+
+        _sync_active_port_flags(ports, active_port_flags, is_port_active)
+
+        for slot, count in enumerate(parse_error_counts):
+            if count > reported_parse_error_counts[slot]:
+                port = ports[slot % len(ports)]
+                delta = count - reported_parse_error_counts[slot]
+                metrics.parse_errors.increment(port, delta)
+                reported_parse_error_counts[slot] = count
+
+        for slot, count in enumerate(dropped_counts):
+            if count > reported_dropped_counts[slot]:
+                port = ports[slot % len(ports)]
+                delta = count - reported_dropped_counts[slot]
+                metrics.ring_buffer_messages_dropped.increment(port, delta)
+                dropped_message_counter.add(port, delta)
+                reported_dropped_counts[slot] = count
+
+        decoded_records = map(decode_message, records)
+        for port, group in groupby(decoded_records, key=itemgetter(0)):
+            messages = [(address, message) for _, address, message in group]
+            handle_messages(port, messages)
+
+        if monotonic() >= next_health_check:
+            next_health_check = monotonic() + HEALTH_CHECK_INTERVAL
+
+            dropped = ring_buffer.dropped
+            if dropped > reported_dropped:
+                logger.warning(
+                    'Dropped %d messages because the ring buffer was full.',
+                    dropped - reported_dropped,
+                )
+                reported_dropped = dropped
+
+            for process in processes:
+                if not process.is_alive():
+                    logger.error(
+                        'Receiver worker process %s has exited with code %s.',
+                        process.name,
+                        process.exitcode,
+                    )
+            processes = [p for p in processes if p.is_alive()]
@@ -0,0 +1,60 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from argparse import ArgumentTypeError
+
+import pytest
+import syslogmp
+
+from syslog2irc.bench import (
+    build_message,
+    get_percentile,
+    parse_size_mix,
+    SizeMixEntry,
+)
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        ('128',           [SizeMixEntry(128, 1.0)]),
+        ('100:70,400:20', [SizeMixEntry(100, 70.0), SizeMixEntry(400, 20.0)]),
+        ('1024:0.5',      [SizeMixEntry(1024, 0.5)]),
+    ],
+)
+def test_parse_size_mix(value, expected):
+    assert parse_size_mix(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', 'big', '0', '1025', '100:0', '100:x'])
+def test_parse_invalid_size_mix(value):
+    with pytest.raises(ArgumentTypeError):
+        parse_size_mix(value)
+
+
+@pytest.mark.parametrize('size', [64, 500, 1024])
+def test_build_message(size):
+    data = build_message(12345, size)
+
+    assert len(data) == size
+
+    message = syslogmp.parse(data)
+    assert message.hostname == 'benchhost'
+    assert message.message.startswith(b'seq=12345 ')
+
+
+@pytest.mark.parametrize(
+    'percentile, expected',
+    [
+        ( 50,  5),
+        ( 90,  9),
+        ( 99, 10),
+        (100, 10),
+    ],
+)
+def test_get_percentile(percentile, expected):
+    values = list(range(1, 11))
+
+    assert get_percentile(values, percentile) == expected
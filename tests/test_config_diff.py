@@ -0,0 +1,80 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from dataclasses import replace
+
+from syslog2irc.config import Config, ConfigDiff, diff_configs
+from syslog2irc.irc import IrcChannel, IrcConfig
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.queueing import QueueConfig
+from syslog2irc.routing import Route
+
+
+PORT1 = Port(514, TransportProtocol.UDP)
+PORT2 = Port(10514, TransportProtocol.TCP)
+PORT3 = Port(11514, TransportProtocol.UDP)
+
+
+def create_config(channels, routes, **kwargs):
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=channels,
+    )
+
+    return Config(log_level=None, irc=irc_config, routes=routes, **kwargs)
+
+
+def test_diff_configs():
+    old = create_config(
+        {IrcChannel('#one'), IrcChannel('#two'), IrcChannel('#three')},
+        {Route(PORT1, '#one'), Route(PORT2, '#two'), Route(PORT2, '#three')},
+    )
+    new = create_config(
+        {IrcChannel('#one'), IrcChannel('#two', weight=2), IrcChannel('#four')},
+        {Route(PORT1, '#one'), Route(PORT3, '#two'), Route(PORT3, '#four')},
+    )
+
+    assert diff_configs(old, new) == ConfigDiff(
+        opened_ports=frozenset([PORT3]),
+        closed_ports=frozenset([PORT2]),
+        joined_channels=frozenset(
+            [IrcChannel('#two', weight=2), IrcChannel('#four')]
+        ),
+        parted_channel_names=frozenset(['#three']),
+        routes_changed=True,
+        other_changes=False,
+    )
+
+
+def test_diff_configs_without_changes():
+    config = create_config({IrcChannel('#one')}, {Route(PORT1, '#one')})
+
+    diff = diff_configs(config, replace(config))
+
+    assert diff == ConfigDiff(
+        opened_ports=frozenset(),
+        closed_ports=frozenset(),
+        joined_channels=frozenset(),
+        parted_channel_names=frozenset(),
+        routes_changed=False,
+        other_changes=False,
+    )
+
+
+def test_diff_configs_with_changes_that_require_restart():
+    old = create_config({IrcChannel('#one')}, {Route(PORT1, '#one')})
+    new = replace(
+        old,
+        irc=replace(old.irc, nickname='other'),
+        queue=QueueConfig(max_size=10),
+    )
+
+    diff = diff_configs(old, new)
+
+    assert diff.other_changes
+    assert not diff.routes_changed
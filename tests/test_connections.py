@@ -0,0 +1,62 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from syslog2irc import metrics
+from syslog2irc.connections import ConnectionTracker, TcpConfig
+from syslog2irc.network import Port, TransportProtocol
+
+
+PORT1 = Port(10514, TransportProtocol.TCP)
+PORT2 = Port(11514, TransportProtocol.TCP)
+
+
+def test_connections_beyond_limits_are_refused():
+    tracker = ConnectionTracker(
+        TcpConfig(max_connections=3, max_connections_per_host=2)
+    )
+    refused_before = metrics.tcp_connections_refused.collect().get(PORT1, 0)
+
+    connection1 = tracker.open(PORT1, ('10.0.0.1', 40001))
+    connection2 = tracker.open(PORT2, ('10.0.0.1', 40002))
+    assert connection1 is not None
+    assert connection2 is not None
+    assert tracker.open(PORT1, ('10.0.0.1', 40003)) is None  # per host
+    assert tracker.open(PORT1, ('10.0.0.2', 40001)) is not None
+    assert tracker.open(PORT1, ('10.0.0.3', 40001)) is None  # overall
+
+    assert tracker.get_open_counts() == {PORT1: 2, PORT2: 1}
+    refused = metrics.tcp_connections_refused.collect().get(PORT1, 0)
+    assert refused - refused_before == 2
+
+    tracker.close(connection2)
+
+    assert tracker.open(PORT1, ('10.0.0.1', 40004)) is not None
+    assert tracker.get_open_counts() == {PORT1: 3}
+
+
+def test_received_messages_and_bytes_are_counted_per_connection():
+    tracker = ConnectionTracker(TcpConfig())
+
+    connection1 = tracker.open(PORT1, ('10.0.0.1', 40001))
+    connection2 = tracker.open(PORT1, ('10.0.0.2', 40001))
+    connection1.count_received(2, 60)
+    connection1.count_received(1, 25)
+    connection2.count_received(0, 10)
+
+    assert tracker.get_connection(PORT1, ('10.0.0.1', 40001)) is connection1
+    assert {
+        connection.client_address: (
+            connection.messages_received,
+            connection.bytes_received,
+        )
+        for connection in tracker.get_connections()
+    } == {
+        ('10.0.0.1', 40001): (3, 85),
+        ('10.0.0.2', 40001): (0, 10),
+    }
+
+    tracker.close(connection1)
+
+    assert tracker.get_connections() == [connection2]
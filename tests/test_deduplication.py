@@ -0,0 +1,130 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+from time import monotonic
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.config import Config
+from syslog2irc.deduplication import Deduplicator, Repetition
+from syslog2irc.irc import IrcConfig
+from syslog2irc.main import Processor
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.routing import Route
+from syslog2irc.signals import irc_channel_joined
+
+
+PORT = Port(514, TransportProtocol.UDP)
+SOURCE_ADDRESS = ('10.0.0.1', 514)
+
+
+def test_deduplicator():
+    deduplicator = Deduplicator(10)
+
+    message1 = create_message(b'Disk full!', second=1)
+    message2 = create_message(b'Disk full!', second=2)
+    message3 = create_message(b'Disk full!', second=3)
+    other_message = create_message(b'CPU on fire!', second=4)
+
+    assert deduplicator.should_pass(PORT, SOURCE_ADDRESS, message1, 100)
+    assert not deduplicator.should_pass(PORT, SOURCE_ADDRESS, message2, 101)
+    assert not deduplicator.should_pass(PORT, SOURCE_ADDRESS, message3, 102)
+    assert deduplicator.should_pass(PORT, SOURCE_ADDRESS, other_message, 103)
+
+    assert list(deduplicator.collect_closed_windows(109)) == []
+
+    assert list(deduplicator.collect_closed_windows(113)) == [
+        Repetition(PORT, SOURCE_ADDRESS, message3, 2),
+    ]
+
+    # A new window is opened after the previous one has closed.
+    assert deduplicator.should_pass(PORT, SOURCE_ADDRESS, message1, 114)
+
+
+def test_processor_announces_repetitions():
+    processor = create_processor()
+
+    irc_channel_joined.send(channel_name='#one')
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text)
+    )
+
+    for second in range(3):
+        message = create_message(b'Disk full!', second=second)
+        processor.announce_message(PORT, SOURCE_ADDRESS, message)
+
+    processor.announce_repetitions(monotonic() + 60)
+
+    assert said == [
+        (
+            '#one',
+            '10.0.0.1:514 [2021-05-08 20:15:00] (box) [error]: Disk full!',
+        ),
+        (
+            '#one',
+            '10.0.0.1:514 [2021-05-08 20:15:02] (box) [error]: '
+            'last message repeated 2 times',
+        ),
+    ]
+
+
+def test_repetitions_are_routed_like_the_repeated_message():
+    processor = create_processor(
+        routes={Route(PORT, '#one', include_patterns=('Disk full',))}
+    )
+
+    irc_channel_joined.send(channel_name='#one')
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text)
+    )
+
+    for second in range(3):
+        message = create_message(b'Disk full!', second=second)
+        processor.announce_message(PORT, SOURCE_ADDRESS, message)
+
+    processor.announce_repetitions(monotonic() + 60)
+
+    assert [text for _, text in said] == [
+        '10.0.0.1:514 [2021-05-08 20:15:00] (box) [error]: Disk full!',
+        '10.0.0.1:514 [2021-05-08 20:15:02] (box) [error]: '
+        'last message repeated 2 times',
+    ]
+
+
+def create_processor(*, routes=None):
+    if routes is None:
+        routes = {Route(PORT, '#one')}
+
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=set(),
+    )
+
+    config = Config(
+        log_level=None,
+        irc=irc_config,
+        routes=routes,
+        deduplication_window=10,
+    )
+
+    return Processor(config)
+
+
+def create_message(text, *, second):
+    return Message(
+        Facility.user,
+        Severity.error,
+        datetime(2021, 5, 8, 20, 15, second),
+        'box',
+        text,
+    )
@@ -0,0 +1,237 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+import socket
+from threading import Event
+from time import sleep
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.connections import ConnectionTracker, TcpConfig
+from syslog2irc.eventloop import (
+    DatagramDrainer,
+    start_syslog_message_receivers,
+    SyslogDatagramProtocol,
+)
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.signals import (
+    syslog_message_received,
+    syslog_messages_received,
+)
+
+
+CURRENT_YEAR = datetime.today().year
+
+
+def test_datagram_protocol():
+    expected_message = Message(
+        Facility.user,
+        Severity.notice,
+        datetime(CURRENT_YEAR, 5, 8, 20, 15, 59),
+        'box',
+        b'Hello!',
+    )
+
+    data = b'<13>May  8 20:15:59 box Hello!'
+
+    port = Port(514, TransportProtocol.UDP)
+    client_address = ('127.0.0.1', 34567)
+
+    received_signal_data = []
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        received_signal_data.append(data)
+
+    protocol = SyslogDatagramProtocol(port)
+    protocol.datagram_received(data, client_address)
+
+    assert received_signal_data == [
+        {
+            'message': expected_message,
+            'source_address': client_address,
+        }
+    ]
+
+
+def test_tcp_reception():
+    port = Port(find_free_port(), TransportProtocol.TCP)
+
+    received_messages = []
+    all_received = Event()
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        if sender == port:
+            received_messages.append(data['message'].message)
+            if len(received_messages) == 2:
+                all_received.set()
+
+    start_syslog_message_receivers([port])
+
+    with socket.create_connection(('127.0.0.1', port.number)) as sock:
+        sock.sendall(
+            b'<13>May  8 20:15:59 box One\n<13>May  8 20:16:00 box Two\n'
+        )
+        assert all_received.wait(timeout=5)
+
+    assert received_messages == [b'One', b'Two']
+
+
+def test_tcp_reception_with_octet_counting():
+    port = Port(find_free_port(), TransportProtocol.TCP)
+
+    received_messages = []
+    all_received = Event()
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        if sender == port:
+            received_messages.append(data['message'].message)
+            if len(received_messages) == 2:
+                all_received.set()
+
+    start_syslog_message_receivers([port])
+
+    with socket.create_connection(('127.0.0.1', port.number)) as sock:
+        sock.sendall(b'31 <13>May  8 20:15:59 box One\nTwo')
+        sock.sendall(b'29 <13>May  8 20:16:00 box Three')
+        assert all_received.wait(timeout=5)
+
+    assert received_messages == [b'One\nTwo', b'Three']
+
+
+def test_tcp_reception_of_unterminated_last_message():
+    port = Port(find_free_port(), TransportProtocol.TCP)
+
+    received_messages = []
+    all_received = Event()
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        if sender == port:
+            received_messages.append(data['message'].message)
+            if len(received_messages) == 2:
+                all_received.set()
+
+    start_syslog_message_receivers([port])
+
+    with socket.create_connection(('127.0.0.1', port.number)) as sock:
+        sock.sendall(
+            b'<13>May  8 20:15:59 box One\n<13>May  8 20:16:00 box Two'
+        )
+
+    assert all_received.wait(timeout=5)
+    assert received_messages == [b'One', b'Two']
+
+
+def test_ports_are_opened_and_closed_while_running():
+    port = Port(find_free_port(), TransportProtocol.TCP)
+
+    received = Event()
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        if sender == port:
+            received.set()
+
+    receivers = start_syslog_message_receivers([])
+
+    receivers.open_port(port)
+    with socket.create_connection(('127.0.0.1', port.number)) as sock:
+        sock.sendall(b'<13>May  8 20:15:59 box One\n')
+        assert received.wait(timeout=5)
+
+    receivers.close_port(port)
+    for _ in range(50):
+        try:
+            socket.create_connection(('127.0.0.1', port.number)).close()
+        except ConnectionRefusedError:
+            break
+        sleep(0.1)
+    else:
+        assert False, 'Port has not been closed.'
+
+
+def test_tcp_connections_are_limited_and_closed_when_idle():
+    port = Port(find_free_port(), TransportProtocol.TCP)
+    tracker = ConnectionTracker(
+        TcpConfig(max_connections_per_host=1, idle_timeout=0.5)
+    )
+
+    start_syslog_message_receivers([port], connection_tracker=tracker)
+
+    address = ('127.0.0.1', port.number)
+    with socket.create_connection(address, timeout=5) as sock1:
+        sock1.sendall(b'<13>May  8 20:15:59 box One\n')
+
+        # A second connection from the same host is closed right away.
+        with socket.create_connection(address, timeout=5) as sock2:
+            assert sock2.recv(1) == b''
+
+        assert tracker.get_open_counts() == {port: 1}
+
+        # The first one is closed once it has been idle for a while.
+        assert sock1.recv(1) == b''
+
+    for _ in range(50):
+        if not tracker.get_open_counts():
+            break
+        sleep(0.1)
+    else:
+        assert False, 'Connection has not been unregistered.'
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_datagram_drainer():
+    port = Port(514, TransportProtocol.UDP)
+
+    received_signal_data = []
+
+    @syslog_messages_received.connect
+    def handle_syslog_messages_received(sender, **data):
+        received_signal_data.append(data)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiving_sock:
+        receiving_sock.bind(('127.0.0.1', 0))
+        receiving_sock.setblocking(False)
+        address = receiving_sock.getsockname()
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sending_sock:
+            sending_sock.bind(('127.0.0.1', 0))
+            client_address = sending_sock.getsockname()
+
+            for data in [
+                b'<13>May  8 20:15:59 box One',
+                b'garbage',
+                b'<13>May  8 20:16:00 box Two',
+                b'<13>May  8 20:16:01 box Three',
+            ]:
+                sending_sock.sendto(data, address)
+
+        drainer = DatagramDrainer(port, receiving_sock, batch_size=2)
+        drainer.drain()
+        drainer.drain()
+        drainer.drain()
+
+    assert len(received_signal_data) == 2
+
+    first_batch = received_signal_data[0]['messages']
+    assert [source_address for source_address, _ in first_batch] == [
+        client_address
+    ]
+    assert [message.message for _, message in first_batch] == [b'One']
+
+    second_batch = received_signal_data[1]['messages']
+    assert [message.message for _, message in second_batch] == [
+        b'Two',
+        b'Three',
+    ]
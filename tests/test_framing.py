@@ -0,0 +1,76 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import pytest
+
+from syslog2irc.framing import Framing, FrameSplitter, FramingError
+
+
+@pytest.mark.parametrize(
+    'chunks, expected_framing, expected_frames',
+    [
+        (
+            [b'<13>one\n<13>two\n'],
+            Framing.NON_TRANSPARENT,
+            [b'<13>one', b'<13>two'],
+        ),
+        (
+            [b'<13>o', b'ne\n\n<13>tw', b'o\n<13>thr'],
+            Framing.NON_TRANSPARENT,
+            [b'<13>one', b'<13>two'],
+        ),
+        (
+            [b'7 <13>one7 <13>two'],
+            Framing.OCTET_COUNTING,
+            [b'<13>one', b'<13>two'],
+        ),
+        (
+            [b'1', b'4 <13>multi', b'\nline', b'7 <13>two8 <13>th'],
+            Framing.OCTET_COUNTING,
+            [b'<13>multi\nline', b'<13>two'],
+        ),
+    ],
+)
+def test_feed(chunks, expected_framing, expected_frames):
+    frame_splitter = FrameSplitter()
+
+    frames = []
+    for chunk in chunks:
+        frames.extend(frame_splitter.feed(chunk))
+
+    assert frame_splitter.framing == expected_framing
+    assert frames == expected_frames
+
+
+@pytest.mark.parametrize(
+    'data',
+    [
+        b'12x <13>one',
+        b'1234567 <13>one',
+        b'99999 <13>one',
+        b'<13>' + b'x' * 100,
+    ],
+)
+def test_feed_invalid_data(data):
+    frame_splitter = FrameSplitter(max_frame_length=64)
+
+    with pytest.raises(FramingError):
+        frame_splitter.feed(data)
+
+
+def test_finish_returns_unterminated_last_message():
+    frame_splitter = FrameSplitter()
+
+    assert frame_splitter.feed(b'<13>one\n<13>tw') == [b'<13>one']
+    assert frame_splitter.finish() == [b'<13>tw']
+    assert frame_splitter.finish() == []
+
+
+def test_finish_with_incomplete_octet_counted_message():
+    frame_splitter = FrameSplitter()
+
+    assert frame_splitter.feed(b'7 <13>one8 <13>tw') == [b'<13>one']
+    with pytest.raises(FramingError):
+        frame_splitter.finish()
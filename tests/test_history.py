@@ -0,0 +1,93 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import pytest
+from syslogmp import Severity
+
+from syslog2irc.history import (
+    ChannelHistory,
+    HistoryConfig,
+    HistoryQuery,
+    parse_query,
+)
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    [
+        ('',                        HistoryQuery(10, None, None)),
+        ('20',                      HistoryQuery(20, None, None)),
+        ('500',                     HistoryQuery(50, None, None)),
+        ('host=web1',               HistoryQuery(10, 'web1', None)),
+        ('20 host=web1 sev>=err',   HistoryQuery(20, 'web1', Severity.error)),
+        ('sev>=warning 5',          HistoryQuery(5, None, Severity.warning)),
+    ],
+)
+def test_parse_query(text, expected):
+    assert parse_query(text) == expected
+
+
+@pytest.mark.parametrize('text', ['sev>=fatal', 'hostname=web1', '-1'])
+def test_parse_invalid_query(text):
+    with pytest.raises(ValueError):
+        parse_query(text)
+
+
+@pytest.fixture
+def history():
+    history = ChannelHistory(HistoryConfig(max_messages=6))
+
+    for hostname, severity, text in [
+        ('web1', Severity.error,   'web1 error 1'),
+        ('db1',  Severity.notice,  'db1 notice 1'),
+        ('web1', Severity.notice,  'web1 notice 1'),
+        ('web2', Severity.alert,   'web2 alert 1'),
+        ('web1', Severity.warning, 'web1 warning 1'),
+        ('db1',  Severity.error,   'db1 error 1'),
+        ('web1', Severity.error,   'web1 error 2'),
+    ]:
+        history.add(hostname, severity, text)
+
+    return history
+
+
+@pytest.mark.parametrize(
+    'query, expected',
+    [
+        (
+            HistoryQuery(3),
+            ['web1 warning 1', 'db1 error 1', 'web1 error 2'],
+        ),
+        (
+            HistoryQuery(10, hostname='web1'),
+            ['web1 notice 1', 'web1 warning 1', 'web1 error 2'],
+        ),
+        (
+            HistoryQuery(10, min_severity=Severity.error),
+            ['web2 alert 1', 'db1 error 1', 'web1 error 2'],
+        ),
+        (
+            HistoryQuery(10, hostname='web1', min_severity=Severity.warning),
+            ['web1 warning 1', 'web1 error 2'],
+        ),
+        (
+            HistoryQuery(10, hostname='mail1'),
+            [],
+        ),
+    ],
+)
+def test_query(history, query, expected):
+    # The oldest message has been evicted.
+    assert history.query(query) == expected
+
+
+def test_history_is_limited_by_size():
+    history = ChannelHistory(HistoryConfig(max_messages=100, max_bytes=10))
+
+    for text in ['aaaa', 'bbbb', 'cccc', 'dddd']:
+        history.add('box', Severity.notice, text)
+
+    assert len(history) == 2
+    assert history.query(HistoryQuery(10)) == ['cccc', 'dddd']
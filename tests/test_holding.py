@@ -0,0 +1,43 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from syslog2irc.holding import MessageHolder
+
+
+def test_release_returns_held_texts_in_order():
+    holder = MessageHolder()
+
+    holder.hold('#one', 'first', 100.0)
+    holder.hold('#two', 'other', 100.0)
+    holder.hold('#one', 'second', 101.0)
+
+    assert holder.release('#one') == ['first', 'second']
+    assert holder.release('#one') == []
+    assert holder.get_channel_names() == ['#two']
+
+
+def test_hold_drops_oldest_text_if_full():
+    holder = MessageHolder(max_count=2)
+
+    for text in ['1', '2', '3']:
+        holder.hold('#one', text, 100.0)
+
+    assert holder.release('#one') == ['2', '3']
+    assert holder.take_dropped_counts() == {'#one': 1}
+    assert holder.take_dropped_counts() == {}
+
+
+def test_expire_drops_texts_held_for_too_long():
+    holder = MessageHolder(max_age=10.0)
+
+    holder.hold('#one', 'old', 100.0)
+    holder.hold('#one', 'new', 105.0)
+    holder.hold('#two', 'old', 100.0)
+
+    holder.expire(110.0)
+
+    assert holder.release('#one') == ['new']
+    assert not holder
+    assert holder.take_dropped_counts() == {'#one': 1, '#two': 1}
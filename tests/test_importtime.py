@@ -0,0 +1,46 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import subprocess
+import sys
+
+
+# Modules that take long to import, and are only needed once the
+# respective feature is used
+LAZILY_IMPORTED_MODULES = {
+    'asyncio',
+    'http.server',
+    'irc.bot',
+    'irc.client',
+    'ssl',
+}
+
+
+def test_heavy_modules_are_not_imported_on_startup():
+    imported_modules = get_imported_modules('syslog2irc.main')
+
+    assert 'syslog2irc.main' in imported_modules
+    assert imported_modules.isdisjoint(LAZILY_IMPORTED_MODULES)
+
+
+def get_imported_modules(module_name):
+    """Return the names of all modules imported along with the module,
+    as reported by `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+    # Lines look like this:
+    # import time: self [us] | cumulative | imported package
+    return {
+        line.rsplit('|', 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:') and line.count('|') == 2
+    }
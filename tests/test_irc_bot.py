@@ -7,7 +7,11 @@ from irc.client import Event, NickMask, ServerConnection
 import pytest
 
 from syslog2irc.irc import create_bot, IrcChannel, IrcConfig, IrcServer
-from syslog2irc.signals import irc_channel_joined
+from syslog2irc.signals import (
+    irc_channel_joined,
+    irc_channel_left,
+    irc_command_received,
+)
 
 
 @pytest.fixture
@@ -74,3 +78,82 @@ def test_channel_joins(config, bot, nickmask, monkeypatch):
         {'channel_name': '#one'},
         {'channel_name': '#two'},
     ]
+
+
+def test_channel_leaves(config, bot, nickmask, monkeypatch):
+    conn = ServerConnection(None)
+
+    received_signal_data = []
+
+    @irc_channel_left.connect
+    def handle_irc_channel_left(sender, **data):
+        received_signal_data.append(data)
+
+    rejoins = []
+    monkeypatch.setattr(
+        bot.reactor.scheduler,
+        'execute_after',
+        lambda delay, func: rejoins.append(delay),
+    )
+
+    other_nickmask = NickMask('other!other@host.test')
+
+    bot.on_part(conn, Event(type='part', source=other_nickmask, target='#one'))
+    bot.on_part(conn, Event(type='part', source=nickmask, target='#one'))
+
+    bot.on_kick(
+        conn,
+        Event(
+            type='kick',
+            source=other_nickmask,
+            target='#two',
+            arguments=['other'],
+        ),
+    )
+    bot.on_kick(
+        conn,
+        Event(
+            type='kick',
+            source=other_nickmask,
+            target='#two',
+            arguments=[config.nickname],
+        ),
+    )
+
+    bot.on_disconnect(
+        conn, Event(type='disconnect', source=config.server.host, target='')
+    )
+
+    assert received_signal_data == [
+        {'channel_name': '#one'},
+        {'channel_name': '#two'},
+        {'channel_name': '#one'},
+        {'channel_name': '#two'},
+    ]
+    assert len(rejoins) == 1
+
+
+def test_commands(bot, nickmask):
+    conn = ServerConnection(None)
+
+    received_signal_data = []
+
+    @irc_command_received.connect
+    def handle_irc_command_received(sender, **data):
+        received_signal_data.append(data)
+
+    other_nickmask = NickMask('other!other@host.test')
+    for text in ['hello', '!last 5']:
+        bot.on_pubmsg(
+            conn,
+            Event(
+                type='pubmsg',
+                source=other_nickmask,
+                target='#one',
+                arguments=[text],
+            ),
+        )
+
+    assert received_signal_data == [
+        {'channel_name': '#one', 'nickname': 'other', 'text': '!last 5'},
+    ]
@@ -0,0 +1,89 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import pytest
+
+from syslog2irc.irc import (
+    assign_channels,
+    BotPool,
+    ChannelAssignment,
+    create_bot,
+    derive_nickname,
+    IrcChannel,
+    IrcConfig,
+    IrcServer,
+)
+
+
+CHANNELS = {
+    IrcChannel('#a', weight=5),
+    IrcChannel('#b', weight=1),
+    IrcChannel('#c', weight=2),
+    IrcChannel('#d', weight=2),
+}
+
+
+@pytest.mark.parametrize(
+    'strategy, expected',
+    [
+        (
+            ChannelAssignment.ROUND_ROBIN,
+            [{'#a', '#c'}, {'#b', '#d'}],
+        ),
+        (
+            ChannelAssignment.BALANCED,
+            [{'#a'}, {'#b', '#c', '#d'}],
+        ),
+    ],
+)
+def test_assign_channels(strategy, expected):
+    channel_sets = assign_channels(CHANNELS, 2, strategy)
+
+    assert [{c.name for c in channels} for channels in channel_sets] == expected
+
+
+def test_assign_channels_uses_no_more_connections_than_channels():
+    channel_sets = assign_channels(CHANNELS, 10, ChannelAssignment.ROUND_ROBIN)
+
+    assert len(channel_sets) == 4
+
+
+@pytest.mark.parametrize(
+    'index, expected',
+    [
+        (0, 'syslog'),
+        (1, 'syslog2'),
+        (2, 'syslog3'),
+    ],
+)
+def test_derive_nickname(index, expected):
+    assert derive_nickname('syslog', index) == expected
+
+
+def test_create_bot_pool():
+    config = IrcConfig(
+        server=IrcServer('irc.server.test'),
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=CHANNELS,
+        connections=2,
+    )
+
+    pool = create_bot(config)
+
+    assert type(pool) == BotPool
+    assert [bot._nickname for bot in pool.bots] == ['nick', 'nick2']
+
+    said = []
+    for bot in pool.bots:
+        bot.say = lambda channel_name, text, bot=bot: said.append(
+            (bot._nickname, channel_name, text)
+        )
+
+    pool.say('#a', 'Hello A!')
+    pool.say('#d', 'Hello D!')
+
+    assert said == [('nick', '#a', 'Hello A!'), ('nick2', '#d', 'Hello D!')]
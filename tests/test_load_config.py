@@ -4,11 +4,30 @@
 """
 
 from io import StringIO
-
-from syslog2irc.config import load_config
-from syslog2irc.irc import IrcChannel, IrcConfig, IrcServer
+from pathlib import Path
+
+import pytest
+from syslogmp import Facility, Severity
+
+from syslog2irc.config import ConfigurationError, load_config
+from syslog2irc.connections import TcpConfig
+from syslog2irc.formatting import FormatConfig
+from syslog2irc.history import HistoryConfig
+from syslog2irc.irc import (
+    ChannelAssignment,
+    IrcChannel,
+    IrcConfig,
+    IrcServer,
+)
+from syslog2irc.metrics import MetricsConfig
 from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.packing import LongMessagePolicy, PackingConfig
+from syslog2irc.queueing import OverflowPolicy, QueueConfig
 from syslog2irc.routing import Route
+from syslog2irc.sockets import SocketConfig
+from syslog2irc.spool import SpoolConfig
+from syslog2irc.storms import StormConfig
+from syslog2irc.syslog import ReceiverEngine, SyslogConfig
 
 
 TOML_CONFIG = '''\
@@ -29,9 +48,11 @@ realname = "Monsieur Syslog"
 commands = [
   "MODE syslogger +i",
 ]
+connections = 2
+channel_assignment = "balanced"
 channels = [
     { name = "#monitoring" },
-    { name = "#network" },
+    { name = "#network", weight = 3 },
     { name = "#serverfarm", password = "more-is-more" },
 ]
 
@@ -39,6 +60,72 @@ channels = [
 "514/udp" = [ "#monitoring" ]
 "10514/udp" = [ "#monitoring", "#network" ]
 "11514/tcp" = [ "#monitoring", "#serverfarm" ]
+"12514/udp" = [
+    { channel = "#network", min_severity = "err" },
+    { channel = "#serverfarm", min_severity = "warning", facilities = [ "kern", "user" ] },
+    { channel = "#monitoring", include = [ "segfault", "OOM" ], exclude = [ "CRON" ] },
+]
+"13514/udp" = [
+    { channel = "#network", storm_threshold = 20 },
+]
+
+[syslog]
+engine = "asyncio"
+udp_batch_size = 32
+workers = 3
+ring_buffer_size = 1048576
+
+[syslog.tcp]
+max_connections = 200
+max_connections_per_host = 20
+idle_timeout = 0
+
+[syslog.sockets."12514/udp"]
+receive_buffer_size = 8388608
+busy_poll = 50
+
+[queue]
+max_size = 500
+overflow_policy = "drop-lowest-severity"
+drop_notice_interval = 300
+
+[deduplication]
+window = 30
+
+[packing]
+enabled = true
+separator = " // "
+max_delay = 0.5
+long_messages = "truncate"
+
+[metrics]
+enabled = true
+host = "0.0.0.0"
+port = 9100
+
+[format]
+template = "[{severity}] {hostname}: {text}"
+timestamp_format = "%H:%M:%S"
+
+[format.colors]
+critical = "red"
+warning = "orange"
+
+[spool]
+path = "/var/spool/syslog2irc"
+max_size = 67108864
+segment_size = 4194304
+replay_rate = 2.5
+
+[history]
+enabled = true
+max_messages = 200
+max_bytes = 65536
+
+[storm]
+window = 30
+summary_interval = 120
+top = 3
 '''
 
 
@@ -64,9 +151,11 @@ def test_load_config():
         ],
         channels={
             IrcChannel('#monitoring'),
-            IrcChannel('#network'),
+            IrcChannel('#network', weight=3),
             IrcChannel('#serverfarm', password='more-is-more'),
         },
+        connections=2,
+        channel_assignment=ChannelAssignment.BALANCED,
     )
 
     assert config.routes == {
@@ -75,8 +164,85 @@ def test_load_config():
         Route(Port(10514, TransportProtocol.UDP), "#network"),
         Route(Port(11514, TransportProtocol.TCP), "#monitoring"),
         Route(Port(11514, TransportProtocol.TCP), "#serverfarm"),
+        Route(
+            Port(12514, TransportProtocol.UDP),
+            "#network",
+            min_severity=Severity.error,
+        ),
+        Route(
+            Port(12514, TransportProtocol.UDP),
+            "#serverfarm",
+            min_severity=Severity.warning,
+            facilities=frozenset([Facility.kernel, Facility.user]),
+        ),
+        Route(
+            Port(12514, TransportProtocol.UDP),
+            "#monitoring",
+            include_patterns=("segfault", "OOM"),
+            exclude_patterns=("CRON",),
+        ),
+        Route(
+            Port(13514, TransportProtocol.UDP),
+            "#network",
+            storm_threshold=20.0,
+        ),
     }
 
+    assert config.syslog == SyslogConfig(
+        engine=ReceiverEngine.ASYNCIO,
+        udp_batch_size=32,
+        workers=3,
+        ring_buffer_size=1048576,
+        tcp=TcpConfig(
+            max_connections=200,
+            max_connections_per_host=20,
+            idle_timeout=None,
+        ),
+        sockets={
+            Port(12514, TransportProtocol.UDP): SocketConfig(
+                receive_buffer_size=8388608, busy_poll=50
+            ),
+        },
+    )
+
+    assert config.queue == QueueConfig(
+        max_size=500,
+        overflow_policy=OverflowPolicy.DROP_LOWEST_SEVERITY,
+        drop_notice_interval=300.0,
+    )
+
+    assert config.deduplication_window == 30.0
+
+    assert config.packing == PackingConfig(
+        separator=' // ',
+        max_delay=0.5,
+        long_message_policy=LongMessagePolicy.TRUNCATE,
+    )
+
+    assert config.metrics == MetricsConfig(host='0.0.0.0', port=9100)
+
+    assert config.formatting == FormatConfig(
+        template='[{severity}] {hostname}: {text}',
+        timestamp_format='%H:%M:%S',
+        colors={
+            Severity.critical: 'red',
+            Severity.warning: 'orange',
+        },
+    )
+
+    assert config.spool == SpoolConfig(
+        path=Path('/var/spool/syslog2irc'),
+        max_size=67108864,
+        segment_size=4194304,
+        replay_rate=2.5,
+    )
+
+    assert config.history == HistoryConfig(max_messages=200, max_bytes=65536)
+
+    assert config.storm == StormConfig(
+        window=30.0, summary_interval=120.0, top_count=3
+    )
+
 
 TOML_CONFIG_WITH_DEFAULTS = '''\
 [irc.server]
@@ -110,6 +276,24 @@ def test_load_config_with_defaults():
 
     assert config.routes == set()
 
+    assert config.syslog.engine == ReceiverEngine.THREADING
+
+    assert config.queue == QueueConfig()
+
+    assert config.deduplication_window is None
+
+    assert config.packing is None
+
+    assert config.metrics is None
+
+    assert config.formatting == FormatConfig()
+
+    assert config.spool is None
+
+    assert config.history is None
+
+    assert config.storm == StormConfig()
+
 
 TOML_CONFIG_WITHOUT_IRC_SERVER_TABLE = '''\
 [irc.bot]
@@ -139,3 +323,128 @@ def test_load_config_without_irc_server_host():
     config = load_config(toml)
 
     assert config.irc.server is None
+
+
+TOML_CONFIG_WITH_UNKNOWN_RECEIVER_ENGINE = '''\
+[irc.bot]
+nickname = "monitor"
+
+[syslog]
+engine = "carrier-pigeon"
+'''
+
+
+def test_load_config_with_unknown_receiver_engine():
+    toml = StringIO(TOML_CONFIG_WITH_UNKNOWN_RECEIVER_ENGINE)
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
+
+
+@pytest.mark.parametrize(
+    'format_table',
+    [
+        'template = "{source_host} {body}"',
+        'colors = { fatal = "red" }',
+        'colors = { error = "magenta" }',
+    ],
+)
+def test_load_config_with_invalid_format(format_table):
+    toml = StringIO(
+        '[irc.bot]\nnickname = "monitor"\n\n[format]\n' + format_table + '\n'
+    )
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
+
+
+@pytest.mark.parametrize(
+    'route_target',
+    [
+        '{ channel = "#unknown" }',
+        '{ channel = "#monitoring", min_severity = "catastrophic" }',
+        '{ channel = "#monitoring", facilities = [ "printer" ] }',
+        '{ channel = "#monitoring", include = [ "(unbalanced" ] }',
+        '{ channel = "#monitoring", include = [ "(?P<x>a)", "(?P<x>b)" ] }',
+        '{ channel = "#monitoring", storm_threshold = 0 }',
+    ],
+)
+def test_load_config_with_invalid_route(route_target):
+    toml = StringIO(
+        '[irc.bot]\nnickname = "monitor"\n\n'
+        '[irc]\nchannels = [ { name = "#monitoring" } ]\n\n'
+        f'[routes]\n"514/udp" = [ {route_target} ]\n'
+    )
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
+
+
+@pytest.mark.parametrize(
+    'spool_table',
+    [
+        'path = "/tmp/spool"\nsegment_size = 1024',
+        'path = "/tmp/spool"\nmax_size = 1048576',
+        'path = "/tmp/spool"\nreplay_rate = 0',
+    ],
+)
+def test_load_config_with_invalid_spool(spool_table):
+    toml = StringIO(
+        '[irc.bot]\nnickname = "monitor"\n\n[spool]\n' + spool_table + '\n'
+    )
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
+
+
+@pytest.mark.parametrize(
+    'storm_table',
+    [
+        'window = 0',
+        'summary_interval = -1',
+        'top = -1',
+    ],
+)
+def test_load_config_with_invalid_storm(storm_table):
+    toml = StringIO(
+        '[irc.bot]\nnickname = "monitor"\n\n[storm]\n' + storm_table + '\n'
+    )
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
+
+
+@pytest.mark.parametrize(
+    'tcp_table',
+    [
+        'max_connections = 0',
+        'max_connections_per_host = 0',
+        'idle_timeout = -1',
+    ],
+)
+def test_load_config_with_invalid_tcp_limits(tcp_table):
+    toml = StringIO(
+        '[irc.bot]\nnickname = "monitor"\n\n[syslog.tcp]\n'
+        + tcp_table
+        + '\n'
+    )
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
+
+
+@pytest.mark.parametrize(
+    'sockets_table',
+    [
+        '[syslog.sockets."514"]\nreceive_buffer_size = 65536',
+        '[syslog.sockets."514/udp"]\nreceive_buffer_size = 0',
+        '[syslog.sockets."514/udp"]\nbusy_poll = -1',
+    ],
+)
+def test_load_config_with_invalid_socket_options(sockets_table):
+    toml = StringIO(
+        '[irc.bot]\nnickname = "monitor"\n\n' + sockets_table + '\n'
+    )
+
+    with pytest.raises(ConfigurationError):
+        load_config(toml)
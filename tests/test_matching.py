@@ -0,0 +1,100 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import pytest
+
+from syslog2irc.matching import MultiPatternMatcher, PatternFilter
+
+
+PATTERNS = ['CRON', 'segfault|OOM', 'foo', 'foobar', 'bar']
+
+
+def create_filter(include=(), exclude=()):
+    def get_mask(patterns):
+        mask = 0
+        for pattern in patterns:
+            mask |= 1 << PATTERNS.index(pattern)
+        return mask
+
+    return PatternFilter(get_mask(include), get_mask(exclude))
+
+
+@pytest.mark.parametrize(
+    'include, exclude, text, expected',
+    [
+        ([],                 ['CRON'], b'CRON[123]: job done',   False),
+        ([],                 ['CRON'], b'sshd[1]: login',        True ),
+        (['segfault|OOM'],   [],       b'kernel: OOM killer',    True ),
+        (['segfault|OOM'],   [],       b'app[7]: segfault at 0', True ),
+        (['segfault|OOM'],   [],       b'app[7]: all fine',      False),
+        (['segfault|OOM'],   ['CRON'], b'CRON: OOM',             False),
+        # `foobar` only matches where `foo` matches, too.
+        (['foobar'],         [],       b'a foobar',              True ),
+        ([],                 ['foobar'], b'a foobar',            False),
+        (['foo'],            ['bar'],  b'foobar',                False),
+    ],
+)
+def test_match(include, exclude, text, expected):
+    matcher = MultiPatternMatcher(PATTERNS)
+    pattern_filter = create_filter(include, exclude)
+
+    matched_mask = matcher.match(text, [pattern_filter])
+
+    assert pattern_filter.passes(matched_mask) == expected
+
+
+def test_text_is_scanned_once_if_nothing_matches(monkeypatch):
+    matcher = MultiPatternMatcher(PATTERNS)
+    scanned_masks = []
+    scan = matcher._scan
+
+    def record_scan(mask, text):
+        scanned_masks.append(mask)
+        return scan(mask, text)
+
+    monkeypatch.setattr(matcher, '_scan', record_scan)
+
+    matcher.match(b'nothing to see here', [create_filter(exclude=['foobar'])])
+
+    assert scanned_masks == [matcher.all_mask]
+
+
+def test_many_patterns():
+    patterns = [f'error {i:d}\\b' for i in range(500)]
+    matcher = MultiPatternMatcher(patterns)
+    pattern_filter = PatternFilter(include_mask=1 << 321, exclude_mask=0)
+
+    assert pattern_filter.passes(matcher.match(b'error 321', [pattern_filter]))
+    assert not pattern_filter.passes(
+        matcher.match(b'error 32', [pattern_filter])
+    )
+
+
+def test_leading_global_flags_apply_to_their_pattern_only():
+    matcher = MultiPatternMatcher(['(?i)segfault', 'oom'])
+    include_segfault = PatternFilter(include_mask=0b01, exclude_mask=0)
+    include_oom = PatternFilter(include_mask=0b10, exclude_mask=0)
+
+    assert include_segfault.passes(
+        matcher.match(b'SEGFAULT', [include_segfault])
+    )
+    assert not include_oom.passes(matcher.match(b'OOM', [include_oom]))
+    assert include_oom.passes(matcher.match(b'oom', [include_oom]))
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    [
+        (b'error: aa', True),
+        (b'error: ab', False),
+    ],
+)
+def test_pattern_with_backreference(text, expected):
+    matcher = MultiPatternMatcher(['CRON', r'(a)\1', r'(b)(c)\2'])
+    pattern_filter = PatternFilter(include_mask=0b010, exclude_mask=0)
+
+    matched_mask = matcher.match(text, [pattern_filter])
+
+    assert pattern_filter.passes(matched_mask) == expected
@@ -8,7 +8,12 @@ from datetime import datetime
 import pytest
 from syslogmp import Facility, Message, Severity
 
-from syslog2irc.formatting import format_message
+from syslog2irc.formatting import (
+    compile_template,
+    format_message,
+    FormatConfig,
+)
+from syslog2irc.parsing import Rfc5424Message
 
 
 @pytest.mark.parametrize(
@@ -59,3 +64,107 @@ def test_format_message(
     """Test string representation of a syslog message."""
     message = Message(facility, severity, timestamp, hostname, message)
     assert format_message(source_address, message) == expected
+
+
+@pytest.mark.parametrize(
+    'source_address, facility, severity, timestamp, hostname, message',
+    [
+        (
+            ('10.10.0.2', 2234),
+            Facility.clock9,
+            Severity.warning,
+            datetime(2013, 7, 8, 0, 12, 55),
+            '10.10.0.2',
+            b'Tick, tack, watch the clock!',
+        ),
+        (
+            ('10.10.0.5', 5234),
+            Facility.user,
+            Severity.informational,
+            datetime(2021, 5, 4, 10, 1, 4),
+            '100%.example',
+            b'\n100% {surroundings}.\n',
+        ),
+    ],
+)
+def test_default_template_matches_format_message(
+    source_address, facility, severity, timestamp, hostname, message
+):
+    message = Message(facility, severity, timestamp, hostname, message)
+    format_with_template = compile_template(FormatConfig())
+
+    expected = format_message(source_address, message)
+
+    # Twice, to also render from the caches.
+    assert format_with_template(source_address, message) == expected
+    assert format_with_template(source_address, message) == expected
+
+
+def test_custom_template():
+    config = FormatConfig(
+        template='[{severity}/{facility}] {{{hostname}}} {text} @ {timestamp}',
+        timestamp_format='%H:%M',
+        colors={Severity.error: 'red'},
+    )
+    format_with_template = compile_template(config)
+
+    source_address = ('10.10.0.6', 6234)
+    message1 = Message(
+        Facility.mail,
+        Severity.error,
+        datetime(2021, 5, 4, 10, 1, 4),
+        'mx',
+        b'Disk full',
+    )
+    message2 = Message(
+        Facility.mail,
+        Severity.notice,
+        datetime(2021, 5, 4, 10, 2, 8),
+        'mx',
+        b'Mail queue flushed',
+    )
+
+    assert format_with_template(source_address, message1) == (
+        '\x0304[error/mail] {mx} Disk full @ 10:01\x0f'
+    )
+    assert format_with_template(source_address, message2) == (
+        '[notice/mail] {mx} Mail queue flushed @ 10:02'
+    )
+
+
+@pytest.mark.parametrize(
+    'template',
+    [
+        '{unknown}',
+        '{text:>10}',
+        '{hostname!r}',
+        '{text',
+    ],
+)
+def test_invalid_template(template):
+    with pytest.raises(ValueError):
+        compile_template(FormatConfig(template=template))
+
+
+def test_template_with_rfc5424_fields():
+    config = FormatConfig(template='{app_name} {structured_data} {text}')
+    format_with_template = compile_template(config)
+
+    source_address = ('10.10.0.6', 6234)
+    bsd_message = Message(
+        Facility.user, Severity.notice, datetime(2021, 5, 4), 'box', b'Hi!'
+    )
+    rfc5424_message = Rfc5424Message(
+        Facility.user,
+        Severity.notice,
+        datetime(2021, 5, 4),
+        'box',
+        b'Hi!',
+        app_name='app',
+        raw_structured_data=b'[origin ip="10.0.0.1"]',
+    )
+
+    assert format_with_template(source_address, bsd_message) == '- - Hi!'
+    assert format_with_template(source_address, rfc5424_message) == (
+        'app [origin ip="10.0.0.1"] Hi!'
+    )
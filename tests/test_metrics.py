@@ -0,0 +1,99 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from threading import Thread
+from urllib.request import urlopen
+
+from syslog2irc.metrics import (
+    MetricFamily,
+    MetricsConfig,
+    PerThreadCounter,
+    render_metrics,
+)
+from syslog2irc.metricsserver import start_metrics_server
+from syslog2irc.network import Port, TransportProtocol
+
+
+def test_counts_from_multiple_threads_are_summed_up():
+    counter = PerThreadCounter()
+
+    def count():
+        for _ in range(1000):
+            counter.increment('a')
+        counter.increment('b', 5)
+
+    threads = [Thread(target=count) for _ in range(100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counter.increment('a')
+
+    assert counter.collect() == {'a': 100001, 'b': 500}
+
+
+def test_render_metrics():
+    families = [
+        MetricFamily(
+            'syslog2irc_messages_received_total',
+            'counter',
+            'Syslog messages received.',
+            'port',
+            {
+                Port(55514, TransportProtocol.UDP): 7,
+                Port(514, TransportProtocol.TCP): 3,
+            },
+        ),
+        MetricFamily(
+            'syslog2irc_queue_depth',
+            'gauge',
+            'Syslog messages waiting.',
+            None,
+            {None: 0},
+        ),
+        MetricFamily(
+            'syslog2irc_irc_send_seconds_total',
+            'counter',
+            'Time spent sending.',
+            'channel',
+            {'#example': 1.5},
+        ),
+    ]
+
+    assert render_metrics(families) == (
+        '# HELP syslog2irc_messages_received_total Syslog messages received.\n'
+        '# TYPE syslog2irc_messages_received_total counter\n'
+        'syslog2irc_messages_received_total{port="514/tcp"} 3\n'
+        'syslog2irc_messages_received_total{port="55514/udp"} 7\n'
+        '# HELP syslog2irc_queue_depth Syslog messages waiting.\n'
+        '# TYPE syslog2irc_queue_depth gauge\n'
+        'syslog2irc_queue_depth 0\n'
+        '# HELP syslog2irc_irc_send_seconds_total Time spent sending.\n'
+        '# TYPE syslog2irc_irc_send_seconds_total counter\n'
+        'syslog2irc_irc_send_seconds_total{channel="#example"} 1.5\n'
+    )
+
+
+def test_metrics_endpoint():
+    def collect_gauges():
+        return [
+            MetricFamily('example_depth', 'gauge', 'Depth.', None, {None: 4})
+        ]
+
+    server = start_metrics_server(MetricsConfig(port=0), collect_gauges)
+    try:
+        host, port = server.server_address[:2]
+        url = f'http://{host}:{port:d}/metrics'
+        with urlopen(url, timeout=5) as response:
+            content_type = response.headers['Content-Type']
+            body = response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith('text/plain; version=0.0.4')
+    assert '# TYPE syslog2irc_messages_received_total counter\n' in body
+    assert 'example_depth 4\n' in body
@@ -0,0 +1,120 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import pytest
+
+from syslog2irc.packing import (
+    get_max_text_length,
+    LongMessagePolicy,
+    MessagePacker,
+    PackingConfig,
+    split_text,
+    truncate_text,
+)
+
+
+@pytest.mark.parametrize(
+    'text, max_length, expected',
+    [
+        ('abcdef',   6, 'abcdef'),
+        ('abcdef',   4, 'abcd'  ),
+        ('aäöü',     4, 'aä'    ),  # 'ä' and 'ö' take two bytes each.
+        ('aäöü',     3, 'aä'    ),
+        ('a€',       3, 'a'     ),  # '€' takes three bytes.
+    ],
+)
+def test_truncate_text(text, max_length, expected):
+    assert truncate_text(text, max_length) == expected
+
+
+@pytest.mark.parametrize(
+    'text, max_length, expected',
+    [
+        ('abcdef',   6, ['abcdef']             ),
+        ('abcdef',   4, ['abcd', 'ef']         ),
+        ('aäöü',     4, ['aä', 'öü']           ),
+        ('aäöü',     2, ['a', 'ä', 'ö', 'ü']   ),
+        ('€€€',      4, ['€', '€', '€']        ),
+    ],
+)
+def test_split_text(text, max_length, expected):
+    chunks = split_text(text, max_length)
+
+    assert chunks == expected
+    assert all(len(chunk.encode('utf-8')) <= max_length for chunk in chunks)
+
+
+def test_pack_messages_until_line_is_full():
+    said = []
+    packer = create_packer(said)
+    max_text_length = get_max_text_length('#one')
+
+    text = 'x' * ((max_text_length - 6) // 3)
+    packer.add('#one', text, now=0)
+    packer.add('#two', 'hi', now=0)
+    packer.add('#one', text, now=0)
+    packer.add('#one', text, now=0)
+    assert said == []
+
+    # This does not fit into the pending line for `#one` anymore.
+    packer.add('#one', 'four', now=0)
+    assert said == [('#one', f'{text} | {text} | {text}')]
+
+    packer.flush_all()
+    assert said == [
+        ('#one', f'{text} | {text} | {text}'),
+        ('#two', 'hi'),
+        ('#one', 'four'),
+    ]
+
+
+def test_flush_due_lines():
+    said = []
+    packer = create_packer(said)
+
+    packer.add('#one', 'one', now=10)
+    packer.add('#two', 'two', now=11)
+    packer.add('#one', 'three', now=12)
+
+    packer.flush_due(now=11.9)
+    assert said == []
+
+    packer.flush_due(now=12)
+    assert said == [('#one', 'one | three')]
+
+    packer.flush_due(now=13)
+    assert said == [('#one', 'one | three'), ('#two', 'two')]
+
+
+@pytest.mark.parametrize(
+    'long_message_policy, expected_chunk_count',
+    [
+        (LongMessagePolicy.SPLIT,    3),
+        (LongMessagePolicy.TRUNCATE, 1),
+    ],
+)
+def test_long_message(long_message_policy, expected_chunk_count):
+    said = []
+    packer = create_packer(said, long_message_policy=long_message_policy)
+    max_text_length = get_max_text_length('#one')
+
+    packer.add('#one', 'before', now=0)
+    packer.add('#one', 'ö' * max_text_length, now=0)
+
+    assert said[0] == ('#one', 'before')
+    chunks = [text for _, text in said[1:]]
+    assert len(chunks) == expected_chunk_count
+    assert all(
+        len(chunk.encode('utf-8')) <= max_text_length for chunk in chunks
+    )
+
+
+def create_packer(said, **kwargs):
+    config = PackingConfig(separator=' | ', max_delay=2, **kwargs)
+
+    def say(channel_name, text):
+        said.append((channel_name, text))
+
+    return MessagePacker(config, say)
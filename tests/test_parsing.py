@@ -0,0 +1,118 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.parsing import (
+    parse_message,
+    parse_structured_data,
+    parse_timestamp,
+    Rfc5424Message,
+)
+
+
+def test_parse_bsd_message():
+    data = b'<13>May  8 20:15:59 box Hello!'
+
+    message = parse_message(data)
+
+    assert type(message) is Message
+    assert message.hostname == 'box'
+    assert message.message == b'Hello!'
+
+
+@pytest.mark.parametrize('wrap', [bytes, memoryview])
+def test_parse_rfc5424_message(wrap):
+    data = (
+        b'<165>1 2003-10-11T22:14:15.003Z mymachine.example.com evntslog '
+        b'- ID47 [exampleSDID@32473 iut="3" eventSource="Application"] '
+        b'\xef\xbb\xbfAn application event log entry...'
+    )
+
+    message = parse_message(wrap(data))
+
+    assert message == Rfc5424Message(
+        facility=Facility.local4,
+        severity=Severity.notice,
+        timestamp=datetime(2003, 10, 11, 22, 14, 15, 3000, timezone.utc),
+        hostname='mymachine.example.com',
+        message=b'An application event log entry...',
+        app_name='evntslog',
+        raw_structured_data=(
+            b'[exampleSDID@32473 iut="3" eventSource="Application"]'
+        ),
+    )
+    assert message.structured_data == {
+        'exampleSDID@32473': {'iut': '3', 'eventSource': 'Application'},
+    }
+
+
+def test_parse_rfc5424_message_without_structured_data_and_text():
+    data = b'<34>1 2003-10-11T22:14:15+02:00 box su - ID47 -'
+
+    message = parse_message(data)
+
+    assert message.app_name == 'su'
+    assert message.raw_structured_data == b'-'
+    assert message.structured_data == {}
+    assert message.message == b''
+
+
+@pytest.mark.parametrize(
+    'data',
+    [
+        b'<192>1 2003-10-11T22:14:15Z box app - - - Hi!',
+        b'<34>1 2003-10-11 box app - - - Hi!',
+        b'<34>1 2003-10-11T22:14:15Z box app - - [broken Hi!',
+        b'<34>1 2003-10-11T22:14:15Z box app - - [id]Hi!',
+    ],
+)
+def test_parse_invalid_rfc5424_message(data):
+    with pytest.raises(ValueError):
+        parse_message(data)
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        (
+            '2003-10-11T22:14:15Z',
+            datetime(2003, 10, 11, 22, 14, 15, tzinfo=timezone.utc),
+        ),
+        (
+            '2003-08-24T05:14:15.000003-07:00',
+            datetime(
+                2003, 8, 24, 5, 14, 15, 3, timezone(-timedelta(hours=7))
+            ),
+        ),
+        (
+            '2003-08-24T05:14:15.5+05:30',
+            datetime(
+                2003,
+                8,
+                24,
+                5,
+                14,
+                15,
+                500000,
+                timezone(timedelta(hours=5, minutes=30)),
+            ),
+        ),
+    ],
+)
+def test_parse_timestamp(value, expected):
+    assert parse_timestamp(value) == expected
+
+
+def test_parse_structured_data_with_escapes():
+    data = b'[a x="say \\"hi\\"" y="[1\\]"][b@1][a z="\\\\"]'
+
+    assert parse_structured_data(data) == {
+        'a': {'x': 'say "hi"', 'y': '[1]', 'z': '\\'},
+        'b@1': {},
+    }
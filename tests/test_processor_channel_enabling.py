@@ -3,12 +3,16 @@
 :License: MIT, see LICENSE for details.
 """
 
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
 from syslog2irc.config import Config
-from syslog2irc.irc import IrcConfig
+from syslog2irc.irc import IrcChannel, IrcConfig
 from syslog2irc.main import Processor
 from syslog2irc.network import Port, TransportProtocol
 from syslog2irc.routing import Route
-from syslog2irc.signals import irc_channel_joined
+from syslog2irc.signals import irc_channel_joined, irc_channel_left
 
 
 def test_channel_enabling_on_join_signal():
@@ -34,13 +38,81 @@ def test_channel_enabling_on_join_signal():
     assert processor.router.is_channel_enabled('#example2')
 
 
-def create_processor(routes):
+def test_messages_are_held_while_channel_is_left():
+    port = Port(514, TransportProtocol.UDP)
+    routes = {
+        Route(port, '#one'),
+        Route(port, '#two'),
+    }
+
+    processor = create_processor(routes)
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text)
+    )
+
+    def announce(text):
+        message = Message(
+            Facility.user, Severity.notice, datetime(2021, 5, 4), 'box', text
+        )
+        processor.announce_message(port, ('10.0.0.1', 514), message)
+
+    irc_channel_joined.send(channel_name='#one')
+    irc_channel_joined.send(channel_name='#two')
+    announce(b'before')
+
+    irc_channel_left.send(channel_name='#two')
+    announce(b'during')
+
+    irc_channel_joined.send(channel_name='#two')
+    announce(b'after')
+
+    said_words = [(channel, text.split()[-1]) for channel, text in said]
+    assert said_words == [
+        ('#one', 'before'),
+        ('#two', 'before'),
+        ('#one', 'during'),
+        ('#two', 'during'),
+        ('#one', 'after'),
+        ('#two', 'after'),
+    ]
+
+
+def test_messages_are_held_until_configured_channel_is_joined():
+    port = Port(514, TransportProtocol.UDP)
+    routes = {Route(port, '#one')}
+
+    processor = create_processor(routes, channels={IrcChannel('#one')})
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text)
+    )
+
+    # Received right after startup, while connecting
+    assert processor.router.is_port_active(port)
+    message = Message(
+        Facility.user, Severity.notice, datetime(2021, 5, 4), 'box', b'early'
+    )
+    processor.announce_message(port, ('10.0.0.1', 514), message)
+    assert said == []
+
+    irc_channel_joined.send(channel_name='#one')
+    processor.run_periodic_tasks()
+
+    assert [(channel, text.split()[-1]) for channel, text in said] == [
+        ('#one', 'early'),
+    ]
+
+
+def create_processor(routes, *, channels=frozenset()):
     irc_config = IrcConfig(
         server=None,
         nickname='nick',
         realname='Nick',
         commands=[],
-        channels=set(),
+        channels=set(channels),
     )
 
     config = Config(log_level=None, irc=irc_config, routes=routes)
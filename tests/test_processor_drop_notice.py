@@ -0,0 +1,111 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from collections import Counter
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.config import Config
+from syslog2irc.irc import IrcConfig
+from syslog2irc.main import Processor
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.queueing import QueueConfig
+from syslog2irc.routing import Route
+from syslog2irc.signals import irc_channel_joined
+from syslog2irc.workers import DroppedMessageCounter
+
+
+PORT1 = Port(514, TransportProtocol.UDP)
+PORT2 = Port(10514, TransportProtocol.UDP)
+
+
+def test_announce_dropped_messages():
+    routes = {
+        Route(PORT1, '#one'),
+        Route(PORT1, '#two'),
+        Route(PORT2, '#two'),
+    }
+
+    processor = create_processor(routes)
+
+    irc_channel_joined.send(channel_name='#one')
+    irc_channel_joined.send(channel_name='#two')
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text)
+    )
+
+    for port in [PORT1, PORT2, PORT1, PORT2]:
+        processor.handle_syslog_message(
+            port, source_address=('10.0.0.1', 514), message=create_message()
+        )
+
+    processor.announce_dropped_messages()
+
+    assert said == [
+        ('#one', '1 message(s) dropped (queue was full).'),
+        ('#two', '2 message(s) dropped (queue was full).'),
+    ]
+
+
+def test_dropped_messages_are_announced_per_reason():
+    processor = create_processor({Route(PORT1, '#one')})
+
+    irc_channel_joined.send(channel_name='#one')
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text)
+    )
+    processor.irc_bot.take_dropped_counts = lambda: Counter({'#one': 3})
+    processor.ring_buffer_drops = DroppedMessageCounter()
+    processor.ring_buffer_drops.add(PORT1, 2)
+
+    for _ in range(3):
+        processor.handle_syslog_message(
+            PORT1, source_address=('10.0.0.1', 514), message=create_message()
+        )
+    processor.message_holder.hold('#one', 'Hello!', 100.0)
+    processor.message_holder.expire(200.0)
+
+    processor.announce_dropped_messages()
+
+    assert said == [
+        ('#one', '2 message(s) dropped (ring buffer was full).'),
+        ('#one', '1 message(s) dropped (queue was full).'),
+        ('#one', '3 message(s) dropped (send queue was full).'),
+        ('#one', '1 message(s) dropped (channel was not joined in time).'),
+    ]
+
+
+def create_processor(routes):
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=set(),
+    )
+
+    config = Config(
+        log_level=None,
+        irc=irc_config,
+        routes=routes,
+        queue=QueueConfig(max_size=2),
+    )
+
+    return Processor(config)
+
+
+def create_message():
+    return Message(
+        Facility.user,
+        Severity.notice,
+        datetime(2021, 5, 8, 20, 15, 59),
+        'box',
+        b'Hello!',
+    )
@@ -0,0 +1,78 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.config import Config
+from syslog2irc.history import HistoryConfig
+from syslog2irc.irc import IrcConfig
+from syslog2irc.main import Processor
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.routing import Route
+from syslog2irc.signals import irc_channel_joined, irc_command_received
+
+
+PORT = Port(514, TransportProtocol.UDP)
+
+
+def test_last_command_is_answered_by_private_message():
+    processor = create_processor()
+    irc_channel_joined.send(channel_name='#one')
+
+    for hostname, severity, text in [
+        ('web1', Severity.error, b'Disk full'),
+        ('db1', Severity.error, b'Too many connections'),
+        ('web1', Severity.notice, b'Disk cleaned up'),
+    ]:
+        message = Message(
+            Facility.user, severity, datetime(2021, 5, 4), hostname, text
+        )
+        processor.announce_message(PORT, ('10.0.0.1', 514), message)
+
+    said = []
+    processor.irc_bot.say = lambda target, text: said.append((target, text))
+
+    irc_command_received.send(
+        channel_name='#one', nickname='alice', text='!last host=web1 sev>=err'
+    )
+    irc_command_received.send(
+        channel_name='#one', nickname='bob', text='!last sev>=fatal'
+    )
+    irc_command_received.send(
+        channel_name='#one', nickname='carol', text='!unknown'
+    )
+
+    assert said == [
+        (
+            'alice',
+            '10.0.0.1:514 [2021-05-04 00:00:00] (web1) [error]: Disk full',
+        ),
+        (
+            'bob',
+            'Unknown severity "fatal". Usage: !last [count] '
+            '[host=<hostname>] [sev>=<severity>]',
+        ),
+    ]
+
+
+def create_processor():
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=set(),
+    )
+
+    config = Config(
+        log_level=None,
+        irc=irc_config,
+        routes={Route(PORT, '#one')},
+        history=HistoryConfig(),
+    )
+
+    return Processor(config)
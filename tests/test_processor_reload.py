@@ -0,0 +1,146 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.config import Config, diff_configs
+from syslog2irc.irc import IrcChannel, IrcConfig
+from syslog2irc.main import Processor
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.routing import Route
+from syslog2irc.signals import irc_command_received
+
+
+PORT1 = Port(514, TransportProtocol.UDP)
+PORT2 = Port(10514, TransportProtocol.UDP)
+
+
+class FakeReceivers:
+    def __init__(self, on_open=None):
+        self.ports = set()
+        self.on_open = on_open
+
+    def open_port(self, port):
+        self.ports.add(port)
+        if self.on_open is not None:
+            self.on_open(port)
+
+    def close_port(self, port):
+        self.ports.remove(port)
+
+
+def test_apply_config_updates_routes_channels_and_ports():
+    processor = Processor(
+        create_config(
+            {IrcChannel('#one'), IrcChannel('#two')},
+            {Route(PORT1, '#one'), Route(PORT1, '#two')},
+        )
+    )
+    processor.syslog_receivers = FakeReceivers()
+    processor.syslog_receivers.ports = {PORT1}
+    processor.irc_bot.start()  # Joins channels.
+
+    said = []
+    processor.irc_bot.say = lambda target, text: said.append((target, text))
+
+    processor.apply_config(
+        create_config(
+            {IrcChannel('#one'), IrcChannel('#three')},
+            {Route(PORT2, '#one'), Route(PORT2, '#three')},
+        )
+    )
+
+    assert processor.syslog_receivers.ports == {PORT2}
+    assert processor.router.enabled_channels == {'#one', '#three'}
+    assert processor.syslog_ports == {PORT2}
+
+    message = Message(
+        Facility.user, Severity.error, datetime(2021, 5, 4), 'box', b'Oops'
+    )
+    processor.announce_message(PORT1, ('10.0.0.1', 514), message)
+    processor.announce_message(PORT2, ('10.0.0.1', 514), message)
+
+    assert sorted(target for target, _ in said) == ['#one', '#three']
+
+
+def test_new_port_is_active_for_new_channel_once_opened():
+    processor = Processor(
+        create_config({IrcChannel('#one')}, {Route(PORT1, '#one')})
+    )
+    processor.irc_bot.start()  # Joins channels.
+
+    active_when_opened = []
+    processor.syslog_receivers = FakeReceivers(
+        on_open=lambda port: active_when_opened.append(
+            processor.router.is_port_active(port)
+        )
+    )
+    processor.syslog_receivers.ports = {PORT1}
+
+    processor.apply_config(
+        create_config(
+            {IrcChannel('#one'), IrcChannel('#two')},
+            {Route(PORT1, '#one'), Route(PORT2, '#two')},
+        )
+    )
+
+    # Messages are held until the new channel has been joined.
+    assert active_when_opened == [True]
+
+
+def test_settings_that_require_restart_are_not_taken_over():
+    old_config = create_config({IrcChannel('#one')}, {Route(PORT1, '#one')})
+    processor = Processor(old_config)
+
+    new_config = create_config(
+        {IrcChannel('#one'), IrcChannel('#two')},
+        {Route(PORT1, '#one')},
+        deduplication_window=30.0,
+    )
+    processor.apply_config(new_config)
+
+    assert processor.config.deduplication_window is None
+    assert processor.config.irc.channels == new_config.irc.channels
+
+    # The unapplied setting is still reported as a change.
+    assert diff_configs(processor.config, new_config).other_changes
+
+
+def test_reload_command_is_accepted_from_configured_nicknames_only():
+    processor = Processor(
+        create_config(
+            {IrcChannel('#one')},
+            {Route(PORT1, '#one')},
+            reload_nicknames=frozenset(['admin']),
+        )
+    )
+
+    said = []
+    processor.irc_bot.say = lambda target, text: said.append((target, text))
+
+    irc_command_received.send(
+        channel_name='#one', nickname='mallory', text='!reload'
+    )
+    assert not processor.reload_requested
+
+    irc_command_received.send(
+        channel_name='#one', nickname='admin', text='!reload'
+    )
+    assert processor.reload_requested
+    assert said == [('admin', 'Reloading configuration.')]
+
+
+def create_config(channels, routes, **kwargs):
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=channels,
+    )
+
+    return Config(log_level=None, irc=irc_config, routes=routes, **kwargs)
@@ -0,0 +1,152 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.config import Config
+from syslog2irc.irc import IrcChannel, IrcConfig
+from syslog2irc.main import Processor
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.routing import Route
+from syslog2irc.signals import irc_channel_joined
+from syslog2irc.spool import SpoolConfig
+
+
+PORT = Port(514, TransportProtocol.UDP)
+
+
+def test_spooled_messages_are_replayed_at_limited_rate(tmp_path):
+    processor = create_processor(tmp_path)
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        text.split()[-1]
+    )
+
+    # Not connected yet
+    for number in range(5):
+        processor.spool.append(
+            PORT, ('10.0.0.1', 514), create_message(str(number))
+        )
+    processor.announce_spooled_messages(100.0)
+    assert said == []
+
+    irc_channel_joined.send(channel_name='#one')
+
+    processor.announce_spooled_messages(101.0)
+    assert said == ['0', '1']
+
+    processor.announce_spooled_messages(102.0)
+    processor.announce_spooled_messages(103.0)
+    assert said == ['0', '1', '2', '3', '4']
+    assert not processor.replaying
+
+    # Caught up, so no longer limited.
+    for number in range(5, 10):
+        processor.spool.append(
+            PORT, ('10.0.0.1', 514), create_message(str(number))
+        )
+    processor.announce_spooled_messages(103.1)
+    assert said[5:] == ['5', '6', '7', '8', '9']
+
+    processor.spool.close()
+
+
+def test_spooled_messages_wait_for_all_channels_to_be_joined(tmp_path):
+    processor = create_processor(
+        tmp_path,
+        routes={Route(PORT, '#one'), Route(PORT, '#two')},
+        channel_names={'#one', '#two'},
+    )
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text.split()[-1])
+    )
+
+    for number in range(3):
+        processor.spool.append(
+            PORT, ('10.0.0.1', 514), create_message(str(number))
+        )
+
+    irc_channel_joined.send(channel_name='#one')
+
+    processor.announce_spooled_messages(100.0)
+    processor.announce_spooled_messages(101.0)
+    assert said == []
+
+    irc_channel_joined.send(channel_name='#two')
+
+    processor.announce_spooled_messages(102.0)
+    processor.announce_spooled_messages(103.0)
+    assert sorted(said) == [
+        ('#one', '0'),
+        ('#one', '1'),
+        ('#one', '2'),
+        ('#two', '0'),
+        ('#two', '1'),
+        ('#two', '2'),
+    ]
+
+    processor.spool.close()
+
+
+def test_spooled_messages_do_not_wait_forever(tmp_path):
+    processor = create_processor(
+        tmp_path,
+        routes={Route(PORT, '#one'), Route(PORT, '#two')},
+        channel_names={'#one', '#two'},
+    )
+
+    said = []
+    processor.irc_bot.say = lambda channel_name, text: said.append(
+        (channel_name, text.split()[-1])
+    )
+
+    processor.spool.append(PORT, ('10.0.0.1', 514), create_message('0'))
+
+    irc_channel_joined.send(channel_name='#one')
+
+    processor.announce_spooled_messages(100.0)
+    assert said == []
+
+    # Held for the channel that has not been joined, like live messages
+    max_age = processor.message_holder.max_age
+    processor.announce_spooled_messages(100.0 + max_age)
+    assert said == [('#one', '0')]
+    assert processor.message_holder.get_channel_names() == ['#two']
+
+    processor.spool.close()
+
+
+def create_processor(tmp_path, routes=None, channel_names=()):
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels={IrcChannel(name) for name in channel_names},
+    )
+
+    config = Config(
+        log_level=None,
+        irc=irc_config,
+        routes=routes if routes is not None else {Route(PORT, '#one')},
+        spool=SpoolConfig(path=tmp_path / 'spool', replay_rate=2.0),
+    )
+
+    return Processor(config)
+
+
+def create_message(text):
+    return Message(
+        Facility.user,
+        Severity.notice,
+        datetime(2021, 5, 8, 20, 15, 59),
+        'box',
+        text.encode(),
+    )
@@ -0,0 +1,72 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.config import Config
+from syslog2irc.irc import IrcConfig
+from syslog2irc.main import Processor
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.routing import Route
+from syslog2irc.signals import irc_channel_joined
+from syslog2irc.storms import StormConfig
+
+
+PORT = Port(514, TransportProtocol.UDP)
+
+
+def test_storm_is_summarized_on_route_with_threshold_only():
+    processor = create_processor()
+    irc_channel_joined.send(channel_name='#calm')
+    irc_channel_joined.send(channel_name='#stormy')
+
+    said = []
+    processor.irc_bot.say = lambda target, text: said.append((target, text))
+
+    message = Message(
+        Facility.user, Severity.error, datetime(2021, 5, 4), 'web1', b'Oops'
+    )
+    for _ in range(5):
+        processor.announce_message(PORT, ('10.0.0.1', 514), message)
+
+    # Only the first two messages pass the threshold.
+    targets = [target for target, _ in said]
+    assert targets.count('#calm') == 5
+    assert targets.count('#stormy') == 2
+
+    del said[:]
+    processor.run_periodic_tasks()
+
+    assert [target for target, _ in said] == ['#stormy'] * 3
+    assert said[0][1].startswith('Summarized 3 message(s) ')
+    assert said[1:] == [
+        ('#stormy', 'By host and severity: web1/error: 3'),
+        ('#stormy', '(3x) Oops'),
+    ]
+
+
+def create_processor():
+    irc_config = IrcConfig(
+        server=None,
+        nickname='nick',
+        realname='Nick',
+        commands=[],
+        channels=set(),
+    )
+
+    config = Config(
+        log_level=None,
+        irc=irc_config,
+        routes={
+            Route(PORT, '#calm'),
+            Route(PORT, '#stormy', storm_threshold=0.2),
+        },
+        # Summarize on every run of the periodic tasks.
+        storm=StormConfig(window=10.0, summary_interval=0.0),
+    )
+
+    return Processor(config)
@@ -0,0 +1,81 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+
+import pytest
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.queueing import MessageQueue, OverflowPolicy
+
+
+PORT1 = Port(514, TransportProtocol.UDP)
+PORT2 = Port(10514, TransportProtocol.UDP)
+SOURCE_ADDRESS = ('10.0.0.1', 514)
+
+
+@pytest.mark.parametrize(
+    'overflow_policy, expected_texts',
+    [
+        (OverflowPolicy.DROP_NEWEST,          [b'one', b'two', b'three']),
+        (OverflowPolicy.DROP_OLDEST,          [b'three', b'four', b'five']),
+        (OverflowPolicy.DROP_LOWEST_SEVERITY, [b'one', b'three', b'five']),
+    ],
+)
+def test_overflow_policies(overflow_policy, expected_texts):
+    queue = MessageQueue(3, overflow_policy)
+
+    queue.put(PORT1, SOURCE_ADDRESS, create_message(Severity.error, b'one'))
+    queue.put(PORT1, SOURCE_ADDRESS, create_message(Severity.debug, b'two'))
+    queue.put(PORT2, SOURCE_ADDRESS, create_message(Severity.alert, b'three'))
+    queue.put(PORT2, SOURCE_ADDRESS, create_message(Severity.debug, b'four'))
+    queue.put(PORT2, SOURCE_ADDRESS, create_message(Severity.notice, b'five'))
+
+    assert queue.qsize() == 3
+    assert get_texts(queue) == expected_texts
+
+
+def test_drop_lowest_severity_drops_new_message_if_least_important():
+    queue = MessageQueue(2, OverflowPolicy.DROP_LOWEST_SEVERITY)
+
+    queue.put(PORT1, SOURCE_ADDRESS, create_message(Severity.error, b'one'))
+    queue.put(PORT1, SOURCE_ADDRESS, create_message(Severity.warning, b'two'))
+    queue.put(PORT1, SOURCE_ADDRESS, create_message(Severity.debug, b'three'))
+
+    assert get_texts(queue) == [b'one', b'two']
+
+
+def test_take_dropped_counts():
+    queue = MessageQueue(1, OverflowPolicy.DROP_OLDEST)
+
+    queue.put(PORT1, SOURCE_ADDRESS, create_message(Severity.error, b'one'))
+    queue.put(PORT2, SOURCE_ADDRESS, create_message(Severity.error, b'two'))
+    queue.put(PORT2, SOURCE_ADDRESS, create_message(Severity.error, b'three'))
+    queue.put(PORT2, SOURCE_ADDRESS, create_message(Severity.error, b'four'))
+
+    assert queue.take_dropped_counts() == {PORT1: 1, PORT2: 2}
+    assert queue.take_dropped_counts() == {}
+
+
+def test_get_with_timeout_from_empty_queue():
+    queue = MessageQueue(1)
+
+    assert queue.get(timeout=0.01) is None
+
+
+def create_message(severity, text):
+    return Message(
+        Facility.user, severity, datetime(2021, 5, 8, 20, 15, 59), 'box', text
+    )
+
+
+def get_texts(queue):
+    texts = []
+    while True:
+        item = queue.get(timeout=0)
+        if item is None:
+            return texts
+        texts.append(item[2].message)
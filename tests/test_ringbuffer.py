@@ -0,0 +1,42 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from syslog2irc.ringbuffer import RingBuffer
+
+
+def test_put_and_get_many():
+    ring_buffer = RingBuffer(1024)
+
+    assert ring_buffer.put(b'one')
+    assert ring_buffer.put(b'two')
+    assert ring_buffer.put(b'three')
+
+    assert ring_buffer.get_many(2) == [b'one', b'two']
+    assert ring_buffer.get_many(2) == [b'three']
+    assert ring_buffer.get_many(2, timeout=0) == []
+
+
+def test_wrap_around():
+    ring_buffer = RingBuffer(32)
+
+    # Each record takes 4 bytes for its length plus its data.
+    for i in range(20):
+        record = f'record{i:02d}'.encode('ascii')
+        assert ring_buffer.put(record)
+        assert ring_buffer.get_many(1) == [record]
+
+    assert ring_buffer.dropped == 0
+
+
+def test_drop_records_if_full():
+    ring_buffer = RingBuffer(32)
+
+    assert ring_buffer.put(b'x' * 12)
+    assert ring_buffer.put(b'y' * 12)
+    assert not ring_buffer.put(b'z')
+    assert not ring_buffer.put(b'too long for the ring buffer at all')
+
+    assert ring_buffer.dropped == 2
+    assert ring_buffer.get_many(10) == [b'x' * 12, b'y' * 12]
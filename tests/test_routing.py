@@ -3,7 +3,10 @@
 :License: MIT, see LICENSE for details.
 """
 
+from datetime import datetime
+
 import pytest
+from syslogmp import Facility, Message, Severity
 
 from syslog2irc.network import Port, TransportProtocol
 from syslog2irc.routing import map_channel_names_to_ports, Route, Router
@@ -51,3 +54,160 @@ def test_do_not_enable_channel_without_routed_ports():
 
     assert router.is_channel_enabled('#one')
     assert not router.is_channel_enabled('#two')
+
+
+def test_port_is_active_only_once_a_routed_channel_is_enabled():
+    routes = {
+        Route(create_port(514), '#one'),
+        Route(create_port(514), '#two'),
+        Route(create_port(55514), '#two'),
+    }
+    router = Router(routes)
+
+    assert not router.is_port_active(create_port(514))
+    assert not router.is_port_active(create_port(55514))
+
+    router.enable_channel(None, channel_name='#one')
+
+    assert router.is_port_active(create_port(514))
+    assert not router.is_port_active(create_port(55514))
+
+    router.enable_channel(None, channel_name='#two')
+
+    assert router.is_port_active(create_port(514))
+    assert router.is_port_active(create_port(55514))
+
+
+@pytest.mark.parametrize(
+    'facility, severity, expected',
+    [
+        (Facility.kernel, Severity.emergency,     ('#all', '#errors', '#kernel')),
+        (Facility.kernel, Severity.error,         ('#all', '#errors', '#kernel')),
+        (Facility.kernel, Severity.warning,       ('#all', '#kernel')),
+        (Facility.kernel, Severity.debug,         ('#all', '#kernel')),
+        (Facility.mail,   Severity.critical,      ('#all', '#errors')),
+        (Facility.mail,   Severity.informational, ('#all',)),
+        (Facility.local7, Severity.alert,         ('#all', '#errors', '#kernel')),
+    ],
+)
+def test_get_channel_names_for_message(facility, severity, expected):
+    port = create_port(514)
+    routes = {
+        Route(port, '#all'),
+        Route(port, '#errors', min_severity=Severity.error),
+        Route(port, '#kernel', facilities=frozenset([Facility.kernel])),
+        # A second route to the same channel widens its filter.
+        Route(port, '#kernel', min_severity=Severity.alert),
+    }
+    router = Router(routes)
+
+    message = Message(facility, severity, datetime(2021, 5, 4), 'box', b'')
+
+    assert router.get_channel_names_for_message(port, message) == expected
+
+
+@pytest.mark.parametrize(
+    'severity, text, expected',
+    [
+        (Severity.error,  b'app[1]: segfault at 0', ('#all', '#crashes', '#quiet')),
+        (Severity.error,  b'CRON[2]: job failed',   ('#all',)),
+        (Severity.error,  b'sshd[3]: login',        ('#all', '#quiet')),
+        (Severity.notice, b'app[1]: segfault at 0', ('#all', '#crashes')),
+    ],
+)
+def test_get_channel_names_for_message_with_patterns(severity, text, expected):
+    port = create_port(514)
+    routes = {
+        Route(port, '#all'),
+        Route(port, '#crashes', include_patterns=('segfault|OOM',)),
+        Route(
+            port,
+            '#quiet',
+            min_severity=Severity.warning,
+            exclude_patterns=('CRON',),
+        ),
+    }
+    router = Router(routes)
+
+    message = Message(Facility.user, severity, datetime(2021, 5, 4), 'box', text)
+
+    assert router.get_channel_names_for_message(port, message) == expected
+
+
+def test_get_targets_for_message_follows_joins_and_leaves():
+    port = create_port(514)
+    routes = {
+        Route(port, '#one'),
+        Route(port, '#two'),
+        Route(port, '#crashes', include_patterns=('segfault',)),
+    }
+    router = Router(routes)
+
+    message = Message(
+        Facility.user,
+        Severity.error,
+        datetime(2021, 5, 4),
+        'box',
+        b'app[1]: segfault at 0',
+    )
+
+    def get_targets():
+        targets = router.get_targets_for_message(port, message)
+        return targets.live_channel_names, targets.held_channel_names
+
+    assert not router.get_targets_for_message(port, message)
+
+    router.enable_channel(None, channel_name='#one')
+    router.enable_channel(None, channel_name='#two')
+    router.enable_channel(None, channel_name='#crashes')
+    assert get_targets() == (('#crashes', '#one', '#two'), ())
+
+    # Being kicked, or disconnected
+    router.disable_channel(None, channel_name='#two')
+    router.disable_channel(None, channel_name='#crashes')
+    assert get_targets() == (('#one',), ('#crashes', '#two'))
+    assert router.is_port_active(port)
+
+    router.enable_channel(None, channel_name='#two')
+    assert get_targets() == (('#one', '#two'), ('#crashes',))
+
+
+def test_disable_channel_that_has_not_been_joined():
+    port = create_port(514)
+    router = Router({Route(port, '#one')})
+
+    router.disable_channel(None, channel_name='#one')
+
+    assert not router.is_channel_enabled('#one')
+    assert not router.is_port_active(port)
+
+
+def test_update_routes_keeps_joined_channels():
+    port1 = create_port(514)
+    port2 = create_port(55514)
+    router = Router({Route(port1, '#one')})
+
+    router.enable_channel(None, channel_name='#one')
+    # joined, but not routed to (yet)
+    router.enable_channel(None, channel_name='#two')
+    assert not router.is_channel_enabled('#two')
+
+    router.update_routes({Route(port2, '#one'), Route(port2, '#two')})
+
+    assert router.is_channel_enabled('#one')
+    assert router.is_channel_enabled('#two')
+    assert not router.is_port_active(port1)
+    assert router.is_port_active(port2)
+
+    message = Message(
+        Facility.user, Severity.error, datetime(2021, 5, 4), 'box', b'Oops'
+    )
+    assert not router.get_targets_for_message(port1, message)
+    targets = router.get_targets_for_message(port2, message)
+    assert targets.live_channel_names == ('#one', '#two')
+
+    router.forget_channel('#two')
+    assert not router.is_channel_enabled('#two')
+    targets = router.get_targets_for_message(port2, message)
+    assert targets.live_channel_names == ('#one',)
+    assert targets.held_channel_names == ()
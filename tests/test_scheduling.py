@@ -0,0 +1,88 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from syslog2irc.scheduling import SendScheduler
+
+
+def test_round_robin_across_targets():
+    scheduler = create_scheduler({})
+
+    for i in range(4):
+        scheduler.enqueue('#busy', f'busy{i}')
+    scheduler.enqueue('#quiet', 'quiet0')
+
+    assert take_all(scheduler) == [
+        ('#busy', 'busy0'),
+        ('#quiet', 'quiet0'),
+        ('#busy', 'busy1'),
+        ('#busy', 'busy2'),
+        ('#busy', 'busy3'),
+    ]
+
+
+def test_weighted_round_robin():
+    scheduler = create_scheduler({'#ops': 3})
+
+    for i in range(4):
+        scheduler.enqueue('#ops', f'ops{i}')
+        scheduler.enqueue('#misc', f'misc{i}')
+
+    assert [target for target, _ in take_all(scheduler)] == [
+        '#ops',
+        '#ops',
+        '#misc',
+        '#ops',
+        '#ops',
+        '#misc',
+        '#misc',
+        '#misc',
+    ]
+
+
+def test_drop_oldest_message_of_full_queue():
+    scheduler = create_scheduler({}, max_queue_size=2)
+
+    scheduler.enqueue('#busy', 'one')
+    scheduler.enqueue('#busy', 'two')
+    scheduler.enqueue('#busy', 'three')
+    scheduler.enqueue('#quiet', 'four')
+
+    assert scheduler.take_dropped_counts() == {'#busy': 1}
+    assert take_all(scheduler) == [
+        ('#busy', 'two'),
+        ('#quiet', 'four'),
+        ('#busy', 'three'),
+    ]
+
+
+def test_queues_of_nicknames_are_removed_once_empty():
+    scheduler = create_scheduler({}, max_queue_size=1)
+
+    scheduler.enqueue('#ops', 'one')
+    scheduler.enqueue('alice', 'two')
+    scheduler.enqueue('alice', 'three')
+
+    # Nicknames are neither reported nor counted as dropped.
+    assert scheduler.get_queue_sizes() == {'#ops': 1}
+    assert scheduler.take_dropped_counts() == {}
+
+    assert take_all(scheduler) == [('#ops', 'one'), ('alice', 'three')]
+    assert list(scheduler._queues) == ['#ops']
+
+
+def create_scheduler(weights, **kwargs):
+    def send(target, text):
+        pass
+
+    return SendScheduler(send, weights, **kwargs)
+
+
+def take_all(scheduler):
+    items = []
+    while True:
+        item = scheduler.take_next()
+        if item is None:
+            return items
+        items.append(item)
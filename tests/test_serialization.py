@@ -0,0 +1,46 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime, timezone
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.parsing import Rfc5424Message
+from syslog2irc.serialization import decode_message, encode_message
+
+
+def test_encode_and_decode_message():
+    port = Port(10514, TransportProtocol.TCP)
+    source_address = ('10.0.0.23', 47110)
+    message = Message(
+        Facility.mail,
+        Severity.error,
+        datetime(2021, 5, 8, 20, 15, 59),
+        'mailhost',
+        b'Disk full \xe2\x80\x93 again!\n',
+    )
+
+    data = encode_message(port, source_address, message)
+
+    assert decode_message(data) == (port, source_address, message)
+
+
+def test_encode_and_decode_rfc5424_message():
+    port = Port(10514, TransportProtocol.UDP)
+    source_address = ('10.0.0.23', 47110)
+    message = Rfc5424Message(
+        Facility.user,
+        Severity.notice,
+        datetime(2021, 5, 8, 20, 15, 59, 123000, timezone.utc),
+        'box',
+        b'Hello!',
+        app_name='app',
+        raw_structured_data=b'[origin ip="10.0.0.23"]',
+    )
+
+    data = encode_message(port, source_address, message)
+
+    assert decode_message(data) == (port, source_address, message)
@@ -0,0 +1,86 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+import socket
+
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.sockets import (
+    apply_socket_config,
+    KernelDropMonitor,
+    read_udp_drop_counts,
+    SocketConfig,
+)
+
+
+PROC_NET_UDP_HEADER = (
+    '   sl  local_address rem_address   st tx_queue rx_queue tr tm->when '
+    'retrnsmt   uid  timeout inode ref pointer drops\n'
+)
+
+
+def create_proc_net_udp_line(port_number, drop_count):
+    return (
+        f'  123: 00000000:{port_number:04X} 00000000:0000 07 00000000:00000000 '
+        f'00:00000000 00000000  1000        0 4711 2 0000000000000000 '
+        f'{drop_count:d}\n'
+    )
+
+
+def write_proc_net_udp(path, *lines):
+    path.write_text(PROC_NET_UDP_HEADER + ''.join(lines))
+
+
+def test_read_udp_drop_counts_sums_up_sockets_per_port(tmp_path):
+    path = tmp_path / 'udp'
+    write_proc_net_udp(
+        path,
+        create_proc_net_udp_line(514, 3),
+        create_proc_net_udp_line(514, 4),
+        create_proc_net_udp_line(10514, 0),
+    )
+
+    assert read_udp_drop_counts(path) == {514: 7, 10514: 0}
+
+
+def test_kernel_drop_monitor_reports_new_drops(tmp_path):
+    path = tmp_path / 'udp'
+    udp_port = Port(514, TransportProtocol.UDP)
+    tcp_port = Port(514, TransportProtocol.TCP)
+    ports = [udp_port, tcp_port]
+    monitor = KernelDropMonitor(path)
+
+    write_proc_net_udp(path, create_proc_net_udp_line(514, 5))
+    assert monitor.check(ports) == {udp_port: 5}
+
+    write_proc_net_udp(path, create_proc_net_udp_line(514, 5))
+    assert monitor.check(ports) == {}
+
+    write_proc_net_udp(path, create_proc_net_udp_line(514, 8))
+    assert monitor.check(ports) == {udp_port: 3}
+
+    # The socket has been replaced, and counts from zero again.
+    write_proc_net_udp(path, create_proc_net_udp_line(514, 2))
+    assert monitor.check(ports) == {udp_port: 2}
+
+    assert monitor.get_totals() == {udp_port: 10}
+
+
+def test_kernel_drop_monitor_without_proc_file(tmp_path):
+    monitor = KernelDropMonitor(tmp_path / 'missing')
+
+    assert monitor.check([Port(514, TransportProtocol.UDP)]) == {}
+    assert not monitor.available
+
+
+def test_apply_socket_config_sets_receive_buffer_size():
+    port = Port(514, TransportProtocol.UDP)
+    config = SocketConfig(receive_buffer_size=65536)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        apply_socket_config(sock, port, config)
+
+        # Linux doubles the value.
+        size = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        assert size >= 65536
@@ -0,0 +1,151 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.spool import Spool, SpoolConfig
+
+
+PORT = Port(514, TransportProtocol.UDP)
+SOURCE_ADDRESS = ('10.0.0.1', 514)
+
+SEGMENT_SIZE = 1024
+
+
+@pytest.fixture
+def config(tmp_path):
+    return SpoolConfig(
+        path=tmp_path / 'spool',
+        max_size=4 * SEGMENT_SIZE,
+        segment_size=SEGMENT_SIZE,
+    )
+
+
+def test_append_and_read(config):
+    spool = Spool(config)
+    assert spool.is_empty()
+
+    for number in range(3):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+
+    assert not spool.is_empty()
+    assert get_texts(spool.read(2)) == [b'0', b'1']
+    assert get_texts(spool.read()) == [b'2']
+    assert spool.read() == []
+    assert spool.is_empty()
+
+    spool.close()
+
+
+def test_reading_stops_at_message_that_is_not_ready(config):
+    spool = Spool(config)
+
+    for number in range(4):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+
+    def is_ready(port, message):
+        return message.message != b'2'
+
+    assert get_texts(spool.read(is_ready=is_ready)) == [b'0', b'1']
+    assert get_texts(spool.read(is_ready=is_ready)) == []
+    assert get_texts(spool.read()) == [b'2', b'3']
+
+    spool.close()
+
+
+def test_messages_span_segments(config):
+    spool = Spool(config)
+
+    # About 18 messages fit into a segment.
+    for number in range(40):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+
+    assert len(list(config.path.glob('*.segment'))) == 3
+    assert get_texts(spool.read()) == [str(n).encode() for n in range(40)]
+    assert len(list(config.path.glob('*.segment'))) == 1
+
+    spool.close()
+
+
+def test_reading_continues_after_reopening(config):
+    spool = Spool(config)
+    for number in range(20):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+    spool.read(15)
+    spool.close()
+
+    spool = Spool(config)
+    spool.append(PORT, SOURCE_ADDRESS, create_message(20))
+
+    assert get_texts(spool.read()) == [b'15', b'16', b'17', b'18', b'19', b'20']
+
+    spool.close()
+
+
+def test_existing_segments_keep_their_size(config):
+    spool = Spool(config)
+    for number in range(15):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+    spool.close()
+
+    spool = Spool(replace(config, segment_size=SEGMENT_SIZE // 4))
+    for number in range(15, 20):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+
+    assert get_texts(spool.read()) == [str(n).encode() for n in range(20)]
+
+    spool.close()
+
+
+def test_record_running_past_segment_end_is_not_read(config):
+    spool = Spool(config)
+    spool.append(PORT, SOURCE_ADDRESS, create_message(0))
+    spool.close()
+
+    # Cut off the segment within the record.
+    (segment_path,) = config.path.glob('*.segment')
+    segment_path.write_bytes(segment_path.read_bytes()[:20])
+
+    spool = Spool(config)
+
+    assert spool.read() == []
+    assert spool.is_empty()
+
+    spool.close()
+
+
+def test_oldest_segment_is_discarded_when_full(config):
+    spool = Spool(config)
+
+    for number in range(100):
+        spool.append(PORT, SOURCE_ADDRESS, create_message(number))
+
+    dropped_count = spool.take_dropped_counts()[PORT]
+    texts = get_texts(spool.read())
+
+    assert dropped_count > 0
+    assert texts == [str(n).encode() for n in range(dropped_count, 100)]
+    assert len(list(config.path.glob('*.segment'))) <= 4
+
+    spool.close()
+
+
+def create_message(number):
+    return Message(
+        Facility.user,
+        Severity.notice,
+        datetime(2021, 5, 8, 20, 15, 59),
+        'box',
+        str(number).encode(),
+    )
+
+
+def get_texts(items):
+    return [message.message for _, _, message in items]
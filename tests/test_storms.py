@@ -0,0 +1,81 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from datetime import datetime
+
+from syslogmp import Facility, Message, Severity
+
+from syslog2irc.storms import SlidingWindowCounter, StormConfig, StormGuard
+
+
+def create_message(hostname, severity, text):
+    return Message(
+        Facility.user, severity, datetime(2021, 5, 4), hostname, text
+    )
+
+
+def test_sliding_window_counter_forgets_old_events():
+    counter = SlidingWindowCounter(10.0)
+
+    for now in [100.0, 100.5, 103.0, 109.9]:
+        counter.add(now)
+    assert counter.get_rate(109.9) == 0.4
+
+    # The bucket of the first two events has slid out of the window.
+    assert counter.get_rate(110.0) == 0.2
+
+    assert counter.get_rate(200.0) == 0.0
+
+
+def test_messages_are_forwarded_up_to_threshold():
+    guard = StormGuard(1.0, StormConfig(window=10.0))
+    message = create_message('web1', Severity.error, b'Disk full')
+
+    forwarded = [not guard.add(message, 100.0) for _ in range(12)]
+
+    assert forwarded == [True] * 10 + [False] * 2
+    assert guard.summarizing
+
+
+def test_summary_is_collected_periodically_until_storm_is_over():
+    guard = StormGuard(
+        1.0, StormConfig(window=10.0, summary_interval=60.0, top_count=2)
+    )
+
+    for _ in range(10):
+        guard.add(create_message('web1', Severity.error, b'Disk full'), 100.0)
+    for hostname, severity, text in [
+        ('web1', Severity.error, b'Disk full'),
+        ('web1', Severity.error, b'Disk full'),
+        ('db1', Severity.warning, b'Slow query'),
+        ('web2', Severity.error, b'Disk full'),
+        ('web1', Severity.notice, b'Retrying'),
+    ]:
+        assert guard.add(create_message(hostname, severity, text), 100.0)
+
+    assert guard.collect_summary(105.0) is None
+
+    # Keep the storm going.
+    for now in range(150, 160):
+        for _ in range(2):
+            guard.add(create_message('web1', Severity.error, b'x'), now)
+
+    assert guard.collect_summary(160.0) == [
+        'Summarized 25 message(s) of the last 60 seconds '
+        '(currently 1.8 per second).',
+        'By host and severity: web1/error: 22, db1/warning: 1',
+        '(20x) x',
+        '(3x) Disk full',
+    ]
+    assert guard.summarizing
+
+    assert guard.collect_summary(175.0) == [
+        'Summarized 0 message(s) of the last 15 seconds '
+        '(storm is over, forwarding messages again).',
+    ]
+    assert not guard.summarizing
+    assert guard.collect_summary(300.0) is None
+
+    assert not guard.add(create_message('web1', Severity.error, b'x'), 300.0)
@@ -0,0 +1,67 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from syslog2irc.connections import ConnectionTracker, TcpConfig
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.syslog import TCPHandler
+
+
+class FakeConnection:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv(self, size):
+        # An empty chunk signals that the connection has been closed.
+        return self.chunks.pop(0) if self.chunks else b''
+
+    def settimeout(self, timeout):
+        pass
+
+
+def test_tcp_handler_receives_unterminated_last_message():
+    port = Port(514, TransportProtocol.TCP)
+    client_address = ('127.0.0.1', 34567)
+    request = FakeConnection(
+        [b'<13>May  8 20:15:59 box One\n<13>May  8 ', b'20:16:00 box Two']
+    )
+
+    received_texts = []
+
+    def handle_message(client_address, port, message):
+        received_texts.append(message.message)
+
+    TCPHandler(
+        port,
+        request,
+        client_address,
+        server=None,
+        handle_message=handle_message,
+    )
+
+    assert received_texts == [b'One', b'Two']
+
+
+def test_tcp_handler_counts_messages_and_bytes_of_connection():
+    port = Port(514, TransportProtocol.TCP)
+    client_address = ('127.0.0.1', 34567)
+    request = FakeConnection(
+        [b'<13>May  8 20:15:59 box One\n<13>May  8 ', b'20:16:00 box Two\n']
+    )
+    tracker = ConnectionTracker(TcpConfig())
+    # Registered by the server before the handler is started.
+    connection = tracker.open(port, client_address)
+
+    TCPHandler(
+        port,
+        request,
+        client_address,
+        server=None,
+        handle_message=lambda client_address, port, message: None,
+        connection_tracker=tracker,
+    )
+
+    assert connection.messages_received == 2
+    assert connection.bytes_received == 56
+    assert tracker.get_connections() == []
@@ -9,7 +9,7 @@ from syslogmp import Facility, Message, Severity
 
 from syslog2irc.network import Port, TransportProtocol
 from syslog2irc.signals import syslog_message_received
-from syslog2irc.syslog import UDPHandler
+from syslog2irc.syslog import create_direct_sink, UDPHandler
 
 
 CURRENT_YEAR = datetime.today().year
@@ -45,3 +45,60 @@ def test_udp_handler():
             'source_address': client_address,
         }
     ]
+
+
+def test_udp_handler_skips_messages_for_inactive_port(monkeypatch):
+    def fail(data):
+        raise AssertionError('Message must not be parsed.')
+
+    monkeypatch.setattr('syslogmp.parse', fail)
+
+    port = Port(514, TransportProtocol.UDP)
+    client_address = ('127.0.0.1', port.number)
+    request = [b'<13>May  8 20:15:59 box Hello!']
+
+    received_signal_data = []
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        received_signal_data.append(data)
+
+    UDPHandler(
+        port,
+        request,
+        client_address,
+        server=None,
+        is_port_active=lambda port: False,
+    )
+
+    assert received_signal_data == []
+
+
+def test_udp_handler_with_direct_sink():
+    port = Port(514, TransportProtocol.UDP)
+    client_address = ('127.0.0.1', port.number)
+    request = [b'<13>May  8 20:15:59 box Hello!']
+
+    received_signal_data = []
+
+    @syslog_message_received.connect
+    def handle_syslog_message_received(sender, **data):
+        received_signal_data.append(data)
+
+    put_items = []
+
+    def put(port, source_address, message):
+        put_items.append((port, source_address, message.message))
+
+    sink = create_direct_sink(put)
+
+    UDPHandler(
+        port,
+        request,
+        client_address,
+        server=None,
+        handle_message=sink.handle_message,
+    )
+
+    assert put_items == [(port, client_address, b'Hello!')]
+    assert received_signal_data == []
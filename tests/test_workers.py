@@ -0,0 +1,73 @@
+"""
+:Copyright: 2007-2021 Jochen Kupperschmidt
+:License: MIT, see LICENSE for details.
+"""
+
+from collections import Counter
+import socket
+from threading import Event
+from time import sleep
+
+from syslog2irc import metrics
+from syslog2irc.network import Port, TransportProtocol
+from syslog2irc.signals import syslog_messages_received
+from syslog2irc.workers import start_syslog_message_receivers
+
+
+def test_reception_in_worker_processes():
+    port = Port(find_free_port(), TransportProtocol.UDP)
+
+    received_texts = []
+    all_received = Event()
+
+    @syslog_messages_received.connect
+    def handle_syslog_messages_received(sender, **data):
+        if sender == port:
+            for _, message in data['messages']:
+                received_texts.append(message.message)
+            if len(received_texts) == 3:
+                all_received.set()
+
+    start_syslog_message_receivers(
+        [port], worker_count=2, ring_buffer_size=64 * 1024
+    )
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for text in [b'One', b'Two', b'Three']:
+            data = b'<13>May  8 20:15:59 box ' + text
+            sock.sendto(data, ('127.0.0.1', port.number))
+
+    assert all_received.wait(timeout=10)
+
+    assert sorted(received_texts) == [b'One', b'Three', b'Two']
+
+
+def test_messages_dropped_because_ring_buffer_is_full_are_counted():
+    port = Port(find_free_port(), TransportProtocol.UDP)
+
+    # too small for any message
+    dropped_message_counter = start_syslog_message_receivers(
+        [port], worker_count=1, ring_buffer_size=32
+    )
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for text in [b'One', b'Two']:
+            data = b'<13>May  8 20:15:59 box ' + text
+            sock.sendto(data, ('127.0.0.1', port.number))
+
+    dropped_counts = Counter()
+    for _ in range(50):
+        dropped_counts.update(dropped_message_counter.take_dropped_counts())
+        if dropped_counts[port] == 2:
+            break
+        sleep(0.1)
+    else:
+        assert False, 'Dropped messages have not been counted.'
+
+    assert metrics.ring_buffer_messages_dropped.collect()[port] == 2
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]